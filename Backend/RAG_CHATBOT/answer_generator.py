@@ -0,0 +1,342 @@
+"""
+In-process seq2seq answer synthesis (flan-t5) over retrieved chunks
+The model is loaded once, dynamically quantized to int8 on CPU (Linear layers),
+and shared by all callers. Prompts submitted concurrently are collected by a
+worker thread for up to batch_wait_ms and generated as one padded batch.
+Decoding is greedy (fast) or beam search, and every prompt may carry a latency
+budget: time spent queued counts against it, generation of the batch is cut
+off with max_time at the tightest remaining budget, and a prompt whose budget
+ran out before it could start gets None so the caller can fall back to the
+extractive answer. Answers are GeneratedAnswer strings whose truncated flag
+marks those cut short by max_time before the model finished them.
+
+Enabled in the chatbots with RAG_GENERATOR=1 (see generator_from_env).
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+
+DEFAULT_GENERATOR_MODEL = "google/flan-t5-small"
+DECODING_MODES = ('greedy', 'beam')
+DEFAULT_NUM_BEAMS = 4
+DEFAULT_MAX_NEW_TOKENS = 150
+DEFAULT_MAX_INPUT_TOKENS = 512
+DEFAULT_MAX_BATCH_SIZE = 8
+DEFAULT_BATCH_WAIT_MS = 10.0
+DEFAULT_CONTEXT_CHARS = 1500
+# Extra wait for a result past its budget: max_time is only checked between decoding steps
+RESULT_GRACE_SECONDS = 1.0
+
+
+class GeneratedAnswer(str):
+    """Generated answer text; truncated is True when max_time stopped generation before it finished"""
+
+    def __new__(cls, text: str, truncated: bool = False):
+        answer = super().__new__(cls, text)
+        answer.truncated = truncated
+        return answer
+
+
+def build_prompt(question: str, contexts: List[str], max_context_chars: int = DEFAULT_CONTEXT_CHARS) -> str:
+    """
+    Question-answering prompt over the retrieved chunks
+
+    Args:
+        question (str): User's question
+        contexts (List[str]): Chunk texts, most relevant first
+        max_context_chars (int): Context is cut to this many characters
+
+    Returns:
+        str: Prompt for the generator
+    """
+    context = " ".join(text.strip() for text in contexts)[:max_context_chars]
+    return f"Context: {context}\n\nQuestion: {question}\n\nAnswer:"
+
+
+class _Request:
+    __slots__ = ('prompt', 'decoding', 'deadline', 'future', 'abandoned')
+
+    def __init__(self, prompt: str, decoding: str, deadline: Optional[float]):
+        self.prompt = prompt
+        self.decoding = decoding
+        self.deadline = deadline
+        self.future = Future()
+        self.abandoned = False
+
+
+class AnswerGenerator:
+    """Shared seq2seq generator with request batching and a per-prompt latency budget"""
+
+    def __init__(self, model_name: str = DEFAULT_GENERATOR_MODEL, decoding: str = 'greedy',
+                 num_beams: int = DEFAULT_NUM_BEAMS, max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS,
+                 max_latency_ms: Optional[float] = None, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 batch_wait_ms: float = DEFAULT_BATCH_WAIT_MS, quantize: bool = True,
+                 max_input_tokens: int = DEFAULT_MAX_INPUT_TOKENS, model=None, tokenizer=None):
+        """
+        Args:
+            model_name (str): Hugging Face seq2seq model
+            decoding (str): Default decoding, 'greedy' or 'beam'
+            num_beams (int): Beams for beam decoding
+            max_new_tokens (int): Answer length limit
+            max_latency_ms (float): Default budget per prompt, queueing included (None = unlimited)
+            max_batch_size (int): Prompts generated together
+            batch_wait_ms (float): How long the worker waits for more prompts to batch
+            quantize (bool): Dynamically quantize Linear layers to int8 when running on CPU
+            max_input_tokens (int): Prompt token limit (longer prompts are truncated)
+            model: Already loaded model (with tokenizer)
+            tokenizer: Already loaded tokenizer
+        """
+        if decoding not in DECODING_MODES:
+            raise ValueError(f"Unknown decoding {decoding!r}, expected one of {DECODING_MODES}")
+        self.model_name = model_name
+        self.decoding = decoding
+        self.num_beams = max(2, num_beams)
+        self.max_new_tokens = max_new_tokens
+        self.max_latency_ms = max_latency_ms
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_wait_ms = batch_wait_ms
+        self.quantize = quantize
+        self.max_input_tokens = max_input_tokens
+        self._model = model
+        self._tokenizer = tokenizer
+        self.quantized = False
+        self._load_lock = threading.Lock()
+        self._pending = []
+        self._condition = threading.Condition()
+        self._worker = None
+        self._stopped = False
+        self.batches = 0
+        self.prompts = 0
+        self.timeouts = 0
+        self.truncated = 0
+        self.last_stats = {}
+
+    def load(self):
+        """Load (and quantize) the model once; called on first use"""
+        with self._load_lock:
+            if self._model is None:
+                import torch
+                from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+                print(f"🤖 Loading answer generator {self.model_name}...")
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
+                model.eval()
+                if self.quantize and next(model.parameters()).device.type == 'cpu':
+                    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                    self.quantized = True
+                self._model = model
+        return self._tokenizer, self._model
+
+    def generate_batch(self, prompts: List[str], decoding: Optional[str] = None,
+                       max_time: Optional[float] = None) -> List[GeneratedAnswer]:
+        """
+        Generate answers for prompts in one forward pass per decoding step
+
+        Args:
+            prompts (List[str]): Prompts
+            decoding (str): 'greedy' or 'beam' (default: the generator's)
+            max_time (float): Seconds after which generation stops, answers as far as decoded
+
+        Returns:
+            List[GeneratedAnswer]: One answer per prompt, flagged when max_time cut it short
+        """
+        import torch
+
+        tokenizer, model = self.load()
+        decoding = decoding or self.decoding
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True, truncation=True,
+                           max_length=self.max_input_tokens)
+        options = {'max_new_tokens': self.max_new_tokens}
+        if decoding == 'beam':
+            options.update(num_beams=self.num_beams, early_stopping=True)
+        else:
+            options.update(num_beams=1, do_sample=False)
+        if max_time is not None:
+            options['max_time'] = max_time
+        started = time.perf_counter()
+        with torch.no_grad():
+            outputs = model.generate(**inputs, **options)
+        # Sequences without an end-of-sequence token were still being decoded when time ran out
+        timed_out = max_time is not None and time.perf_counter() - started >= max_time
+        texts = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        return [GeneratedAnswer(text, timed_out and tokenizer.eos_token_id not in sequence.tolist())
+                for text, sequence in zip(texts, outputs)]
+
+    def generate(self, prompt: str, decoding: Optional[str] = None,
+                 max_latency_ms: Optional[float] = None) -> Optional[GeneratedAnswer]:
+        """
+        Generate an answer, batched with prompts submitted concurrently
+
+        Args:
+            prompt (str): Prompt (see build_prompt)
+            decoding (str): 'greedy' or 'beam' (default: the generator's)
+            max_latency_ms (float): Budget for this prompt (default: the generator's)
+
+        Returns:
+            GeneratedAnswer: The answer, or None when the budget ran out before
+                generation started or the result did not arrive within it
+        """
+        return self.generate_many([prompt], decoding, max_latency_ms)[0]
+
+    def generate_many(self, prompts: List[str], decoding: Optional[str] = None,
+                      max_latency_ms: Optional[float] = None) -> List[Optional[GeneratedAnswer]]:
+        """
+        Queue several prompts at once; the worker generates them max_batch_size at a time
+
+        Args:
+            prompts (List[str]): Prompts (see build_prompt)
+            decoding (str): 'greedy' or 'beam' (default: the generator's)
+            max_latency_ms (float): Budget of each prompt from submission (default: the generator's)
+
+        Returns:
+            List[GeneratedAnswer]: One answer per prompt, None where the budget ran out
+        """
+        decoding = decoding or self.decoding
+        if decoding not in DECODING_MODES:
+            raise ValueError(f"Unknown decoding {decoding!r}, expected one of {DECODING_MODES}")
+        # Loading the model on first use is not charged to the budget
+        self.load()
+        budget_ms = max_latency_ms if max_latency_ms is not None else self.max_latency_ms
+        deadline = time.perf_counter() + budget_ms / 1000.0 if budget_ms is not None else None
+
+        requests = [_Request(prompt, decoding, deadline) for prompt in prompts]
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Answer generator is closed")
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="answer-generator", daemon=True)
+                self._worker.start()
+            self._pending.extend(requests)
+            self._condition.notify()
+        return [self._result(request, deadline) for request in requests]
+
+    def _result(self, request: _Request, deadline: Optional[float]) -> Optional[GeneratedAnswer]:
+        """Wait for a request until its deadline plus RESULT_GRACE_SECONDS (None after that)"""
+        timeout = max(0.0, deadline - time.perf_counter()) + RESULT_GRACE_SECONDS if deadline is not None else None
+        try:
+            return request.future.result(timeout)
+        except FutureTimeoutError:
+            # Still queued behind a long batch: drop it; already generating: the late answer is discarded
+            with self._condition:
+                request.abandoned = True
+                if request in self._pending:
+                    self._pending.remove(request)
+            self.timeouts += 1
+            return None
+
+    def answer(self, question: str, contexts: List[str], decoding: Optional[str] = None,
+               max_latency_ms: Optional[float] = None) -> Optional[GeneratedAnswer]:
+        """Synthesize an answer to question from the retrieved chunk texts (None on timeout)"""
+        return self.answer_many([question], [contexts], decoding, max_latency_ms)[0]
+
+    def answer_many(self, questions: List[str], contexts: List[List[str]], decoding: Optional[str] = None,
+                    max_latency_ms: Optional[float] = None) -> List[Optional[GeneratedAnswer]]:
+        """Synthesize answers to several questions, each from its own chunk texts (None on timeout)"""
+        prompts = [build_prompt(question, texts) for question, texts in zip(questions, contexts)]
+        return [GeneratedAnswer(answer.strip(), answer.truncated) if answer else None
+                for answer in self.generate_many(prompts, decoding, max_latency_ms)]
+
+    def _next_batch(self) -> List[_Request]:
+        """Wait for a prompt, then gather prompts with the same decoding for up to batch_wait_ms"""
+        with self._condition:
+            while not self._pending and not self._stopped:
+                self._condition.wait()
+            if self._stopped:
+                return []
+            first = self._pending[0]
+            collect_until = time.perf_counter() + self.batch_wait_ms / 1000.0
+            while True:
+                batch = [r for r in self._pending if r.decoding == first.decoding][:self.max_batch_size]
+                remaining = collect_until - time.perf_counter()
+                if len(batch) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            for request in batch:
+                self._pending.remove(request)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            now = time.perf_counter()
+            expired = [r for r in batch if r.deadline is not None and r.deadline <= now]
+            for request in expired:
+                request.future.set_result(None)
+            batch = [r for r in batch if r not in expired]
+            # Callers that gave up waiting have counted their own timeout
+            self.timeouts += sum(1 for r in expired if not r.abandoned)
+            if not batch:
+                continue
+
+            deadlines = [r.deadline for r in batch if r.deadline is not None]
+            max_time = min(deadlines) - now if deadlines else None
+            started = time.perf_counter()
+            try:
+                answers = self.generate_batch([r.prompt for r in batch], batch[0].decoding, max_time)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            for request, answer in zip(batch, answers):
+                request.future.set_result(answer)
+
+            self.batches += 1
+            self.prompts += len(batch)
+            self.truncated += sum(answer.truncated for answer in answers)
+            self.last_stats = {
+                'batch_size': len(batch),
+                'decoding': batch[0].decoding,
+                'expired': len(expired),
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+            }
+
+    def close(self):
+        """Stop the batching worker; prompts still queued are answered None, later ones raise RuntimeError"""
+        with self._condition:
+            self._stopped = True
+            for request in self._pending:
+                request.future.set_result(None)
+            self._pending = []
+            self._condition.notify_all()
+
+    def stats(self) -> Dict:
+        return {
+            'model': self.model_name,
+            'decoding': self.decoding,
+            'quantized': self.quantized,
+            'max_latency_ms': self.max_latency_ms,
+            'batches': self.batches,
+            'prompts': self.prompts,
+            'avg_batch_size': round(self.prompts / self.batches, 2) if self.batches else None,
+            'timeouts': self.timeouts,
+            'truncated': self.truncated,
+            'last': self.last_stats
+        }
+
+
+def generator_from_env() -> Optional[AnswerGenerator]:
+    """
+    Answer generator configured by environment, or None when disabled
+
+    RAG_GENERATOR=1 enables it; RAG_GENERATOR_MODEL, RAG_GENERATOR_DECODING
+    (greedy|beam), RAG_GENERATOR_BEAMS, RAG_GENERATOR_MAX_LATENCY_MS,
+    RAG_GENERATOR_BATCH and RAG_GENERATOR_QUANTIZE (default 1) override the defaults.
+    """
+    if os.environ.get('RAG_GENERATOR', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    max_latency_ms = os.environ.get('RAG_GENERATOR_MAX_LATENCY_MS')
+    return AnswerGenerator(
+        os.environ.get('RAG_GENERATOR_MODEL', DEFAULT_GENERATOR_MODEL),
+        decoding=os.environ.get('RAG_GENERATOR_DECODING', 'greedy'),
+        num_beams=int(os.environ.get('RAG_GENERATOR_BEAMS', DEFAULT_NUM_BEAMS)),
+        max_latency_ms=float(max_latency_ms) if max_latency_ms else None,
+        max_batch_size=int(os.environ.get('RAG_GENERATOR_BATCH', DEFAULT_MAX_BATCH_SIZE)),
+        quantize=os.environ.get('RAG_GENERATOR_QUANTIZE', '1').lower() in ('1', 'true', 'yes')
+    )
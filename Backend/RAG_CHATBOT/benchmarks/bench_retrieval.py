@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the retrieval hot path of both chatbots
+Times enhance_query, query encoding, the FAISS search, keyword relevance,
+answer formatting (format_natural_answer / create_structured_answer) and the
+end-to-end ask() of rag_chatbot.py and rag_chatbot_langchain.py over a fixed
+query set. The databases are copied to a scratch directory first, so the
+checked-in files are never converted or modified. Query and conversation
+caches are cleared before every timed ask(), so each call pays the full cost.
+
+Results are written as JSON; --baseline compares them with a saved run and
+flags cases whose median got slower than the tolerance.
+
+Usage (from Backend/RAG_CHATBOT):
+    python3 benchmarks/bench_retrieval.py [--output results.json] [--baseline baseline.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib
+from typing import Callable, Dict, List
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RAG_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, RAG_DIR)
+
+# Small database checked in with the repo (12 chunks of comprehensive_tax_guide.pdf)
+DEFAULT_DOCUMENT = "doc_comprehensive_tax_guide_1759852974"
+CHATBOT_MODULES = ["rag_chatbot", "rag_chatbot_langchain"]
+
+BENCH_QUERIES = [
+    "What is Section 80C?",
+    "How to claim HRA exemption?",
+    "What are the deductions available under section 80D for health insurance?",
+    "Calculate tax on salary income of 12 lakh",
+    "Compare old regime vs new regime",
+    "What is the penalty for late filing of income tax return?",
+    "How is capital gains tax computed on sale of property?",
+    "What is the standard deduction for salaried employees?",
+    "Which documents are needed to file ITR?",
+    "Explain TDS on salary",
+]
+
+
+# --- Harness -------------------------------------------------------------------
+
+def summarize(samples: List[float]) -> Dict:
+    """Statistics of timing samples given in seconds, reported in microseconds"""
+    values = np.asarray(samples) * 1e6
+    return {
+        'calls': len(values),
+        'mean_us': round(float(values.mean()), 2),
+        'p50_us': round(float(np.percentile(values, 50)), 2),
+        'p95_us': round(float(np.percentile(values, 95)), 2),
+        'min_us': round(float(values.min()), 2)
+    }
+
+
+def measure(fn: Callable, inputs: List, repeat: int, warmup: int = 1) -> Dict:
+    """Time fn on every input, repeat times after warmup untimed passes"""
+    for _ in range(warmup):
+        for item in inputs:
+            fn(item)
+    samples = []
+    for _ in range(repeat):
+        for item in inputs:
+            started = time.perf_counter()
+            fn(item)
+            samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def prepare_workdir(document_id: str) -> str:
+    """Copy one database and its metadata into a scratch directory laid out like RAG_CHATBOT"""
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    vector_name = f"{document_id}_vectors"
+    shutil.copytree(os.path.join(RAG_DIR, "vector_database", vector_name),
+                    os.path.join(workdir, "vector_database", vector_name))
+    os.makedirs(os.path.join(workdir, "document_metadata"))
+    metadata_name = f"{document_id}_metadata.json"
+    shutil.copy2(os.path.join(RAG_DIR, "document_metadata", metadata_name),
+                 os.path.join(workdir, "document_metadata", metadata_name))
+    return workdir
+
+
+def bench_chatbot(module_name: str, document_id: str, queries: List[str], repeat: int,
+                  top_k: int, model=None) -> Dict:
+    """Benchmark the hot path of one chatbot module"""
+    module = importlib.import_module(module_name)
+    bot = module.AdvancedRAGChatbot(document_id, model=model)
+    if getattr(bot, 'faiss_index', None) is None:
+        raise RuntimeError(f"{module_name} did not load {document_id}")
+
+    enhanced = [bot.enhance_query(query) for query in queries]
+    vectors = [bot.model.encode([text]).astype('float32') for text in enhanced]
+    search_k = min(top_k * 3, bot.faiss_index.ntotal)
+    retrieved = {}
+    for query in queries:
+        bot.query_cache.clear()
+        retrieved[query] = bot.find_relevant_chunks(query, top_k, similarity_threshold=0.0)
+    relevance_pairs = [(query, chunk['chunk']) for query in queries for chunk in retrieved[query]]
+
+    def format_answer(query):
+        chunks = retrieved[query]
+        if not chunks:
+            return None
+        if hasattr(bot, 'create_structured_answer'):
+            context = "\n\n".join(f"[Source {i}] {chunk['chunk']}" for i, chunk in enumerate(chunks, 1))
+            return bot.create_structured_answer(query, context, chunks)
+        return bot.format_natural_answer(query, chunks[0]['chunk'].strip(), chunks)
+
+    def ask(query):
+        bot.query_cache.clear()
+        bot.conversation_history.clear()
+        return bot.ask(query, top_k)
+
+    cases = {
+        'enhance_query': lambda query: bot.enhance_query(query),
+        'encode': lambda text: bot.model.encode([text]),
+        'faiss_search': lambda vector: bot.faiss_index.search(vector, search_k),
+        'keyword_relevance': lambda pair: bot.calculate_keyword_relevance(*pair),
+        'format_answer': format_answer,
+        'ask': ask,
+    }
+    inputs = {
+        'enhance_query': queries,
+        'encode': enhanced,
+        'faiss_search': vectors,
+        'keyword_relevance': relevance_pairs or [(queries[0], "")],
+        'format_answer': queries,
+        'ask': queries,
+    }
+
+    results = {}
+    # The chatbots print progress on every ask; keep the benchmark output readable
+    stdout = sys.stdout
+    try:
+        sys.stdout = open(os.devnull, 'w')
+        for name, fn in cases.items():
+            results[name] = measure(fn, inputs[name], repeat)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return {'vectors': int(bot.faiss_index.ntotal), 'cases': results, 'model': bot.model}
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """Median ratio per case against a baseline run; ratio > 1 + tolerance is a regression"""
+    rows = []
+    for module_name, result in current['chatbots'].items():
+        base = baseline.get('chatbots', {}).get(module_name, {})
+        for case, stats in result.get('cases', {}).items():
+            base_stats = base.get('cases', {}).get(case)
+            if not base_stats or not base_stats['p50_us']:
+                continue
+            ratio = stats['p50_us'] / base_stats['p50_us']
+            rows.append({
+                'chatbot': module_name,
+                'case': case,
+                'baseline_p50_us': base_stats['p50_us'],
+                'p50_us': stats['p50_us'],
+                'ratio': round(ratio, 3),
+                'regression': ratio > 1 + tolerance
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the retrieval hot path of both chatbots")
+    parser.add_argument('--document', default=DEFAULT_DOCUMENT, help="Checked-in database to query")
+    parser.add_argument('--chatbots', nargs='+', default=CHATBOT_MODULES, help="Chatbot modules to benchmark")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed passes over the query set")
+    parser.add_argument('--top-k', type=int, default=5, help="Chunks retrieved per query")
+    parser.add_argument('--output', default=None, help="Write JSON results here (default: stdout)")
+    parser.add_argument('--baseline', default=None, help="Compare against a saved JSON result")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Allowed median slowdown against the baseline (default: 0.10 = 10%%)")
+    args = parser.parse_args()
+
+    import faiss
+
+    workdir = prepare_workdir(args.document)
+    previous_cwd = os.getcwd()
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'faiss': getattr(faiss, '__version__', None)
+        },
+        'config': {
+            'document': args.document,
+            'queries': len(BENCH_QUERIES),
+            'repeat': args.repeat,
+            'top_k': args.top_k
+        },
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'chatbots': {}
+    }
+
+    model = None
+    try:
+        os.chdir(workdir)
+        for module_name in args.chatbots:
+            print(f"📊 Benchmarking {module_name}...", file=sys.stderr)
+            try:
+                result = bench_chatbot(module_name, args.document, BENCH_QUERIES, args.repeat, args.top_k, model)
+            except ImportError as e:
+                print(f"⚠️ Skipping {module_name}: {e}", file=sys.stderr)
+                report['chatbots'][module_name] = {'skipped': str(e)}
+                continue
+            model = result.pop('model')  # Load the encoder once for all chatbots
+            report['chatbots'][module_name] = result
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for module_name, result in report['chatbots'].items():
+        if 'cases' not in result:
+            continue
+        print(f"\n{module_name} ({result['vectors']} vectors)", file=sys.stderr)
+        print(f"{'case':<20} {'mean µs':>11} {'p50 µs':>11} {'p95 µs':>11}", file=sys.stderr)
+        for case, stats in result['cases'].items():
+            print(f"{case:<20} {stats['mean_us']:>11.1f} {stats['p50_us']:>11.1f} {stats['p95_us']:>11.1f}",
+                  file=sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['comparison'] = compare(report, baseline, args.tolerance)
+        print(f"\nAgainst {args.baseline} (tolerance {args.tolerance:.0%}):", file=sys.stderr)
+        for row in report['comparison']:
+            flag = "❌ slower" if row['regression'] else "✅"
+            print(f"{row['chatbot']:<24} {row['case']:<20} {row['baseline_p50_us']:>11.1f} -> "
+                  f"{row['p50_us']:>11.1f} µs ({row['ratio']:.2f}x) {flag}", file=sys.stderr)
+        regressions = [row for row in report['comparison'] if row['regression']]
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"\n💾 Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark: ingestion and search cost against corpus size
+Builds one database per corpus size from the synthetic tax corpus of
+create_comprehensive_pdf.py and measures ingestion time (with per-stage
+timings), on-disk index size, load time and query latency.
+
+Two ingestion modes:
+    text  chunk text is generated directly and indexed with IncrementalIndex,
+          so sizes of 500k chunks and more stay practical (default)
+    pdf   an N-page PDF is rendered and ingested end to end with
+          DocumentVectorizer (extraction, chunking, dedup, embedding)
+
+--embedder hash replaces the model with deterministic pseudo-random vectors,
+isolating index and search scaling from encode cost. Results are written as
+JSON and, when matplotlib is installed, plotted against corpus size.
+
+Usage (from Backend/RAG_CHATBOT):
+    python3 benchmarks/bench_scaling.py --sizes 5000 50000 500000 --embedder hash --plot scaling.png
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import zlib
+import argparse
+import platform
+import tempfile
+from typing import Callable, Dict, List
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RAG_DIR = os.path.dirname(BENCH_DIR)
+BACKEND_DIR = os.path.dirname(RAG_DIR)
+sys.path.insert(0, RAG_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from build_report import BuildReport, peak_rss_mb
+from dedup import DEFAULT_DEDUP_THRESHOLD
+from chunk_store import open_chunk_store
+from incremental_index import FAISS_INDEX_FILENAME, IncrementalIndex
+from bench_retrieval import BENCH_QUERIES
+from create_comprehensive_pdf import create_synthetic_tax_pdf, synthetic_chunks
+
+DEFAULT_SIZES = [5000, 50000]
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+HASH_DIMENSION = 384  # Same as all-MiniLM-L6-v2
+CHUNKS_PER_PAGE = 4   # Blocks per synthetic section, one section per page
+
+
+def hash_embed(texts: List[str], dimension: int = HASH_DIMENSION) -> np.ndarray:
+    """Deterministic pseudo-random unit vectors seeded by each text's CRC32"""
+    vectors = np.empty((len(texts), dimension), dtype='float32')
+    for row, text in enumerate(texts):
+        vectors[row] = np.random.default_rng(zlib.crc32(text.encode('utf-8'))).standard_normal(dimension)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def directory_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def percentiles_ms(samples: List[float]) -> Dict:
+    values = np.asarray(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'mean_ms': round(float(values.mean()), 3)
+    }
+
+
+def build_from_text(size: int, vector_dir: str, embed_fn: Callable, seed: int) -> Dict:
+    """Index generated chunk text directly; returns the build report"""
+    started = time.perf_counter()
+    chunks = synthetic_chunks(size, seed)
+    generate_seconds = time.perf_counter() - started
+
+    report = BuildReport(f"synthetic_{size}", 'bench_scaling', live=False)
+    vector_index = IncrementalIndex(vector_dir)
+    with report.stage('index'):
+        update_stats = vector_index.update(chunks, report.timed('embed', embed_fn))
+    report.add('index', items=update_stats['added'])
+    with report.stage('save', len(chunks)):
+        vector_index.save(chunks)
+
+    result = report.to_dict()
+    result['generate_seconds'] = round(generate_seconds, 3)
+    return result
+
+
+def build_from_pdf(size: int, workdir: str, args, embed_fn: Callable) -> Dict:
+    """Render a synthetic PDF and ingest it with DocumentVectorizer; returns its build report"""
+    from document_vectorizer import DocumentVectorizer
+
+    pages = max(1, size // CHUNKS_PER_PAGE)
+    pdf_path = os.path.join(workdir, f"synthetic_{pages}p.pdf")
+    started = time.perf_counter()
+    create_synthetic_tax_pdf(pages, pdf_path, args.seed)
+    generate_seconds = time.perf_counter() - started
+
+    document_id = f"synthetic_{size}"
+    vectorizer = DocumentVectorizer(args.model, embedding_cache_path=None,
+                                    dedup_threshold=None if args.no_dedup else DEFAULT_DEDUP_THRESHOLD)
+    if args.embedder == 'hash':
+        vectorizer.embed_texts = embed_fn
+    vectorizer.process_document(pdf_path, document_id, incremental=False, checkpoint_dir=None)
+
+    with open(os.path.join('document_metadata', f"{document_id}_build_report.json"), 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    result['generate_seconds'] = round(generate_seconds, 3)
+    result['pdf_bytes'] = os.path.getsize(pdf_path)
+    return result
+
+
+def measure_load(vector_dir: str, repeat: int) -> float:
+    """Best-of-repeat seconds to open the index and its chunk store"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        vector_index = IncrementalIndex(vector_dir)
+        chunks = open_chunk_store(vector_dir)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        del vector_index
+    return best
+
+
+def measure_queries(vector_dir: str, embed_fn: Callable, top_k: int, repeat: int) -> Dict:
+    """Encode and search latency of the benchmark queries against a freshly loaded index"""
+    vector_index = IncrementalIndex(vector_dir)
+    chunks = open_chunk_store(vector_dir)
+    encode_samples, search_samples = [], []
+    hit_count = 0
+    for _ in range(repeat):
+        for query in BENCH_QUERIES:
+            started = time.perf_counter()
+            query_vector = np.asarray(embed_fn([query]), dtype='float32')
+            encoded = time.perf_counter()
+            _, rows = vector_index.search(query_vector, top_k)
+            hits = [chunks[int(row)] for row in rows[0] if row >= 0]
+            finished = time.perf_counter()
+            encode_samples.append(encoded - started)
+            search_samples.append(finished - encoded)
+            hit_count += len(hits)
+    if hasattr(chunks, 'close'):
+        chunks.close()
+    return {
+        'encode': percentiles_ms(encode_samples),
+        'search': percentiles_ms(search_samples),
+        'total': percentiles_ms([e + s for e, s in zip(encode_samples, search_samples)]),
+        'hits_per_query': round(hit_count / max(1, len(search_samples)), 2)
+    }
+
+
+def plot_results(results: List[Dict], path: str) -> bool:
+    """Plot the scaling curves; returns False when matplotlib is unavailable"""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+
+    sizes = [result['chunks'] for result in results]
+    panels = [
+        ("Ingestion time (s)", [result['ingest_seconds'] for result in results]),
+        ("Index size (MB)", [result['index_bytes'] / 1e6 for result in results]),
+        ("Load time (s)", [result['load_seconds'] for result in results]),
+        ("Query latency p50 (ms)", [result['query']['search']['p50_ms'] for result in results]),
+    ]
+    fig, axes = plt.subplots(2, 2, figsize=(10, 8))
+    for ax, (title, values) in zip(axes.flat, panels):
+        ax.plot(sizes, values, marker='o')
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel("Chunks")
+        ax.set_title(title)
+        ax.grid(True, which='both', alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ingestion and search cost against corpus size")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Corpus sizes in chunks")
+    parser.add_argument('--mode', choices=['text', 'pdf'], default='text',
+                        help="Index generated chunk text directly, or render and ingest a PDF")
+    parser.add_argument('--embedder', choices=['model', 'hash'], default='model',
+                        help="Embed with the sentence-transformers model or with hashed random vectors")
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="Embedding model")
+    parser.add_argument('--no-dedup', action='store_true', help="Keep near-duplicate chunks (pdf mode)")
+    parser.add_argument('--seed', type=int, default=0, help="Corpus random seed")
+    parser.add_argument('--top-k', type=int, default=5, help="Chunks retrieved per query")
+    parser.add_argument('--repeat', type=int, default=3, help="Passes over the query set / load attempts")
+    parser.add_argument('--workdir', default=None, help="Build directory (default: a temporary one, removed afterwards)")
+    parser.add_argument('--output', default=None, help="Write JSON results here (default: stdout)")
+    parser.add_argument('--plot', default=None, help="Save scaling plots to this image (needs matplotlib)")
+    args = parser.parse_args()
+
+    if args.embedder == 'hash':
+        embed_fn = hash_embed
+    else:
+        from embedding_pool import BatchEmbedder
+        embed_fn = BatchEmbedder(args.model).encode
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag_scaling_")
+    os.makedirs(workdir, exist_ok=True)
+    previous_cwd = os.getcwd()
+    results = []
+    try:
+        os.chdir(workdir)
+        for size in sorted(args.sizes):
+            print(f"📊 Building {size} chunks ({args.mode} mode, {args.embedder} embedder)...", file=sys.stderr)
+            vector_dir = os.path.join('vector_database', f"synthetic_{size}_vectors")
+            if args.mode == 'pdf':
+                build = build_from_pdf(size, workdir, args, embed_fn)
+            else:
+                shutil.rmtree(vector_dir, ignore_errors=True)
+                build = build_from_text(size, vector_dir, embed_fn, args.seed)
+
+            vector_index = IncrementalIndex(vector_dir)
+            result = {
+                'size': size,
+                'chunks': vector_index.ntotal,
+                'ingest_seconds': build['wall_seconds'],
+                'generate_seconds': build['generate_seconds'],
+                'stages': {name: stage['seconds'] for name, stage in build['stages'].items()},
+                'index_bytes': os.path.getsize(os.path.join(vector_dir, FAISS_INDEX_FILENAME)),
+                'database_bytes': directory_bytes(vector_dir),
+                'load_seconds': round(measure_load(vector_dir, args.repeat), 4),
+                'query': measure_queries(vector_dir, embed_fn, args.top_k, args.repeat),
+                'peak_rss_mb': peak_rss_mb()['self']
+            }
+            del vector_index
+            results.append(result)
+            print(f"   ✅ {result['chunks']} chunks: ingest {result['ingest_seconds']:.2f}s, "
+                  f"index {result['index_bytes'] / 1e6:.1f} MB, load {result['load_seconds'] * 1000:.1f} ms, "
+                  f"search p50 {result['query']['search']['p50_ms']:.2f} ms", file=sys.stderr)
+    finally:
+        os.chdir(previous_cwd)
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'chunks':>9} {'ingest s':>10} {'index MB':>10} {'load ms':>10} {'search p50 ms':>14} {'p95 ms':>9}",
+          file=sys.stderr)
+    for result in results:
+        search = result['query']['search']
+        print(f"{result['chunks']:>9} {result['ingest_seconds']:>10.2f} {result['index_bytes'] / 1e6:>10.1f} "
+              f"{result['load_seconds'] * 1000:>10.1f} {search['p50_ms']:>14.3f} {search['p95_ms']:>9.3f}",
+              file=sys.stderr)
+
+    if args.plot:
+        if plot_results(results, args.plot):
+            print(f"📈 Plots saved to {args.plot}", file=sys.stderr)
+        else:
+            print("⚠️ matplotlib is not installed, skipping plots", file=sys.stderr)
+
+    output = json.dumps({
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {
+            'mode': args.mode,
+            'embedder': args.embedder,
+            'model': args.model if args.embedder == 'model' else None,
+            'seed': args.seed,
+            'top_k': args.top_k
+        },
+        'results': results
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"💾 Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark text_analysis against the per-keyword / per-pattern implementations it replaced
+Checks that both produce identical results on every input, then reports the
+time per call for each hot path.
+
+Usage (from Backend/RAG_CHATBOT):
+    python3 benchmarks/bench_text_analysis.py [--vector-dir DIR] [--repeat N]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import text_analysis as ta
+from chunk_store import CHUNK_STORE_FILENAME, LEGACY_CHUNKS_FILENAME, ChunkStore, read_legacy_chunks
+
+SAMPLE_QUERIES = [
+    "What is Section 80C?",
+    "How to claim HRA exemption?",
+    "Calculate capital gains tax on property sale",
+    "Compare old regime vs new regime for salaried employees",
+    "What is the penalty for late filing of ITR?",
+    "hello",
+    "tell me something interesting about the weather today",
+    "Can I claim 80D for my parents' health insurance premium?",
+    "How is interest on home loan treated under section 24b?",
+    "What documents are needed for form 16 and form 26as?",
+    "I received a scrutiny notice, what should I do?",
+    "thank you",
+]
+
+
+# --- Implementations before text_analysis -------------------------------------
+
+def legacy_enhance_categories(query: str) -> List[str]:
+    query_lower = query.lower()
+    return [category for category, keywords in ta.TAX_KEYWORD_CATEGORIES.items()
+            if any(kw in query_lower for kw in keywords)]
+
+
+def legacy_is_vague_query(query: str) -> bool:
+    query_lower = query.lower().strip()
+    greetings = ['hi', 'hello', 'hey', 'good morning', 'good evening', 'good afternoon']
+    if query_lower in greetings or len(query.split()) <= 1:
+        return True
+    generic_phrases = ['hello world', 'test', 'testing', 'thanks', 'thank you', 'ok', 'okay']
+    if query_lower in generic_phrases:
+        return True
+    if len(query.split()) > 2:
+        if not any(keyword in query_lower for keyword in ta.TAX_TERMS):
+            return True
+    return False
+
+
+def legacy_suggestion_topic(query: str) -> str:
+    query_lower = query.lower()
+    if '80c' in query_lower or 'deduction' in query_lower:
+        return 'deduction'
+    elif 'regime' in query_lower:
+        return 'regime'
+    elif 'hra' in query_lower:
+        return 'hra'
+    elif 'calculate' in query_lower or 'tax' in query_lower:
+        return 'calculation'
+    return None
+
+
+def legacy_analyze_chunk_content(chunk: str) -> str:
+    chunk_lower = chunk.lower()
+    for content_type, keywords in ta.CONTENT_TYPE_KEYWORDS.items():
+        if any(word in chunk_lower for word in keywords):
+            return content_type
+    return 'general'
+
+
+def legacy_extract_section_info(chunk: str) -> str:
+    for pattern in ta.SECTION_PATTERNS:
+        match = re.search(pattern, chunk, re.IGNORECASE)
+        if match:
+            return match.group(0)
+    return "General"
+
+
+def legacy_clean_legal_text(text: str) -> str:
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
+    text = re.sub(r'(\d+)([A-Z])', r'\1 \2', text)
+    text = re.sub(r'(\d+)\s*\.\s*(\d+)', r'\1.\2', text)
+    text = re.sub(r'Page\s+\d+.*', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'Income\s+Tax\s+Act.*\d{4}', '', text, flags=re.IGNORECASE)
+    return text.strip()
+
+
+# --- Harness -------------------------------------------------------------------
+
+def load_chunks(vector_dir: str, limit: int) -> List[str]:
+    """Chunks of a vector database, without converting or modifying it"""
+    store_path = os.path.join(vector_dir, CHUNK_STORE_FILENAME)
+    if os.path.exists(store_path):
+        store = ChunkStore(store_path)
+        return [store[i] for i in range(min(limit, len(store)))]
+    legacy_path = os.path.join(vector_dir, LEGACY_CHUNKS_FILENAME)
+    if os.path.exists(legacy_path):
+        return read_legacy_chunks(legacy_path)[:limit]
+    return []
+
+
+def time_per_call(fn: Callable, inputs: List[str], repeat: int) -> float:
+    """Best-of-repeat microseconds per call"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in inputs:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(inputs) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text_analysis against the previous implementations")
+    parser.add_argument('--vector-dir', default="vector_database/ITA_primary_vectors",
+                        help="Database whose chunks are used as ingestion input")
+    parser.add_argument('--chunks', type=int, default=2000, help="Maximum number of chunks to use")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.vector_dir, args.chunks)
+    if not chunks:
+        print(f"⚠️ No chunks in {args.vector_dir}, using the sample queries as chunks")
+        chunks = SAMPLE_QUERIES * 10
+    queries = SAMPLE_QUERIES * 50
+
+    cases = [
+        ("enhance_query categories", queries, legacy_enhance_categories, ta.TAX_KEYWORDS.categories),
+        ("is_vague_query", queries, legacy_is_vague_query, ta.is_vague_query),
+        ("suggestion topic", queries, legacy_suggestion_topic, ta.suggestion_topic),
+        ("analyze_chunk_content", chunks, legacy_analyze_chunk_content, ta.classify_content),
+        ("extract_section_info", chunks, legacy_extract_section_info,
+         lambda chunk: ta.find_section_reference(chunk) or "General"),
+        ("clean_legal_text", chunks, legacy_clean_legal_text, ta.clean_legal_text),
+    ]
+
+    print(f"📊 {len(queries)} queries, {len(chunks)} chunks, best of {args.repeat}")
+    print(f"{'path':<26} {'before µs':>10} {'after µs':>10} {'speedup':>8}")
+    print("-" * 58)
+    for name, inputs, before, after in cases:
+        mismatches = sum(1 for text in inputs if before(text) != after(text))
+        if mismatches:
+            print(f"❌ {name}: {mismatches} results differ from the previous implementation")
+            sys.exit(1)
+        before_us = time_per_call(before, inputs, args.repeat)
+        after_us = time_per_call(after, inputs, args.repeat)
+        print(f"{name:<26} {before_us:>10.2f} {after_us:>10.2f} {before_us / after_us:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
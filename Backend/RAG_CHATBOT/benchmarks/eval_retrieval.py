@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality vs latency evaluation against gold questions
+Every gold question lists the pages that answer it. For each configuration
+(encoder x chunk size x FAISS index type) the corpus is chunked, embedded and
+indexed, then every question is retrieved and scored:
+
+    recall@k   share of a question's gold pages among the pages of the top k chunks
+    MRR        mean reciprocal rank of the first chunk from a gold page (top 10)
+    latency    mean and p95 of query encode + search
+    memory     serialized index plus chunk text
+
+and configurations that no other configuration beats on recall, p95 latency
+and memory at once are marked as Pareto-optimal.
+
+Corpora:
+    guide      comprehensive_tax_guide.pdf with hand-written questions (GUIDE_GOLD)
+    synthetic  the generated corpus of create_comprehensive_pdf.py; questions are
+               derived from each section's number, definition, limit and penalty
+    ita        ITA_primary pages rebuilt from its chunk store; questions are the
+               section headings found in the text
+--gold FILE replaces the built-in questions with a JSON list of
+{"question": ..., "pages": [...]}.
+
+Usage (from Backend/RAG_CHATBOT):
+    python3 benchmarks/eval_retrieval.py --corpus ita --chunk-sizes 400 800 --index-types Flat HNSW32
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import faiss
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RAG_DIR = os.path.dirname(BENCH_DIR)
+BACKEND_DIR = os.path.dirname(RAG_DIR)
+sys.path.insert(0, RAG_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from text_chunker import OffsetTextSplitter
+from chunk_store import CHUNK_STORE_FILENAME, LEGACY_CHUNKS_FILENAME, ChunkStore, read_legacy_chunks
+from bench_scaling import hash_embed
+from create_comprehensive_pdf import iter_synthetic_sections
+
+Page = Tuple[int, str]
+
+RECALL_KS = [1, 5, 10]
+MRR_DEPTH = 10
+
+# Questions on comprehensive_tax_guide.pdf (page 1 is the table of contents)
+GUIDE_GOLD = [
+    {'question': "What is agricultural income under section 2(1A)?", 'pages': [2]},
+    {'question': "Is income from dairy or poultry farming agricultural income?", 'pages': [2]},
+    {'question': "Is rent from residential buildings on agricultural land exempt?", 'pages': [2]},
+    {'question': "Is agricultural income exempt from income tax?", 'pages': [3]},
+    {'question': "How is tax calculated when agricultural income is combined with other income?", 'pages': [3, 7]},
+    {'question': "What are the income tax slabs under the old regime?", 'pages': [4]},
+    {'question': "What surcharge applies to income above 1 crore?", 'pages': [4]},
+    {'question': "How much is health and education cess?", 'pages': [4]},
+    {'question': "Calculate tax on an income of 12 lakh", 'pages': [4]},
+    {'question': "Who must file an income tax return?", 'pages': [5]},
+    {'question': "Which ITR form should I use for agricultural income?", 'pages': [5]},
+    {'question': "What is the due date for filing the return for audit cases?", 'pages': [5]},
+    {'question': "Which documents are required to file ITR?", 'pages': [5]},
+    {'question': "Which investments qualify for deduction under section 80C?", 'pages': [6]},
+    {'question': "How much can be claimed under 80D for parents above 60?", 'pages': [6]},
+    {'question': "What is the limit on home loan interest for a self-occupied property?", 'pages': [6]},
+    {'question': "Which agricultural expenses are deductible?", 'pages': [6]},
+    {'question': "Is income from wheat cultivation taxable?", 'pages': [7]},
+    {'question': "How is income from processing rice into flour taxed?", 'pages': [7]},
+    {'question': "Is rent from land let to tenant farmers taxable?", 'pages': [7]},
+]
+
+ITA_DOCUMENT = "ITA_primary"
+ITA_METADATA = "ITA_primary_572cd052_1759862842_metadata.json"
+SECTION_HEADING = re.compile(r'(?:^|\n)\s*(\d{1,3}[A-Z]{0,3})\.\s+([A-Z][^.\n]{10,120}?)\.?\s*[—–-]')
+
+
+# --- Corpora and gold questions --------------------------------------------------
+
+def load_guide() -> Tuple[List[Page], List[Dict]]:
+    from pdf_extraction import extract_pdf_pages
+    extraction = extract_pdf_pages(os.path.join(BACKEND_DIR, "comprehensive_tax_guide.pdf"))
+    return extraction['pages'], GUIDE_GOLD
+
+
+def load_synthetic(pages: int, seed: int) -> Tuple[List[Page], List[Dict]]:
+    """Synthetic pages (one section each) and questions on every section"""
+    corpus, gold = [], []
+    for page, (heading, blocks) in enumerate(iter_synthetic_sections(pages, seed), 1):
+        corpus.append((page, "\n".join([heading] + [line for block in blocks for line in block])))
+        number = heading.split(' - ')[0].replace('Section ', '')
+        term = re.search(r'"([^"]+)"', blocks[0][1]).group(1)
+        gold.extend([
+            {'question': f'How is "{term}" defined in section {number}?', 'pages': [page]},
+            {'question': f"What is the maximum aggregate deduction under section {number}?", 'pages': [page]},
+            {'question': f"What penalty applies for non-compliance with section {number}?", 'pages': [page]},
+        ])
+    return corpus, gold
+
+
+def load_ita() -> Tuple[List[Page], List[Dict]]:
+    """ITA_primary pages rebuilt from chunk offsets, and its section headings as questions"""
+    # Read without converting index.pkl, so the checked-in database is left untouched
+    vector_dir = os.path.join(RAG_DIR, "vector_database", f"{ITA_DOCUMENT}_vectors")
+    if os.path.exists(os.path.join(vector_dir, CHUNK_STORE_FILENAME)):
+        chunks = ChunkStore(os.path.join(vector_dir, CHUNK_STORE_FILENAME))
+    else:
+        chunks = read_legacy_chunks(os.path.join(vector_dir, LEGACY_CHUNKS_FILENAME))
+    with open(os.path.join(RAG_DIR, "document_metadata", ITA_METADATA), 'r', encoding='utf-8') as f:
+        chunks_metadata = json.load(f)['chunks_metadata']
+
+    texts = {}
+    for row, meta in enumerate(chunks_metadata):
+        text = texts.get(meta['page'], "")
+        start, chunk = meta['char_start'], chunks[row]
+        if start >= len(text):
+            text += " " * (start - len(text)) + chunk
+        elif start + len(chunk) > len(text):
+            text = text[:start] + chunk
+        texts[meta['page']] = text
+    corpus = sorted(texts.items())
+
+    gold, seen = [], set()
+    for page, text in corpus:
+        for match in SECTION_HEADING.finditer(text):
+            section, title = match.groups()
+            if section in seen:
+                continue
+            seen.add(section)
+            gold.append({'question': title.strip(), 'pages': [page], 'section': section})
+    return corpus, gold
+
+
+# --- Index construction ----------------------------------------------------------
+
+def chunk_corpus(corpus: List[Page], chunk_size: int, chunk_overlap: int) -> Tuple[List[str], np.ndarray]:
+    """Split every page; returns chunk texts and the page of each chunk"""
+    splitter = OffsetTextSplitter(chunk_size, min(chunk_overlap, chunk_size // 4))
+    texts, pages = [], []
+    for page, text in corpus:
+        for chunk in splitter.split_text(text):
+            texts.append(chunk)
+            pages.append(page)
+    return texts, np.asarray(pages)
+
+
+def build_index(spec: str, vectors: np.ndarray, nprobe: int):
+    """FAISS index from a factory string; {nlist} is replaced by 4 * sqrt(n), capped so every list gets training points"""
+    nlist = max(1, min(int(4 * np.sqrt(len(vectors))), len(vectors) // 39))
+    index = faiss.index_factory(vectors.shape[1], spec.format(nlist=nlist))
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    if hasattr(index, 'nprobe'):
+        index.nprobe = nprobe
+    return index
+
+
+def encoder_for(name: str) -> Callable[[List[str]], np.ndarray]:
+    if name == 'hash':
+        return hash_embed
+    from embedding_pool import BatchEmbedder
+    return BatchEmbedder(name).encode
+
+
+# --- Scoring -----------------------------------------------------------------------
+
+def evaluate(index, chunk_pages: np.ndarray, gold: List[Dict], encode: Callable) -> Dict:
+    """Retrieve every gold question and score recall@k, MRR and latency"""
+    depth = max(RECALL_KS + [MRR_DEPTH])
+    recalls = {k: [] for k in RECALL_KS}
+    reciprocal_ranks, latencies = [], []
+    for item in gold:
+        expected = set(item['pages'])
+        started = time.perf_counter()
+        query_vector = np.asarray(encode([item['question']]), dtype='float32')
+        _, labels = index.search(query_vector, depth)
+        latencies.append(time.perf_counter() - started)
+
+        retrieved = [int(chunk_pages[label]) for label in labels[0] if label >= 0]
+        for k in RECALL_KS:
+            recalls[k].append(len(expected.intersection(retrieved[:k])) / len(expected))
+        rank = next((position for position, page in enumerate(retrieved[:MRR_DEPTH], 1) if page in expected), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    latencies_ms = np.asarray(latencies) * 1000
+    metrics = {f'recall@{k}': round(float(np.mean(values)), 4) for k, values in recalls.items()}
+    metrics.update({
+        'mrr': round(float(np.mean(reciprocal_ranks)), 4),
+        'mean_ms': round(float(latencies_ms.mean()), 3),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3)
+    })
+    return metrics
+
+
+def pareto_front(results: List[Dict], recall_key: str) -> List[bool]:
+    """True for configurations no other one matches or beats on recall, p95 latency and memory"""
+    def dominates(a, b):
+        better_or_equal = (a[recall_key] >= b[recall_key] and a['p95_ms'] <= b['p95_ms']
+                           and a['memory_mb'] <= b['memory_mb'])
+        strictly = (a[recall_key] > b[recall_key] or a['p95_ms'] < b['p95_ms']
+                    or a['memory_mb'] < b['memory_mb'])
+        return better_or_equal and strictly
+    return [not any(dominates(other, result) for other in results if other is not result) for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality against latency and memory")
+    parser.add_argument('--corpus', choices=['guide', 'synthetic', 'ita'], default='guide', help="Evaluation corpus")
+    parser.add_argument('--gold', default=None, help="JSON list of {question, pages} replacing the built-in questions")
+    parser.add_argument('--pages', type=int, default=200, help="Pages of the synthetic corpus")
+    parser.add_argument('--max-questions', type=int, default=200, help="Sample at most this many questions")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic corpus and question sample")
+    parser.add_argument('--encoders', nargs='+', default=["all-MiniLM-L6-v2"],
+                        help="sentence-transformers models ('hash' = random-vector floor)")
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[400, 800, 1200], help="Splitter chunk sizes")
+    parser.add_argument('--chunk-overlap', type=int, default=150, help="Chunk overlap (at most a quarter of the size)")
+    parser.add_argument('--index-types', nargs='+', default=["Flat", "HNSW32", "IVF{nlist},Flat"],
+                        help="faiss.index_factory strings")
+    parser.add_argument('--nprobe', type=int, default=8, help="Lists searched by IVF indexes")
+    parser.add_argument('--recall-k', type=int, default=5, choices=RECALL_KS, help="Recall used for the Pareto front")
+    parser.add_argument('--output', default=None, help="Write JSON results here")
+    args = parser.parse_args()
+
+    print(f"📚 Loading {args.corpus} corpus...", file=sys.stderr)
+    if args.corpus == 'synthetic':
+        corpus, gold = load_synthetic(args.pages, args.seed)
+    elif args.corpus == 'ita':
+        corpus, gold = load_ita()
+    else:
+        corpus, gold = load_guide()
+    if args.gold:
+        with open(args.gold, 'r', encoding='utf-8') as f:
+            gold = json.load(f)
+    if len(gold) > args.max_questions:
+        gold = random.Random(args.seed).sample(gold, args.max_questions)
+    print(f"   {len(corpus)} pages, {len(gold)} questions", file=sys.stderr)
+
+    results = []
+    for encoder_name in args.encoders:
+        encode = encoder_for(encoder_name)
+        for chunk_size in args.chunk_sizes:
+            texts, chunk_pages = chunk_corpus(corpus, chunk_size, args.chunk_overlap)
+            started = time.perf_counter()
+            vectors = np.ascontiguousarray(encode(texts), dtype='float32')
+            embed_seconds = time.perf_counter() - started
+            chunk_mb = sum(len(text.encode('utf-8')) for text in texts) / 1e6
+
+            for spec in args.index_types:
+                print(f"📊 {encoder_name} / chunk {chunk_size} / {spec} ({len(texts)} chunks)...", file=sys.stderr)
+                started = time.perf_counter()
+                index = build_index(spec, vectors, args.nprobe)
+                build_seconds = time.perf_counter() - started
+                index_mb = faiss.serialize_index(index).nbytes / 1e6
+                result = {
+                    'encoder': encoder_name,
+                    'chunk_size': chunk_size,
+                    'index_type': spec,
+                    'chunks': len(texts),
+                    'embed_seconds': round(embed_seconds, 3),
+                    'build_seconds': round(build_seconds, 3),
+                    'index_mb': round(index_mb, 3),
+                    'memory_mb': round(index_mb + chunk_mb, 3)
+                }
+                result.update(evaluate(index, chunk_pages, gold, encode))
+                results.append(result)
+
+    recall_key = f'recall@{args.recall_k}'
+    for result, optimal in zip(results, pareto_front(results, recall_key)):
+        result['pareto'] = optimal
+
+    header = (f"{'':2}{'encoder':<22} {'chunk':>6} {'index':<16} {'R@1':>6} {'R@5':>6} {'R@10':>6} "
+              f"{'MRR':>6} {'mean ms':>8} {'p95 ms':>8} {'mem MB':>8}")
+    print(f"\n{header}", file=sys.stderr)
+    for result in sorted(results, key=lambda r: (-r[recall_key], r['p95_ms'])):
+        print(f"{'★' if result['pareto'] else ' ':2}{result['encoder'][:22]:<22} {result['chunk_size']:>6} "
+              f"{result['index_type'][:16]:<16} {result['recall@1']:>6.3f} {result['recall@5']:>6.3f} "
+              f"{result['recall@10']:>6.3f} {result['mrr']:>6.3f} {result['mean_ms']:>8.2f} "
+              f"{result['p95_ms']:>8.2f} {result['memory_mb']:>8.2f}", file=sys.stderr)
+    print(f"★ Pareto-optimal on {recall_key}, p95 latency and memory", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'corpus': args.corpus,
+                'pages': len(corpus),
+                'questions': len(gold),
+                'recall_k': args.recall_k,
+                'results': results
+            }, f, indent=2)
+        print(f"💾 Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for the RAG Flask service
+Replays a query mix against /api/rag/query (or another POST endpoint taking
+the same payload) and reports throughput, latency percentiles, the error rate
+and the server-side stage timings returned in each response.
+
+Two load models:
+    closed loop  --concurrency N workers each send the next request as soon as
+                 the previous one returns (default)
+    open loop    --rate R requests per second arrive on schedule whether or not
+                 earlier ones finished; latency is measured from the scheduled
+                 send time, so queueing delay is not hidden
+
+--start-server launches flask_server.py locally and waits for it to load its
+index, so the whole run needs no external services. Only the standard library
+is used on the client side.
+
+Usage (from Backend/RAG_CHATBOT):
+    python3 benchmarks/load_test.py --start-server --concurrency 4 --duration 30
+    python3 benchmarks/load_test.py --url http://localhost:5555 --rate 20 --requests 500
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RAG_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, RAG_DIR)
+
+from bench_retrieval import BENCH_QUERIES
+from query_trace import QUERY_STAGES
+
+DEFAULT_URL = "http://localhost:5555"
+DEFAULT_PATH = "/api/rag/query"
+
+
+def _stage_order(name: str) -> int:
+    """Query stages in pipeline order, the server's request total last"""
+    return QUERY_STAGES.index(name) if name in QUERY_STAGES else len(QUERY_STAGES)
+
+
+class LoadResults:
+    """Thread-safe collection of request outcomes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.errors = {}
+        self.stages = {}
+        self.counters = {}
+
+    def record(self, latency: float, error: Optional[str] = None, timings: Optional[Dict] = None):
+        with self._lock:
+            if error is not None:
+                self.errors[error] = self.errors.get(error, 0) + 1
+                return
+            self.latencies.append(latency)
+            if timings:
+                for name, ms in timings.get('stages_ms', {}).items():
+                    self.stages.setdefault(name, []).append(ms)
+                self.stages.setdefault('server_total', []).append(timings.get('total_ms', 0.0))
+                for name, value in timings.get('counters', {}).items():
+                    self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self, wall_seconds: float) -> Dict:
+        completed = len(self.latencies)
+        failed = sum(self.errors.values())
+        latencies_ms = np.asarray(self.latencies) * 1000
+        latency = {}
+        if completed:
+            latency = {
+                'mean_ms': round(float(latencies_ms.mean()), 2),
+                'p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+                'p95_ms': round(float(np.percentile(latencies_ms, 95)), 2),
+                'p99_ms': round(float(np.percentile(latencies_ms, 99)), 2),
+                'max_ms': round(float(latencies_ms.max()), 2)
+            }
+        return {
+            'requests': completed + failed,
+            'completed': completed,
+            'failed': failed,
+            'error_rate': round(failed / max(completed + failed, 1), 4),
+            'errors': dict(self.errors),
+            'wall_seconds': round(wall_seconds, 3),
+            'throughput_rps': round(completed / wall_seconds, 2) if wall_seconds > 0 else None,
+            'latency': latency,
+            'server_stages': {
+                name: {
+                    'mean_ms': round(float(np.mean(values)), 3),
+                    'p50_ms': round(float(np.percentile(values, 50)), 3),
+                    'p95_ms': round(float(np.percentile(values, 95)), 3),
+                    'share_of_requests': round(len(values) / max(completed, 1), 3)
+                }
+                for name, values in sorted(self.stages.items(), key=lambda item: _stage_order(item[0]))
+            },
+            'server_counters': dict(self.counters)
+        }
+
+
+def send_query(url: str, payload: Dict, timeout: float) -> Dict:
+    """POST one query and return the decoded response; raises on HTTP or API errors"""
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        body = json.loads(response.read().decode('utf-8'))
+    if not body.get('success', False):
+        raise RuntimeError(body.get('error_type') or 'api_error')
+    return body
+
+
+def run_request(url: str, payload: Dict, timeout: float, results: LoadResults, scheduled: float):
+    """Send one request and record its outcome, timing from the scheduled send time"""
+    try:
+        body = send_query(url, payload, timeout)
+    except urllib.error.HTTPError as e:
+        results.record(0.0, f"http_{e.code}")
+    except urllib.error.URLError as e:
+        # A connect timeout arrives wrapped in URLError
+        if isinstance(e.reason, (socket.timeout, TimeoutError)):
+            results.record(0.0, "timeout")
+        else:
+            # Label by exception type, like os_error, so messages naming hosts or ports do not split the tally
+            reason = e.reason if isinstance(e.reason, str) else type(e.reason).__name__
+            results.record(0.0, f"connection: {reason}")
+    except (socket.timeout, TimeoutError):
+        results.record(0.0, "timeout")
+    except OSError as e:
+        results.record(0.0, f"os_error: {type(e).__name__}")
+    except (RuntimeError, ValueError) as e:
+        results.record(0.0, str(e))
+    else:
+        results.record(time.perf_counter() - scheduled, timings=body.get('data', {}).get('stage_timings'))
+
+
+class QueryMix:
+    """Endless, thread-safe sequence of request payloads drawn from a query list"""
+
+    def __init__(self, queries: List[str], extra: Dict, shuffle: bool, bust_cache: bool, seed: int):
+        self.queries = queries
+        self.extra = extra
+        self.shuffle = shuffle
+        self.bust_cache = bust_cache
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sent = 0
+
+    def next_payload(self) -> Dict:
+        with self._lock:
+            n = self._sent
+            self._sent += 1
+            query = self._rng.choice(self.queries) if self.shuffle else self.queries[n % len(self.queries)]
+        if self.bust_cache:
+            # A distinct suffix defeats the server's query cache
+            query = f"{query} (request {n})"
+        return dict(self.extra, query=query)
+
+
+def closed_loop(url: str, mix: QueryMix, concurrency: int, deadline: float, limit: Optional[int],
+                timeout: float, results: LoadResults):
+    """concurrency workers, each sending back-to-back requests until the deadline or limit"""
+    remaining = [limit]
+    lock = threading.Lock()
+
+    def worker():
+        while time.perf_counter() < deadline:
+            with lock:
+                if remaining[0] is not None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            run_request(url, mix.next_payload(), timeout, results, time.perf_counter())
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def open_loop(url: str, mix: QueryMix, rate: float, deadline: float, limit: Optional[int],
+              timeout: float, results: LoadResults, max_in_flight: int, poisson: bool, seed: int):
+    """Requests arrive at rate per second (evenly spaced or Poisson) regardless of completions"""
+    rng = random.Random(seed)
+    next_send = time.perf_counter()
+    sent = 0
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        while next_send < deadline and (limit is None or sent < limit):
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(run_request, url, mix.next_payload(), timeout, results, next_send)
+            sent += 1
+            next_send += rng.expovariate(rate) if poisson else 1.0 / rate
+
+
+def start_server(port: int, ready_timeout: float) -> subprocess.Popen:
+    """Launch flask_server.py on a local port and wait until its chatbot is loaded"""
+    env = dict(os.environ, FLASK_PORT=str(port), RAG_HOT_RELOAD='false')
+    process = subprocess.Popen([sys.executable, 'flask_server.py'], cwd=RAG_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + ready_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"flask_server.py exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/health", timeout=2) as response:
+                if json.loads(response.read().decode('utf-8')).get('chatbot_ready'):
+                    return process
+        except (urllib.error.URLError, OSError, ValueError):
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"flask_server.py did not become ready within {ready_timeout:.0f}s")
+
+
+def load_queries(path: Optional[str]) -> List[str]:
+    """Query mix from a file (JSON list or one query per line), or the benchmark queries"""
+    if path is None:
+        return list(BENCH_QUERIES)
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        return [item['question'] if isinstance(item, dict) else item for item in json.loads(text)]
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the RAG Flask service")
+    parser.add_argument('--url', default=DEFAULT_URL, help="Server base URL")
+    parser.add_argument('--path', default=DEFAULT_PATH, help="Query endpoint")
+    parser.add_argument('--start-server', action='store_true', help="Launch flask_server.py locally for the run")
+    parser.add_argument('--port', type=int, default=5599, help="Port for --start-server")
+    parser.add_argument('--ready-timeout', type=float, default=300, help="Seconds to wait for --start-server")
+    parser.add_argument('--concurrency', type=int, default=4, help="Closed-loop workers")
+    parser.add_argument('--rate', type=float, default=None, help="Open-loop arrival rate in requests/s")
+    parser.add_argument('--poisson', action='store_true', help="Poisson arrivals instead of evenly spaced (open loop)")
+    parser.add_argument('--max-in-flight', type=int, default=256, help="Concurrent requests allowed in open loop")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run")
+    parser.add_argument('--requests', type=int, default=None, help="Stop after this many requests")
+    parser.add_argument('--warmup', type=int, default=5, help="Untimed requests sent first")
+    parser.add_argument('--queries', default=None, help="Query mix file (JSON list or one per line)")
+    parser.add_argument('--shuffle', action='store_true', help="Draw queries at random instead of in order")
+    parser.add_argument('--bust-cache', action='store_true', help="Make every query distinct to bypass the query cache")
+    parser.add_argument('--top-k', type=int, default=5, help="top_k sent with each query")
+    parser.add_argument('--no-context', action='store_true', help="Send use_context=false")
+    parser.add_argument('--payload', default=None, help="Extra JSON fields for each request, e.g. '{\"mmr_lambda\": 0.7}'")
+    parser.add_argument('--timeout', type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--output', default=None, help="Write JSON results here")
+    args = parser.parse_args()
+
+    extra = {'top_k': args.top_k}
+    if args.no_context:
+        extra['use_context'] = False
+    if args.payload:
+        extra.update(json.loads(args.payload))
+    mix = QueryMix(load_queries(args.queries), extra, args.shuffle, args.bust_cache, args.seed)
+
+    server = None
+    base_url = args.url
+    if args.start_server:
+        print(f"🚀 Starting flask_server.py on port {args.port}...", file=sys.stderr)
+        server = start_server(args.port, args.ready_timeout)
+        base_url = f"http://localhost:{args.port}"
+    url = base_url.rstrip('/') + args.path
+
+    try:
+        if args.warmup:
+            print(f"🔥 Warming up with {args.warmup} requests...", file=sys.stderr)
+            warmup = LoadResults()
+            for _ in range(args.warmup):
+                run_request(url, mix.next_payload(), args.timeout, warmup, time.perf_counter())
+            if warmup.errors and not warmup.latencies:
+                print(f"❌ Every warmup request failed: {warmup.errors}", file=sys.stderr)
+                sys.exit(1)
+
+        model = f"open loop at {args.rate}/s" if args.rate else f"closed loop with {args.concurrency} workers"
+        print(f"📊 Load testing {url} ({model}, {args.duration:.0f}s"
+              f"{f', {args.requests} requests max' if args.requests else ''})...", file=sys.stderr)
+        results = LoadResults()
+        started = time.perf_counter()
+        deadline = started + args.duration
+        if args.rate:
+            open_loop(url, mix, args.rate, deadline, args.requests, args.timeout, results,
+                      args.max_in_flight, args.poisson, args.seed)
+        else:
+            closed_loop(url, mix, args.concurrency, deadline, args.requests, args.timeout, results)
+        summary = results.summary(time.perf_counter() - started)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    latency = summary['latency']
+    print(f"\n✅ {summary['completed']} completed, {summary['failed']} failed "
+          f"({summary['error_rate']:.1%} errors) in {summary['wall_seconds']:.1f}s "
+          f"= {summary['throughput_rps']} req/s", file=sys.stderr)
+    if latency:
+        print(f"⏱️ Latency: mean {latency['mean_ms']:.1f} ms, p50 {latency['p50_ms']:.1f} ms, "
+              f"p95 {latency['p95_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms", file=sys.stderr)
+    for error, occurrences in summary['errors'].items():
+        print(f"   ❌ {error}: {occurrences}", file=sys.stderr)
+    if summary['server_stages']:
+        print(f"\n{'server stage':<16} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}", file=sys.stderr)
+        for name, stats in summary['server_stages'].items():
+            print(f"{name:<16} {stats['mean_ms']:>9.2f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f}",
+                  file=sys.stderr)
+    if summary['server_counters']:
+        print(f"Counters: {summary['server_counters']}", file=sys.stderr)
+
+    if args.output:
+        summary['config'] = {key: value for key, value in vars(args).items() if key != 'output'}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"💾 Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Per-stage timing and throughput reports for vector database builds
+A BuildReport accumulates the time spent in each ingestion stage (extract,
+clean, chunk, embed, index, save) and the number of items the stage handled,
+then derives rates and peak memory. Stages may run concurrently on different
+threads; nested stages on the same thread are timed exclusively, so the time
+of an embed call made from inside an index update is not counted twice.
+
+The report is written as JSON next to the document metadata
+(document_metadata/<name>_build_report.json) and, when live progress is
+enabled (RAG_BUILD_PROGRESS=1 or --progress), summarised on stdout while the
+build runs.
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from metadata_store import METADATA_SUFFIX
+
+REPORT_FORMAT_VERSION = 1
+REPORT_SUFFIX = "_build_report.json"
+
+# Stage order in reports, and the unit each stage counts
+STAGE_UNITS = {
+    'extract': 'pages',
+    'clean': 'pages',
+    'chunk': 'chunks',
+    'dedup': 'chunks',
+    'embed': 'embeddings',
+    'index': 'vectors',
+    'save': 'chunks'
+}
+
+# Seconds between two live progress lines
+DEFAULT_PROGRESS_INTERVAL = 5.0
+
+
+def live_progress_enabled() -> bool:
+    """Live progress requested through RAG_BUILD_PROGRESS"""
+    return os.environ.get('RAG_BUILD_PROGRESS', '').lower() in ('1', 'true', 'yes')
+
+
+def report_path_for(metadata_file_path: str) -> str:
+    """Map document_metadata/<name>_metadata.json to document_metadata/<name>_build_report.json"""
+    base = metadata_file_path
+    if base.endswith(METADATA_SUFFIX):
+        base = base[:-len(METADATA_SUFFIX)]
+    else:
+        base = os.path.splitext(base)[0]
+    return base + REPORT_SUFFIX
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """Peak resident set size of this process and of its finished child processes"""
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return {'self': None, 'children': None}
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    }
+
+
+def _rate(items: int, seconds: float) -> Optional[float]:
+    return round(items / seconds, 2) if items and seconds > 0 else None
+
+
+class BuildReport:
+    """Stage timings, item counts and throughput of one build"""
+
+    def __init__(self, document_id: str, builder: str, live: Optional[bool] = None,
+                 progress_interval: float = DEFAULT_PROGRESS_INTERVAL):
+        """
+        Args:
+            document_id (str): Document being built
+            builder (str): Script that runs the build
+            live (bool): Print progress lines while building (default: RAG_BUILD_PROGRESS)
+            progress_interval (float): Minimum seconds between two progress lines
+        """
+        self.document_id = document_id
+        self.builder = builder
+        self.live = live_progress_enabled() if live is None else live
+        self.progress_interval = progress_interval
+        self.started_at = datetime.now().isoformat()
+        self.details = {}
+        self._start = time.perf_counter()
+        self._seconds = {}
+        self._items = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_progress = self._start
+
+    def add(self, name: str, seconds: float = 0.0, items: int = 0):
+        """Add time and/or handled items to a stage"""
+        with self._lock:
+            self._seconds[name] = self._seconds.get(name, 0.0) + seconds
+            self._items[name] = self._items.get(name, 0) + items
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        """Time a block as stage name, excluding stages nested inside it"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)  # Time spent in nested stages
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.add(name, elapsed - nested, items)
+
+    def timed(self, name: str, fn: Callable[[List], object]) -> Callable[[List], object]:
+        """Wrap a function of one list argument, counting its length as items of stage name"""
+        def wrapper(items):
+            with self.stage(name, len(items)):
+                return fn(items)
+        return wrapper
+
+    def seconds(self, name: str) -> float:
+        return self._seconds.get(name, 0.0)
+
+    def items(self, name: str) -> int:
+        return self._items.get(name, 0)
+
+    def elapsed(self) -> float:
+        """Wall-clock seconds since the build started"""
+        return time.perf_counter() - self._start
+
+    def progress(self, name: str, total: Optional[int] = None):
+        """Print a progress line for a stage when live progress is on (rate limited)"""
+        if not self.live:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            if now - self._last_progress < self.progress_interval:
+                return
+            self._last_progress = now
+        done = self.items(name)
+        unit = STAGE_UNITS.get(name, 'items')
+        of_total = f"/{total}" if total else ""
+        rate = _rate(done, self.seconds(name))
+        rss = peak_rss_mb()['self']
+        print(f"   ⏱️ {name}: {done}{of_total} {unit}"
+              f"{f' ({rate}/s)' if rate else ''}, {now - self._start:.1f}s elapsed"
+              f"{f', peak RSS {rss:.0f} MB' if rss else ''}")
+
+    def to_dict(self) -> Dict:
+        """Machine-readable report (see module docstring)"""
+        wall_seconds = self.elapsed()
+        names = [name for name in STAGE_UNITS if name in self._seconds]
+        names += sorted(name for name in self._seconds if name not in STAGE_UNITS)
+        stages = {}
+        for name in names:
+            seconds = self._seconds[name]
+            items = self._items.get(name, 0)
+            stages[name] = {
+                'seconds': round(seconds, 3),
+                'items': items,
+                'unit': STAGE_UNITS.get(name, 'items'),
+                'per_second': _rate(items, seconds),
+                'share': round(seconds / wall_seconds, 3) if wall_seconds > 0 else None
+            }
+        return {
+            'format_version': REPORT_FORMAT_VERSION,
+            'document_id': self.document_id,
+            'builder': self.builder,
+            'started_at': self.started_at,
+            'finished_at': datetime.now().isoformat(),
+            'wall_seconds': round(wall_seconds, 3),
+            'throughput': {
+                'pages_per_second': _rate(self.items('extract'), wall_seconds),
+                'chunks_per_second': _rate(self.items('chunk'), wall_seconds),
+                'embeddings_per_second': _rate(self.items('embed'), wall_seconds)
+            },
+            'stages': stages,
+            'peak_rss_mb': peak_rss_mb(),
+            'cpu_count': os.cpu_count(),
+            'details': self.details
+        }
+
+    def summary(self) -> str:
+        """One line per stage for the end-of-build printout"""
+        report = self.to_dict()
+        lines = [f"⏱️ Build stages ({report['wall_seconds']:.2f}s wall, "
+                 f"peak RSS {report['peak_rss_mb']['self']} MB):"]
+        for name, stage in report['stages'].items():
+            rate = f", {stage['per_second']} {stage['unit']}/s" if stage['per_second'] else ""
+            lines.append(f"   {name:<8} {stage['seconds']:>9.2f}s  {stage['items']:>8} {stage['unit']}{rate}")
+        return "\n".join(lines)
+
+    def write(self, metadata_file_path: str) -> str:
+        """Write the report next to a document's metadata file and return its path"""
+        path = report_path_for(metadata_file_path)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".report_", suffix=".json")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
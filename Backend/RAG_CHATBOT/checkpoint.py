@@ -0,0 +1,179 @@
+"""
+Checkpoints for resumable vectorization runs
+A build writes each finished stage (extracted pages, chunks) and every embedded
+batch to a work directory. Re-running with --resume continues from the last
+completed stage or batch instead of starting over. A fingerprint of the input
+file and build settings guards against resuming with stale checkpoints, and the
+work directory is removed once the database has been written.
+
+Layout of <work dir>/<document id>/:
+    fingerprint.json          inputs and settings the checkpoints belong to
+    <stage>.bin / .json       texts (chunk store format) and info of a stage
+    embeddings/<digest>.npy   vectors of one embedded batch, keyed by its texts
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from chunk_store import ChunkStore, ChunkStoreWriter
+
+DEFAULT_CHECKPOINT_DIR = os.environ.get('RAG_CHECKPOINT_DIR', "build_checkpoints")
+
+# Texts per checkpointed embedding batch
+CHECKPOINT_BATCH_SIZE = 1024
+
+
+def _write_json_atomic(path: str, data: Dict):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".ckpt_", suffix=".json")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def input_fingerprint(path: str, **settings) -> Dict:
+    """Identify an input file and the build settings applied to it"""
+    stat = os.stat(path)
+    return {
+        'input': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'settings': settings
+    }
+
+
+class BuildCheckpoint:
+    """Stage and embedding-batch checkpoints of one build"""
+
+    def __init__(self, document_id: str, fingerprint: Dict, resume: bool = False,
+                 work_dir: str = DEFAULT_CHECKPOINT_DIR):
+        """
+        Open the checkpoint directory of a build
+
+        Args:
+            document_id (str): Document being built (one directory per document)
+            fingerprint (Dict): Inputs and settings, see input_fingerprint()
+            resume (bool): Keep matching checkpoints of an earlier run; otherwise start empty
+            work_dir (str): Parent directory of all build checkpoints
+        """
+        self.path = os.path.join(work_dir, document_id)
+        self.fingerprint = json.loads(json.dumps(fingerprint))
+        self.resumed = False
+
+        fingerprint_path = os.path.join(self.path, "fingerprint.json")
+        if resume and os.path.exists(fingerprint_path):
+            with open(fingerprint_path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+            if previous == self.fingerprint:
+                self.resumed = True
+            else:
+                print(f"⚠️ Checkpoints in {self.path} belong to different inputs or settings, starting over")
+
+        if not self.resumed and os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.makedirs(os.path.join(self.path, "embeddings"), exist_ok=True)
+        _write_json_atomic(fingerprint_path, self.fingerprint)
+
+        if self.resumed:
+            stages = [name for name in ("pages", "chunks") if self.has_stage(name)]
+            print(f"♻️ Resuming from {self.path}: completed stages {stages or 'none'}, "
+                  f"{self.embedded_batch_count()} embedded batches")
+
+    # --- Text stages (pages, chunks) -----------------------------------------
+
+    def _stage_paths(self, name: str) -> Tuple[str, str]:
+        return os.path.join(self.path, f"{name}.bin"), os.path.join(self.path, f"{name}.json")
+
+    def has_stage(self, name: str) -> bool:
+        """True if the stage was completed (its info file is written last)"""
+        texts_path, info_path = self._stage_paths(name)
+        return os.path.exists(texts_path) and os.path.exists(info_path)
+
+    def stage_writer(self, name: str) -> ChunkStoreWriter:
+        """Writer for the texts of a stage that produces them incrementally"""
+        return ChunkStoreWriter(self._stage_paths(name)[0])
+
+    def complete_stage(self, name: str, info: Dict):
+        """Mark a stage complete once its texts are written"""
+        _write_json_atomic(self._stage_paths(name)[1], info)
+
+    def save_stage(self, name: str, texts: List[str], info: Dict):
+        """Write the texts and info of a stage in one call"""
+        with self.stage_writer(name) as writer:
+            writer.extend(texts)
+        self.complete_stage(name, info)
+
+    def load_stage(self, name: str) -> Tuple[ChunkStore, Dict]:
+        """Texts (memory-mapped) and info of a completed stage"""
+        texts_path, info_path = self._stage_paths(name)
+        with open(info_path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        return ChunkStore(texts_path), info
+
+    # --- Embedding batches -----------------------------------------------------
+
+    def _batch_path(self, texts: List[str]) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for text in texts:
+            digest.update(text.encode('utf-8'))
+            digest.update(b"\0")
+        return os.path.join(self.path, "embeddings", f"{digest.hexdigest()}.npy")
+
+    def embedded_batch_count(self) -> int:
+        return sum(1 for name in os.listdir(os.path.join(self.path, "embeddings")) if name.endswith(".npy"))
+
+    def embed(self, texts: List[str], embed_fn: Callable[[List[str]], object],
+              batch_size: int = CHECKPOINT_BATCH_SIZE) -> np.ndarray:
+        """
+        Embed texts batch by batch, saving every batch and reusing saved ones
+
+        Args:
+            texts (List[str]): Texts to embed
+            embed_fn (Callable): Embeds a list of texts, returning a (n, dim) array-like
+            batch_size (int): Texts per checkpointed batch
+
+        Returns:
+            np.ndarray: float32 embeddings in input order
+        """
+        parts = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            path = self._batch_path(batch)
+            if os.path.exists(path):
+                vectors = np.load(path)
+                if len(vectors) == len(batch):
+                    parts.append(vectors)
+                    continue
+            vectors = np.asarray(embed_fn(batch), dtype='float32')
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".batch_", suffix=".npy")
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, vectors)
+            os.replace(tmp_path, path)
+            parts.append(vectors)
+
+        if not parts:
+            return np.empty((0, 0), dtype='float32')
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    def embed_fn(self, embed_fn: Callable[[List[str]], object]) -> Callable[[List[str]], np.ndarray]:
+        """Wrap an embedding function so its batches are checkpointed"""
+        return lambda texts: self.embed(texts, embed_fn)
+
+    def clear(self):
+        """Remove the checkpoints after a successful build"""
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+
+
+def open_build_checkpoint(document_id: str, fingerprint: Dict, resume: bool = False,
+                          work_dir: Optional[str] = DEFAULT_CHECKPOINT_DIR) -> Optional[BuildCheckpoint]:
+    """Open the checkpoints of a build, or return None when checkpointing is disabled (work_dir=None)"""
+    if not work_dir:
+        return None
+    return BuildCheckpoint(document_id, fingerprint, resume, work_dir)
@@ -0,0 +1,305 @@
+"""
+Compact on-disk chunk store for the RAG vector databases
+Keeps every chunk of a document as one UTF-8 blob plus an offsets array.
+The file is memory-mapped at load time and chunks are decoded lazily per hit,
+so loading is O(1) and no LangChain objects are needed to read the chunks.
+
+File layout (little-endian, format version 1):
+    header   8s magic | u32 version | u32 flags | u64 count
+    offsets  u64[count + 1]   byte offsets of each chunk inside the blob
+    blob     concatenated UTF-8 encoded chunk texts
+"""
+
+import os
+import mmap
+import pickle
+import shutil
+import struct
+import tempfile
+from array import array
+from typing import Iterable, List, Sequence, Union
+
+import numpy as np
+
+CHUNK_STORE_FILENAME = "chunks.bin"
+LEGACY_CHUNKS_FILENAME = "index.pkl"
+CHUNK_STORE_MAGIC = b"RAGCHNK\0"
+CHUNK_STORE_VERSION = 1
+
+_HEADER = struct.Struct("<8sIIQ")
+
+
+class ChunkStoreWriter:
+    """Streaming writer for the chunk store format"""
+
+    def __init__(self, path: str):
+        """
+        Open a new chunk store for writing
+
+        Args:
+            path (str): Destination file, replaced atomically on close()
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._blob = tempfile.NamedTemporaryFile(dir=directory, prefix=".chunks_blob_", delete=False)
+        self._offsets = array('Q', [0])
+        self._closed = False
+
+    def append(self, text: str):
+        """Append one chunk to the store"""
+        encoded = (text or "").encode('utf-8')
+        self._blob.write(encoded)
+        self._offsets.append(self._offsets[-1] + len(encoded))
+
+    def extend(self, texts: Iterable[str]):
+        """Append several chunks to the store"""
+        for text in texts:
+            self.append(text)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def close(self) -> str:
+        """Write header and offsets, then move the finished file into place"""
+        if self._closed:
+            return self.path
+        self._closed = True
+        self._blob.flush()
+        self._blob.seek(0)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".chunks_")
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(_HEADER.pack(CHUNK_STORE_MAGIC, CHUNK_STORE_VERSION, 0, len(self)))
+                offsets = np.frombuffer(self._offsets, dtype=np.uint64).astype('<u8', copy=False)
+                out.write(offsets.tobytes())
+                shutil.copyfileobj(self._blob, out)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            self._blob.close()
+            os.remove(self._blob.name)
+
+        return self.path
+
+    def abort(self):
+        """Discard everything written so far, leaving any existing store untouched"""
+        if self._closed:
+            return
+        self._closed = True
+        self._blob.close()
+        os.remove(self._blob.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ChunkStore(Sequence):
+    """Read-only, memory-mapped view over a chunk store file"""
+
+    def __init__(self, path: str):
+        """
+        Memory-map a chunk store file
+
+        Args:
+            path (str): Path to a chunks.bin file
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Chunk store is empty or truncated: {path}")
+
+        if len(self._mmap) < _HEADER.size:
+            self.close()
+            raise ValueError(f"Chunk store is empty or truncated: {path}")
+
+        magic, version, _flags, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != CHUNK_STORE_MAGIC:
+            self.close()
+            raise ValueError(f"Not a chunk store file: {path}")
+        if version != CHUNK_STORE_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported chunk store version {version} in {path}")
+
+        self._count = count
+        self._offsets = np.frombuffer(self._mmap, dtype='<u8', count=count + 1, offset=_HEADER.size)
+        self._blob_start = _HEADER.size + 8 * (count + 1)
+
+        if self._blob_start + int(self._offsets[-1]) > len(self._mmap):
+            self.close()
+            raise ValueError(f"Chunk store is truncated: {path}")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+
+        index = int(index)
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("chunk index out of range")
+
+        start = self._blob_start + int(self._offsets[index])
+        end = self._blob_start + int(self._offsets[index + 1])
+        return self._mmap[start:end].decode('utf-8')
+
+    def chunk_length(self, index: int) -> int:
+        """Encoded byte length of a chunk without decoding it"""
+        return int(self._offsets[index + 1] - self._offsets[index])
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the mapped file in bytes"""
+        return len(self._mmap) if self._mmap is not None else 0
+
+    def close(self):
+        """Release the memory map and file handle"""
+        self._offsets = None
+        if getattr(self, '_mmap', None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def write_chunk_store(path: str, chunks: Iterable[str]) -> str:
+    """
+    Write a complete chunk store in one call
+
+    Args:
+        path (str): Destination file (usually <vector_dir>/chunks.bin)
+        chunks (Iterable[str]): Chunk texts in FAISS index order
+
+    Returns:
+        str: Path of the written file
+    """
+    writer = ChunkStoreWriter(path)
+    with writer:
+        writer.extend(chunks)
+    return path
+
+
+def read_legacy_chunks(pkl_path: str) -> List[str]:
+    """
+    Read chunk texts from a legacy index.pkl file
+
+    Handles both the LangChain (docstore, index_to_id) tuple and the plain list
+    written by older versions of rebuild_vector_db.py.
+    """
+    with open(pkl_path, 'rb') as f:
+        data = pickle.load(f)
+
+    if isinstance(data, tuple) and len(data) == 2:
+        docstore, index_to_id = data
+        documents = getattr(docstore, '_dict', {})
+        chunks = []
+        for i in range(len(index_to_id)):
+            doc_id = index_to_id.get(i)
+            doc = documents.get(doc_id) if doc_id is not None else None
+            chunks.append(doc.page_content if doc is not None else "")
+        return chunks
+
+    if isinstance(data, list):
+        return [str(chunk) for chunk in data]
+
+    raise ValueError(f"Unrecognised chunk pickle format in {pkl_path}")
+
+
+def convert_legacy_chunks(vector_dir: str) -> str:
+    """
+    One-time conversion of <vector_dir>/index.pkl into <vector_dir>/chunks.bin
+
+    Returns:
+        str: Path of the written chunk store
+    """
+    pkl_path = os.path.join(vector_dir, LEGACY_CHUNKS_FILENAME)
+    store_path = os.path.join(vector_dir, CHUNK_STORE_FILENAME)
+    chunks = read_legacy_chunks(pkl_path)
+    return write_chunk_store(store_path, chunks)
+
+
+def open_chunk_store(vector_dir: str) -> Union[ChunkStore, List[str]]:
+    """
+    Open the chunks of a vector database, converting index.pkl on first use
+
+    The converted chunks.bin is reused until index.pkl is rewritten by a newer
+    build. If the directory is read-only the legacy chunks are returned as a list.
+
+    Args:
+        vector_dir (str): Directory of a *_vectors database
+
+    Returns:
+        ChunkStore or List[str]: Sequence of chunk texts in FAISS index order
+    """
+    store_path = os.path.join(vector_dir, CHUNK_STORE_FILENAME)
+    pkl_path = os.path.join(vector_dir, LEGACY_CHUNKS_FILENAME)
+
+    stale = (
+        os.path.exists(store_path) and os.path.exists(pkl_path)
+        and os.path.getmtime(pkl_path) > os.path.getmtime(store_path)
+    )
+
+    if not os.path.exists(store_path) or stale:
+        if not os.path.exists(pkl_path):
+            raise FileNotFoundError(f"No chunk store or index.pkl in {vector_dir}")
+        try:
+            print(f"🔄 Converting {pkl_path} to compact chunk store...")
+            convert_legacy_chunks(vector_dir)
+        except OSError as e:
+            print(f"⚠️ Could not write chunk store ({e}), loading chunks from pickle")
+            return read_legacy_chunks(pkl_path)
+
+    return ChunkStore(store_path)
+
+
+def main():
+    """Convert every vector database under vector_database/ to the chunk store format"""
+    import sys
+
+    vector_db_path = sys.argv[1] if len(sys.argv) > 1 else "vector_database"
+    if not os.path.exists(vector_db_path):
+        print(f"❌ Vector database directory not found: {vector_db_path}")
+        return
+
+    for name in sorted(os.listdir(vector_db_path)):
+        vector_dir = os.path.join(vector_db_path, name)
+        if not name.endswith('_vectors') or not os.path.isdir(vector_dir):
+            continue
+        if not os.path.exists(os.path.join(vector_dir, LEGACY_CHUNKS_FILENAME)):
+            print(f"⏭️ {name}: no index.pkl, skipping")
+            continue
+        try:
+            store_path = convert_legacy_chunks(vector_dir)
+            store = ChunkStore(store_path)
+            print(f"✅ {name}: {len(store)} chunks, {store.nbytes / 1024:.1f} KB")
+            store.close()
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Index-time near-duplicate chunk detection (MinHash + LSH)
+Each chunk is reduced to a MinHash signature over its word shingles; signatures
+are bucketed by LSH bands, so only chunks sharing a band are compared. A chunk
+whose estimated Jaccard similarity to an earlier chunk reaches the threshold is
+a near-duplicate: it is left out of the index and linked to the earlier
+(canonical) chunk, whose metadata records the pages the duplicates came from.
+
+Databases built this way carry 'deduplicated' in their manifest, which lets the
+chatbots skip query-time duplicate filtering.
+"""
+
+import re
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_DEDUP_THRESHOLD = 0.85
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+SHINGLE_SIZE = 5
+
+# Mersenne prime for the universal hash family h(x) = (a*x + b) mod p
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_WORD = re.compile(r'\w+')
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> List[str]:
+    """Overlapping word n-grams of lowercased text (the whole text if it is shorter)"""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return [' '.join(words)]
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+class MinHasher:
+    """MinHash signatures with a fixed, seeded set of hash permutations"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        # Kept below 2**32 so a*x + b fits in uint64 for 32-bit shingle hashes
+        self._a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """uint32 MinHash signature of a text"""
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in set(shingles(text, self.shingle_size))),
+            dtype=np.uint64
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+def estimated_similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Jaccard similarity estimated from two signatures"""
+    return float(np.mean(first == second))
+
+
+class NearDuplicateIndex:
+    """Streaming near-duplicate detector: the first of a group of similar texts is canonical"""
+
+    def __init__(self, threshold: float = DEFAULT_DEDUP_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                 bands: int = DEFAULT_BANDS):
+        """
+        Args:
+            threshold (float): Estimated Jaccard similarity from which a text is a duplicate
+            num_perm (int): Signature length; must be divisible by bands
+            bands (int): LSH bands; more bands find less similar candidates
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+        self.checked = 0
+        self.duplicates = 0
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def check(self, key, text: str):
+        """
+        Return the canonical key text duplicates, or register text as canonical and return None
+
+        Args:
+            key: Identifier of the text (e.g. its chunk number)
+            text (str): Text to check
+        """
+        self.checked += 1
+        signature = self.hasher.signature(text)
+        band_keys = self._band_keys(signature)
+
+        best_key, best_similarity = None, self.threshold
+        seen = set()
+        for buckets, band_key in zip(self._buckets, band_keys):
+            for candidate in buckets.get(band_key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = estimated_similarity(signature, self._signatures[candidate])
+                if similarity >= best_similarity:
+                    best_key, best_similarity = candidate, similarity
+
+        if best_key is not None:
+            self.duplicates += 1
+            return best_key
+
+        self._signatures[key] = signature
+        for buckets, band_key in zip(self._buckets, band_keys):
+            buckets.setdefault(band_key, []).append(key)
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            'threshold': self.threshold,
+            'checked': self.checked,
+            'duplicates': self.duplicates,
+            'kept': self.checked - self.duplicates
+        }
+
+
+def find_near_duplicates(texts: Sequence[str], threshold: float = DEFAULT_DEDUP_THRESHOLD) -> Tuple[List[int], Dict[int, int], Dict]:
+    """
+    Split texts into canonical ones and near-duplicates of earlier texts
+
+    Args:
+        texts (Sequence[str]): Texts in document order
+        threshold (float): Estimated Jaccard similarity from which a text is a duplicate
+
+    Returns:
+        Tuple: (positions of the texts to keep, {duplicate position: canonical position}, stats)
+    """
+    detector = NearDuplicateIndex(threshold)
+    keep = []
+    duplicate_of = {}
+    for position, text in enumerate(texts):
+        canonical = detector.check(position, text)
+        if canonical is None:
+            keep.append(position)
+        else:
+            duplicate_of[position] = canonical
+    return keep, duplicate_of, detector.stats()
+
+
+def link_duplicates(metadatas: List[Dict], rows: Dict, duplicates: Dict) -> None:
+    """
+    Record on canonical metadata rows the pages their dropped duplicates came from
+
+    Args:
+        metadatas (List[Dict]): Metadata rows of the kept chunks
+        rows (Dict): Canonical key -> its row in metadatas
+        duplicates (Dict): Duplicate key -> (canonical key, page of the duplicate)
+    """
+    for canonical, page in duplicates.values():
+        row = rows.get(canonical)
+        if row is None:
+            continue
+        pages = metadatas[row].setdefault('duplicate_pages', [])
+        if page not in pages:
+            pages.append(page)
@@ -7,15 +7,24 @@ for efficient retrieval in the chatbot system.
 import os
 import json
 import pickle
+import shutil
 from datetime import datetime
-from PyPDF2 import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
-import numpy as np
+from incremental_index import IncrementalIndex
+from pdf_extraction import extract_pdf_pages
+from embedding_cache import DEFAULT_CACHE_PATH, open_embedding_cache
+from embedding_pool import DEFAULT_BATCH_SIZE, BatchEmbedder
+from checkpoint import DEFAULT_CHECKPOINT_DIR, input_fingerprint, open_build_checkpoint
+from build_report import BuildReport
+from dedup import DEFAULT_DEDUP_THRESHOLD, find_near_duplicates, link_duplicates
+from metadata_store import write_document_metadata
+from index_manifest import write_index_manifest
 
 class DocumentVectorizer:
-    def __init__(self, embeddings_model="all-MiniLM-L6-v2", chunk_size=800, chunk_overlap=150):
+    def __init__(self, embeddings_model="all-MiniLM-L6-v2", chunk_size=800, chunk_overlap=150,
+                 embedding_cache_path=DEFAULT_CACHE_PATH, extraction_workers=None,
+                 embedding_processes=None, encode_batch_size=DEFAULT_BATCH_SIZE,
+                 dedup_threshold=DEFAULT_DEDUP_THRESHOLD):
         """
         Initialize the document vectorizer.
         
@@ -23,13 +32,23 @@ class DocumentVectorizer:
             embeddings_model (str): HuggingFace model for embeddings
             chunk_size (int): Size of text chunks
             chunk_overlap (int): Overlap between chunks
+            embedding_cache_path (str): SQLite embedding cache, or None to always call the model
+            extraction_workers (int): Processes for PDF text extraction (default: all cores)
+            embedding_processes (int): Encode processes (default: RAG_EMBED_PROCESSES or 1)
+            encode_batch_size (int): Texts per model forward pass
+            dedup_threshold (float): Similarity from which a chunk is dropped as a
+                near-duplicate of an earlier one, or None to keep every chunk
         """
         self.embeddings_model = embeddings_model
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.extraction_workers = extraction_workers
+        self.dedup_threshold = dedup_threshold
         
         print(f"Loading embeddings model: {embeddings_model}")
-        self.embeddings = HuggingFaceEmbeddings(model_name=embeddings_model)
+        self.embedder = BatchEmbedder(embeddings_model, batch_size=encode_batch_size,
+                                      processes=embedding_processes)
+        self.embedding_cache = open_embedding_cache(embeddings_model, embedding_cache_path)
         
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
@@ -44,30 +63,47 @@ class DocumentVectorizer:
         os.makedirs(self.vector_db_path, exist_ok=True)
         os.makedirs(self.metadata_path, exist_ok=True)
     
-    def extract_text_from_pdf(self, pdf_path):
-        """Extract text from PDF with page numbers."""
+    def embed_texts(self, texts):
+        """Embed chunks, skipping the model for chunks already in the embedding cache."""
+        if self.embedding_cache is None:
+            return self.embedder.encode(texts)
+        return self.embedding_cache.encode(texts, self.embedder.encode)
+    
+    def extract_text_from_pdf(self, pdf_path, workers=None):
+        """Extract text from PDF with page numbers, spreading pages across worker processes."""
         text_data = []
         
-        with open(pdf_path, "rb") as file:
-            pdf_reader = PdfReader(file)
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                text = page.extract_text()
-                if text.strip():  # Only add non-empty pages
-                    text_data.append({
-                        'content': text,
-                        'page': page_num,
-                        'source': os.path.basename(pdf_path)
-                    })
+        extraction = extract_pdf_pages(pdf_path, workers or self.extraction_workers)
+        for page_num, text in extraction['pages']:
+            if text.strip():  # Only add non-empty pages
+                text_data.append({
+                    'content': text,
+                    'page': page_num,
+                    'source': os.path.basename(pdf_path)
+                })
+        
+        for page_num, error in extraction['errors'].items():
+            print(f"⚠️ Failed to extract page {page_num}: {error}")
         
         return text_data
     
-    def process_document(self, pdf_path, document_id=None):
+    def process_document(self, pdf_path, document_id=None, incremental=True, resume=False,
+                         checkpoint_dir=DEFAULT_CHECKPOINT_DIR, progress=None):
         """
-        Process a single PDF document and create vector embeddings.
+        Process a single PDF document and create or update its vector embeddings.
+        
+        Re-processing a document updates its existing database in place: only
+        chunks whose text changed are embedded, stale vectors are removed.
+        Extracted pages, chunks and embedded batches are checkpointed while the
+        run is in progress, so an interrupted run can be resumed.
         
         Args:
             pdf_path (str): Path to the PDF file
             document_id (str): Optional custom ID for the document
+            incremental (bool): Reuse vectors of unchanged chunks from an existing database
+            resume (bool): Continue an interrupted run from its checkpoints
+            checkpoint_dir (str): Checkpoint work directory, or None to disable checkpointing
+            progress (bool): Print live stage throughput (default: RAG_BUILD_PROGRESS)
         
         Returns:
             str: Document ID for the processed document
@@ -75,50 +111,103 @@ class DocumentVectorizer:
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
         
-        # Generate document ID if not provided
+        # Generate a stable document ID so re-ingesting a file updates the same database
         if document_id is None:
-            document_id = f"doc_{os.path.basename(pdf_path).replace('.pdf', '')}_{int(datetime.now().timestamp())}"
+            document_id = f"doc_{os.path.basename(pdf_path).replace('.pdf', '')}"
         
         print(f"Processing document: {pdf_path}")
         print(f"Document ID: {document_id}")
+        report = BuildReport(document_id, 'document_vectorizer', live=progress)
+        
+        checkpoint = open_build_checkpoint(document_id, input_fingerprint(
+            pdf_path, builder='document_vectorizer', chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap, model=self.embeddings_model
+        ), resume, checkpoint_dir)
         
         # Extract text from PDF
-        text_data = self.extract_text_from_pdf(pdf_path)
+        if checkpoint is not None and checkpoint.has_stage('pages'):
+            page_texts, page_info = checkpoint.load_stage('pages')
+            text_data = [{'content': text, 'page': page_num, 'source': page_info['source']}
+                         for page_num, text in zip(page_info['pages'], page_texts)]
+            print(f"Using {len(text_data)} checkpointed pages")
+        else:
+            with report.stage('extract'):
+                text_data = self.extract_text_from_pdf(pdf_path)
+            report.add('extract', items=len(text_data))
+            if checkpoint is not None:
+                checkpoint.save_stage('pages', [page_data['content'] for page_data in text_data], {
+                    'pages': [page_data['page'] for page_data in text_data],
+                    'source': os.path.basename(pdf_path)
+                })
         print(f"Extracted text from {len(text_data)} pages")
         
         # Create chunks with metadata
-        all_chunks = []
-        all_metadata = []
-        
-        for page_data in text_data:
-            chunks = self.text_splitter.split_text(page_data['content'])
+        if checkpoint is not None and checkpoint.has_stage('chunks'):
+            chunk_texts, chunk_info = checkpoint.load_stage('chunks')
+            all_chunks = list(chunk_texts)
+            all_metadata = chunk_info['metadata']
+            print(f"Using {len(all_chunks)} checkpointed chunks")
+        else:
+            all_chunks = []
+            all_metadata = []
             
-            for i, chunk in enumerate(chunks):
-                all_chunks.append(chunk)
-                all_metadata.append({
-                    'document_id': document_id,
-                    'source': page_data['source'],
-                    'page': page_data['page'],
-                    'chunk_id': f"{document_id}_p{page_data['page']}_c{i}",
-                    'chunk_index': i,
-                    'processed_at': datetime.now().isoformat()
-                })
+            for page_data in text_data:
+                with report.stage('chunk'):
+                    chunks = self.text_splitter.split_text(page_data['content'])
+                report.add('chunk', items=len(chunks))
+                report.progress('chunk')
+                
+                for i, chunk in enumerate(chunks):
+                    all_chunks.append(chunk)
+                    all_metadata.append({
+                        'document_id': document_id,
+                        'source': page_data['source'],
+                        'page': page_data['page'],
+                        'chunk_id': f"{document_id}_p{page_data['page']}_c{i}",
+                        'chunk_index': i,
+                        'processed_at': datetime.now().isoformat()
+                    })
+            
+            if checkpoint is not None:
+                checkpoint.save_stage('chunks', all_chunks, {'metadata': all_metadata})
         
         print(f"Created {len(all_chunks)} text chunks")
         
-        # Create vector store
-        print("Creating vector embeddings...")
-        vector_store = FAISS.from_texts(
-            texts=all_chunks,
-            embedding=self.embeddings,
-            metadatas=all_metadata
-        )
+        # Drop near-duplicates, linking them to the chunk they duplicate
+        dedup_stats = None
+        if self.dedup_threshold:
+            with report.stage('dedup', len(all_chunks)):
+                keep, duplicate_of, dedup_stats = find_near_duplicates(all_chunks, self.dedup_threshold)
+                duplicates = {position: (canonical, all_metadata[position]['page'])
+                              for position, canonical in duplicate_of.items()}
+                rows = {position: row for row, position in enumerate(keep)}
+                all_chunks = [all_chunks[position] for position in keep]
+                all_metadata = [all_metadata[position] for position in keep]
+                link_duplicates(all_metadata, rows, duplicates)
+            print(f"Dropped {dedup_stats['duplicates']} near-duplicate chunks")
         
-        # Save vector store
+        # Update the ID-mapped index, embedding only new or changed chunks
         vector_db_file = os.path.join(self.vector_db_path, f"{document_id}_vectors")
-        vector_store.save_local(vector_db_file)
+        if not incremental and os.path.exists(vector_db_file):
+            shutil.rmtree(vector_db_file)
+        
+        print("Creating vector embeddings...")
+        vector_index = IncrementalIndex(vector_db_file)
+        embed_fn = self.embed_texts if checkpoint is None else checkpoint.embed_fn(self.embed_texts)
+        with report.stage('index'):
+            update_stats = vector_index.update(all_chunks, report.timed('embed', embed_fn))
+        report.add('index', items=update_stats['added'])
+        with report.stage('save', len(all_chunks)):
+            vector_index.save(all_chunks)
+        print(f"Embedded {update_stats['added']} new chunks, reused {update_stats['unchanged']}, "
+              f"removed {update_stats['removed']} stale vectors")
+        if self.embedding_cache is not None:
+            print(self.embedding_cache.report())
         print(f"Saved vector database to: {vector_db_file}")
         
+        for meta, content_id in zip(all_metadata, vector_index.row_ids):
+            meta['content_id'] = int(content_id)
+        
         # Save metadata
         metadata_file = os.path.join(self.metadata_path, f"{document_id}_metadata.json")
         document_metadata = {
@@ -130,31 +219,56 @@ class DocumentVectorizer:
             'chunk_overlap': self.chunk_overlap,
             'embeddings_model': self.embeddings_model,
             'processed_at': datetime.now().isoformat(),
+            'processing_time': f"{report.elapsed():.2f} seconds",
+            'index_update': update_stats,
+            'deduplication': dedup_stats,
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None,
             'chunks_metadata': all_metadata
         }
         
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(document_metadata, f, indent=2, ensure_ascii=False)
+        with report.stage('save'):
+            write_document_metadata(metadata_file, document_metadata)
+            
+            # Manifest goes last so a running server only reloads complete builds
+            write_index_manifest(vector_db_file, vector_index.index.d, vector_index.ntotal, {
+                'document_id': document_id,
+                'embedding_model': self.embeddings_model,
+                'deduplicated': dedup_stats is not None
+            })
+        
+        report.details.update({
+            'total_pages': len(text_data),
+            'total_chunks': len(all_chunks),
+            'embedding_processes': self.embedder.processes,
+            'index_update': update_stats,
+            'deduplication': dedup_stats,
+            'embedding_cache': document_metadata['embedding_cache']
+        })
+        report_file = report.write(metadata_file)
+        
+        if checkpoint is not None:
+            checkpoint.clear()
         
         print(f"Saved metadata to: {metadata_file}")
+        print(report.summary())
+        print(f"Saved build report to: {report_file}")
         print(f"✅ Successfully processed document: {document_id}")
         
         return document_id
     
     def load_vector_database(self, document_id):
-        """Load a previously created vector database."""
+        """
+        Load a previously created vector database.
+        
+        Returns:
+            IncrementalIndex: ID-mapped index whose search() returns chunk rows
+        """
         vector_db_file = os.path.join(self.vector_db_path, f"{document_id}_vectors")
         
         if not os.path.exists(vector_db_file):
             raise FileNotFoundError(f"Vector database not found: {vector_db_file}")
         
-        vector_store = FAISS.load_local(
-            vector_db_file, 
-            self.embeddings,
-            allow_dangerous_deserialization=True
-        )
-        
-        return vector_store
+        return IncrementalIndex(vector_db_file)
     
     def get_document_info(self, document_id):
         """Get metadata information about a processed document."""
@@ -190,13 +304,23 @@ class DocumentVectorizer:
 
 def main():
     """Example usage of the DocumentVectorizer."""
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Create or update the vector database of a PDF")
+    parser.add_argument('pdf_path', nargs='?', default=None, help="PDF to process")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted run from its checkpoints")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="Keep near-duplicate chunks in the index")
+    parser.add_argument('--progress', action='store_true', default=None,
+                        help="Print live stage throughput (default: RAG_BUILD_PROGRESS)")
+    args = parser.parse_args()
     
-    vectorizer = DocumentVectorizer()
+    vectorizer = DocumentVectorizer(dedup_threshold=None if args.no_dedup else DEFAULT_DEDUP_THRESHOLD)
     
     # Get PDF path from command line arguments or use default
-    if len(sys.argv) > 1:
-        pdf_path = sys.argv[1]
+    if args.pdf_path:
+        pdf_path = args.pdf_path
     else:
         pdf_path = "test_document.pdf"
         print("No PDF file specified. Using default: test_document.pdf")
@@ -204,7 +328,7 @@ def main():
     
     if os.path.exists(pdf_path):
         try:
-            doc_id = vectorizer.process_document(pdf_path)
+            doc_id = vectorizer.process_document(pdf_path, resume=args.resume, progress=args.progress)
             print(f"\n📄 Document processed successfully!")
             print(f"Document ID: {doc_id}")
             
@@ -217,6 +341,7 @@ def main():
             
         except Exception as e:
             print(f"❌ Error processing document: {e}")
+            print("💡 Completed stages are checkpointed; re-run with --resume to continue")
     else:
         print(f"❌ PDF file not found: {pdf_path}")
         print("Please create a test PDF first by running create_test_pdf.py")
@@ -226,6 +351,8 @@ def main():
     docs = vectorizer.list_processed_documents()
     for doc in docs:
         print(f"- {doc['document_id']}: {doc['source_file']} ({doc['total_chunks']} chunks)")
+    
+    vectorizer.embedder.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+Persistent content-hash embedding cache for the vectorization pipelines
+Embeddings are stored in SQLite as float16 blobs keyed by
+sha256(model name, normalised chunk text), so re-running a build with a
+different chunk_size / chunk_overlap only sends chunks with new text to the
+model. Every vectorizer routes its encode calls through EmbeddingCache.encode.
+"""
+
+import os
+import sqlite3
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from incremental_index import normalize_chunk_text
+
+DEFAULT_CACHE_PATH = os.environ.get('RAG_EMBEDDING_CACHE', "embedding_cache/embeddings.sqlite")
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+# sentence-transformers resolves bare model names to this organisation
+_SENTENCE_TRANSFORMERS_PREFIX = "sentence-transformers/"
+
+
+def normalize_model_name(model_name: str) -> str:
+    """
+    Canonical model name for cache keys
+
+    'all-MiniLM-L6-v2' and 'sentence-transformers/all-MiniLM-L6-v2' load the
+    same weights, so both builders must key their embeddings the same way.
+    """
+    model_name = model_name.strip()
+    if model_name.startswith(_SENTENCE_TRANSFORMERS_PREFIX):
+        return model_name[len(_SENTENCE_TRANSFORMERS_PREFIX):]
+    return model_name
+
+
+class EmbeddingCache:
+    """SQLite-backed cache of float16 chunk embeddings"""
+
+    def __init__(self, model_name: str, path: str = DEFAULT_CACHE_PATH):
+        """
+        Open (or create) the cache database
+
+        Args:
+            model_name (str): Embedding model name, part of every cache key (normalized)
+            path (str): SQLite file, shared by all vectorizers and models
+        """
+        self.model_name = normalize_model_name(model_name)
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.encoded = 0
+
+    def key(self, text: str) -> bytes:
+        """Cache key for one chunk"""
+        digest = hashlib.sha256()
+        digest.update(self.model_name.encode('utf-8'))
+        digest.update(b"\0")
+        digest.update(normalize_chunk_text(text).encode('utf-8'))
+        return digest.digest()
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, dim, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                )
+                for key, dim, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float16, count=dim)
+        return found
+
+    def _store(self, items: Dict[bytes, np.ndarray]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)",
+                [(key, int(vector.shape[0]), vector.astype(np.float16).tobytes())
+                 for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], object]) -> np.ndarray:
+        """
+        Embed texts, calling the model only for chunks missing from the cache
+
+        Every returned vector is rounded through float16, so results do not
+        depend on whether a chunk was a hit or a miss.
+
+        Args:
+            texts (List[str]): Chunk texts
+            encode_fn (Callable): Embeds a list of texts, returning a (n, dim) array-like
+
+        Returns:
+            np.ndarray: float32 embeddings in input order
+        """
+        if not texts:
+            return np.empty((0, 0), dtype='float32')
+
+        keys = [self.key(text) for text in texts]
+        cached = self._lookup(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        hit_count = sum(1 for key in keys if key in cached)
+        self.hits += hit_count
+        self.misses += len(keys) - hit_count
+
+        if missing:
+            self.encoded += len(missing)
+            vectors = np.asarray(encode_fn(list(missing.values())), dtype='float32')
+            fresh = {key: vector.astype(np.float16) for key, vector in zip(missing, vectors)}
+            self._store(fresh)
+            cached.update(fresh)
+
+        return np.stack([cached[key] for key in keys]).astype('float32')
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this session"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'encoded': self.encoded,
+            'hit_rate': round(self.hit_rate, 4),
+            'model': self.model_name,
+            'path': self.path
+        }
+
+    def report(self) -> str:
+        """One-line hit-rate summary for build logs"""
+        total = self.hits + self.misses
+        return (f"🗃️ Embedding cache: {self.hits}/{total} hits ({self.hit_rate:.1%}), "
+                f"{self.encoded} unique chunks sent to the model")
+
+    def entry_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_embedding_cache(model_name: str, path: Optional[str] = DEFAULT_CACHE_PATH) -> Optional[EmbeddingCache]:
+    """Open the shared cache, or return None when caching is disabled (path=None)"""
+    if not path:
+        return None
+    try:
+        return EmbeddingCache(model_name, path)
+    except sqlite3.Error as e:
+        print(f"⚠️ Embedding cache unavailable ({e}), embedding without cache")
+        return None
+
+
+def main():
+    """Print the size of the embedding cache"""
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CACHE_PATH
+    if not os.path.exists(path):
+        print(f"❌ No embedding cache at {path}")
+        return
+    cache = EmbeddingCache("", path)
+    print(f"🗃️ {path}: {cache.entry_count()} cached embeddings, "
+          f"{os.path.getsize(path) / (1024 * 1024):.1f} MB")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
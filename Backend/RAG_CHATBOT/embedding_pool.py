@@ -0,0 +1,142 @@
+"""
+Batched, optionally multi-process embedding for index builds
+Chunks are sorted by length so every batch holds texts of similar size (less
+padding), cut into batches of a tunable size, and encoded either in-process or
+on a pool of worker processes that each load the model once. Batch results are
+written back by position, so the output is in input order and identical however
+the batches were scheduled across workers.
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_BATCH_SIZE = int(os.environ.get('RAG_EMBED_BATCH_SIZE', 64))
+
+# Model loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def default_process_count() -> int:
+    """Encode processes used when none is given (RAG_EMBED_PROCESSES, default 1)"""
+    return max(1, int(os.environ.get('RAG_EMBED_PROCESSES', 1)))
+
+
+def _init_worker(model_name: str, device: str, torch_threads: int):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name, device=device)
+
+
+def _encode_batch(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(
+        _worker_model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True),
+        dtype='float32'
+    )
+
+
+class BatchEmbedder:
+    """Length-sorted batch encoder with an optional process pool"""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = DEFAULT_BATCH_SIZE,
+                 processes: Optional[int] = None, device: str = 'cpu', model=None):
+        """
+        Args:
+            model_name (str): sentence-transformers model to load
+            batch_size (int): Texts per forward pass
+            processes (int): Encode processes; 1 encodes in this process
+                (default: RAG_EMBED_PROCESSES or 1)
+            device (str): Torch device for the model(s)
+            model: Already loaded SentenceTransformer to use in-process
+        """
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.processes = max(1, processes or default_process_count())
+        self.device = device
+        self._model = model
+        self._pool = None
+
+    @property
+    def model(self):
+        """In-process model, loaded on first use"""
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Split the cores between workers instead of letting every worker
+            # start one torch thread per core
+            torch_threads = max(1, (os.cpu_count() or 1) // self.processes)
+            print(f"🧵 Starting {self.processes} embedding processes "
+                  f"({torch_threads} torch threads each, batch size {self.batch_size})")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.device, torch_threads)
+            )
+        return self._pool
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            np.ndarray: float32 embeddings, one row per text in input order
+        """
+        if not texts:
+            return np.empty((0, 0), dtype='float32')
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_texts = [texts[i] for i in order]
+        batches = [(start, sorted_texts[start:start + self.batch_size])
+                   for start in range(0, len(sorted_texts), self.batch_size)]
+
+        result = None
+        if self.processes > 1 and len(batches) > 1:
+            pool = self._get_pool()
+            futures = [(start, pool.submit(_encode_batch, batch, self.batch_size))
+                       for start, batch in batches]
+            results = ((start, future.result()) for start, future in futures)
+        else:
+            model = self.model
+            results = ((start, np.asarray(model.encode(batch, batch_size=self.batch_size,
+                                                       show_progress_bar=False, convert_to_numpy=True),
+                                          dtype='float32'))
+                       for start, batch in batches)
+
+        done = 0
+        for start, vectors in results:
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype='float32')
+            # Scatter the sorted batch back to the input positions
+            result[order[start:start + len(vectors)]] = vectors
+            done += len(vectors)
+            if len(batches) > 10 and (done == len(texts) or (start // self.batch_size) % 10 == 9):
+                print(f"   Embedded {done}/{len(texts)} chunks")
+        return result
+
+    def close(self):
+        """Shut down the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
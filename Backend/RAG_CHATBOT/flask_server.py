@@ -23,11 +23,19 @@ except ImportError as e:
     from rag_chatbot_simple import AdvancedRAGChatbot
     logger.info(f"✅ Using simplified RAG chatbot (reason: {str(e)[:100]})")
 
+from index_reloader import IndexReloader
+import query_trace
+import profiling
+import memory_report
+from metrics import CONTENT_TYPE, MetricsRegistry
+from text_analysis import suggestion_topic
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 # Initialize the chatbot
 chatbot = None
+reloader = None
 server_stats = {
     'total_queries': 0,
     'successful_queries': 0,
@@ -35,18 +43,157 @@ server_stats = {
     'start_time': datetime.now().isoformat()
 }
 
+def loaded_index_sizes():
+    """Vectors of the serving index, by document (scraped by /metrics)"""
+    bot = chatbot
+    if bot is None or getattr(bot, 'faiss_index', None) is None:
+        return {}
+    return {(bot.document_id,): bot.faiss_index.ntotal}
+
+def loaded_index_bytes():
+    """Raw float32 vector data of the serving index, by document"""
+    bot = chatbot
+    if bot is None or getattr(bot, 'faiss_index', None) is None:
+        return {}
+    return {(bot.document_id,): bot.faiss_index.ntotal * bot.faiss_index.d * 4}
+
+def loaded_chunk_counts():
+    bot = chatbot
+    if bot is None:
+        return {}
+    return {(bot.document_id,): len(bot.chunks)}
+
+def loaded_query_cache_bytes():
+    bot = chatbot
+    if bot is None:
+        return {}
+    return {(bot.document_id,): bot.query_cache.nbytes}
+
+# Prometheus metrics served at /metrics
+metrics_registry = MetricsRegistry()
+query_counter = metrics_registry.counter(
+    'rag_queries_total', 'Queries handled by /api/rag/query, by document and outcome', ['document', 'status'])
+query_latency = metrics_registry.histogram(
+    'rag_query_duration_seconds', 'End-to-end latency of /api/rag/query', ['document'])
+stage_latency = metrics_registry.histogram(
+    'rag_query_stage_seconds', 'Time spent per query stage (summed within a request)', ['stage'])
+cache_lookups = metrics_registry.counter(
+    'rag_query_cache_lookups_total', 'Query cache lookups by result', ['result'])
+search_candidates = metrics_registry.counter(
+    'rag_search_candidates_total', 'Candidates requested from the FAISS index')
+requests_in_flight = metrics_registry.gauge(
+    'rag_requests_in_flight', 'Requests currently being processed, by endpoint', ['endpoint'])
+metrics_registry.gauge('rag_index_vectors', 'Vectors in the serving index', ['document'],
+                       callback=loaded_index_sizes)
+metrics_registry.gauge('rag_index_vector_bytes', 'Raw vector data of the serving index', ['document'],
+                       callback=loaded_index_bytes)
+metrics_registry.gauge('rag_index_chunks', 'Chunks loaded for the serving index', ['document'],
+                       callback=loaded_chunk_counts)
+metrics_registry.gauge('rag_query_cache_bytes', 'Estimated size of the query cache', ['document'],
+                       callback=loaded_query_cache_bytes)
+metrics_registry.gauge('rag_process_resident_bytes', 'Resident set size of the server process', callback=lambda: {
+    (): memory_report.process_rss()['rss_bytes']
+})
+memory_sheds = metrics_registry.counter(
+    'rag_memory_sheds_total', 'Query cache shrinks triggered by RAG_MEMORY_LIMIT_MB')
+metrics_registry.gauge('rag_uptime_seconds', 'Seconds since the server started', callback=lambda: {
+    (): (datetime.now() - datetime.fromisoformat(server_stats['start_time'])).total_seconds()
+})
+
+# Queries over RAG_SLOW_QUERY_MS, with their stage breakdown
+slow_query_log = profiling.SlowQueryLog()
+
+def record_query_metrics(trace, document_id, processing_time):
+    """Feed a traced query into the latency histograms and cache counters"""
+    query_counter.inc(document=document_id, status='success')
+    query_latency.observe(processing_time, document=document_id)
+    for stage, seconds in trace.stages.items():
+        stage_latency.observe(seconds, stage=stage)
+    cache_lookups.inc(trace.counters.get('cache_hits', 0), result='hit')
+    cache_lookups.inc(trace.counters.get('cache_misses', 0), result='miss')
+    search_candidates.inc(trace.counters.get('candidates', 0))
+
+def enforce_memory_limit(bot):
+    """Shrink the query cache while the process is over RAG_MEMORY_LIMIT_MB"""
+    limit_mb = float(os.environ.get('RAG_MEMORY_LIMIT_MB', 0))
+    if limit_mb <= 0:
+        return
+    rss = memory_report.process_rss()['rss_bytes']
+    if rss > limit_mb * 1024 * 1024:
+        freed = bot.query_cache.shrink(0.5)
+        memory_sheds.inc()
+        logger.warning(f"⚠️ Resident memory {rss / 1024 / 1024:.0f} MB over the {limit_mb:.0f} MB limit; "
+                       f"freed {freed / 1024:.0f} KB of query cache")
+
+def build_chatbot(document_id):
+    """Create a chatbot for a document, reusing the loaded embedding, re-rank and generation models"""
+    current = chatbot
+    return AdvancedRAGChatbot(document_id, model=current.model if current else None,
+                              reranker=current.reranker if current else None,
+                              generator=current.generator if current else None)
+
+def get_chatbot():
+    return chatbot
+
+def set_chatbot(new_chatbot):
+    """Swap the serving chatbot; requests already running keep their own reference"""
+    global chatbot
+    chatbot = new_chatbot
+
 def init_chatbot():
     """Initialize the chatbot instance"""
-    global chatbot
+    global chatbot, reloader
     try:
         # Initialize with ITA_primary by default
         chatbot = AdvancedRAGChatbot("ITA_primary")
         logger.info("✅ RAG Chatbot initialized successfully")
-        return True
     except Exception as e:
         logger.error(f"❌ Error initializing chatbot: {e}")
         return False
 
+    reloader = IndexReloader(
+        build_chatbot, get_chatbot, set_chatbot,
+        poll_interval=float(os.environ.get('RAG_RELOAD_POLL_SECONDS', 5)),
+        settle_seconds=float(os.environ.get('RAG_RELOAD_SETTLE_SECONDS', 3))
+    )
+    if os.environ.get('RAG_HOT_RELOAD', 'true').lower() == 'true':
+        reloader.start_watching()
+    return True
+
+@app.before_request
+def track_request_start():
+    requests_in_flight.inc(endpoint=request.endpoint or 'unknown')
+
+@app.teardown_request
+def track_request_end(exc=None):
+    requests_in_flight.dec(endpoint=request.endpoint or 'unknown')
+
+def admin_authorized():
+    """Check the optional admin token for management endpoints"""
+    token = os.environ.get('RAG_ADMIN_TOKEN')
+    return not token or request.headers.get('X-Admin-Token') == token
+
+def parse_clamped(data, name, cast, low, high=None):
+    """
+    Optional numeric request field, clamped to [low, high]
+    
+    Returns:
+        The value, or None when absent; raises ValueError when it is not a number
+    """
+    value = data.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{name} must be a number")
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if value != value:
+        raise ValueError(f"{name} must be a number")
+    value = max(low, value)
+    return min(high, value) if high is not None else value
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Enhanced health check endpoint with statistics"""
@@ -77,12 +224,18 @@ def query_chatbot():
         "query": "user question",
         "top_k": 5 (optional),
         "document_id": "ITA_primary" (optional),
-        "use_context": true (optional)
+        "use_context": true (optional),
+        "mmr_lambda": 0.7 (optional, diversify sources by MMR),
+        "oversample": 3 (optional, candidates searched per source),
+        "rerank_budget_ms": 150 (optional, cross-encoder time budget when RAG_RERANKER=1),
+        "profile": "sample" | "cprofile" (optional, profile this request; needs the admin token if set)
     }
     """
     global chatbot, server_stats
     
     server_stats['total_queries'] += 1
+    # Hold one instance for the whole request so a hot reload cannot swap it mid-query
+    bot = chatbot
     start_time = datetime.now()
     
     try:
@@ -90,6 +243,7 @@ def query_chatbot():
         
         if not data or 'query' not in data:
             server_stats['failed_queries'] += 1
+            query_counter.inc(document=bot.document_id if bot else 'none', status='invalid')
             return jsonify({
                 'success': False,
                 'error': 'Query is required'
@@ -99,27 +253,49 @@ def query_chatbot():
         top_k = data.get('top_k', 5)
         document_id = data.get('document_id', None)
         use_context = data.get('use_context', True)
+        try:
+            mmr_lambda = parse_clamped(data, 'mmr_lambda', float, 0.0, 1.0)
+            oversample = parse_clamped(data, 'oversample', int, 1)
+            rerank_budget_ms = parse_clamped(data, 'rerank_budget_ms', float, 0.0)
+        except ValueError as e:
+            server_stats['failed_queries'] += 1
+            query_counter.inc(document=bot.document_id if bot else 'none', status='invalid')
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        profile_mode = profiling.profile_mode_for(data.get('profile') if admin_authorized() else None)
         
         logger.info(f"📥 Received query: {query[:100]}...")
         
         # Reinitialize chatbot if document_id is different
-        if document_id and chatbot.document_id != document_id:
+        if document_id and bot.document_id != document_id:
             logger.info(f"🔄 Switching to document: {document_id}")
-            chatbot = AdvancedRAGChatbot(document_id)
-        
-        # Get answer from chatbot with enhanced features
-        answer = chatbot.ask(query, top_k, use_context)
+            bot = build_chatbot(document_id)
+            chatbot = bot
         
-        # Get relevant chunks for additional info
-        relevant_chunks = chatbot.find_relevant_chunks(query, top_k)
+        with query_trace.start_trace() as trace, profiling.profile_request(profile_mode) as profile:
+            # Get answer from chatbot with enhanced features, and the chunks it was built from
+            answer, relevant_chunks = bot.ask(query, top_k, use_context, mmr_lambda=mmr_lambda,
+                                              oversample=oversample, rerank_budget_ms=rerank_budget_ms,
+                                              return_chunks=True)
         
         # Calculate processing time
         processing_time = (datetime.now() - start_time).total_seconds()
         
         # Get conversation summary
-        conversation_summary = chatbot.get_conversation_summary()
+        conversation_summary = bot.get_conversation_summary()
         
         server_stats['successful_queries'] += 1
+        record_query_metrics(trace, bot.document_id, processing_time)
+        
+        profile_summary = None
+        if profile is not None:
+            profile.write(profiling.DEFAULT_PROFILE_DIR, profiling.profile_name(bot.document_id))
+            profile_summary = profile.summary()
+            logger.info(f"🔬 Profiled query ({profile.mode}): {profile.path}")
+        slow_query_log.record(query, bot.document_id, trace, len(relevant_chunks), profile_summary)
+        enforce_memory_limit(bot)
         
         logger.info(f"✅ Query processed successfully in {processing_time:.2f}s")
         
@@ -129,15 +305,18 @@ def query_chatbot():
                 'query': query,
                 'answer': answer,
                 'relevant_chunks_count': len(relevant_chunks),
-                'document_id': chatbot.document_id,
+                'document_id': bot.document_id,
                 'processing_time': processing_time,
+                'stage_timings': trace.to_dict(),
+                'profile': profile_summary,
                 'sources': [
                     {
                         'page': chunk['metadata'].get('page', 'N/A'),
                         'chunk_id': chunk['chunk_id'],
                         'similarity': chunk['similarity'],
                         'base_similarity': chunk.get('base_similarity', chunk['similarity']),
-                        'keyword_boost': chunk.get('keyword_boost', 0.0)
+                        'keyword_boost': chunk.get('keyword_boost', 0.0),
+                        'rerank_score': chunk.get('rerank_score')
                     }
                     for chunk in relevant_chunks
                 ],
@@ -147,6 +326,7 @@ def query_chatbot():
         
     except Exception as e:
         server_stats['failed_queries'] += 1
+        query_counter.inc(document=bot.document_id if bot else 'none', status='error')
         logger.error(f"❌ Error processing query: {e}", exc_info=True)
         return jsonify({
             'success': False,
@@ -199,7 +379,7 @@ def switch_document():
         logger.info(f"🔄 Switching to document: {document_id}")
         
         # Reinitialize chatbot with new document
-        chatbot = AdvancedRAGChatbot(document_id)
+        chatbot = build_chatbot(document_id)
         
         return jsonify({
             'success': True,
@@ -214,6 +394,66 @@ def switch_document():
             'error': str(e)
         }), 500
 
+@app.route('/api/rag/admin/reload', methods=['POST'])
+def reload_index():
+    """
+    Reload a rebuilt vector database without restarting the server
+    
+    Expected JSON payload (all optional):
+    {
+        "document_id": "ITA_primary",
+        "wait": false
+    }
+    """
+    if not admin_authorized():
+        return jsonify({
+            'success': False,
+            'error': 'Invalid admin token'
+        }), 401
+    
+    if reloader is None:
+        return jsonify({
+            'success': False,
+            'error': 'Chatbot not initialized'
+        }), 500
+    
+    data = request.get_json(silent=True) or {}
+    document_id = data.get('document_id')
+    
+    if data.get('wait', False):
+        status = reloader.reload(document_id)
+        return jsonify({
+            'success': status['last_error'] is None,
+            'data': status
+        }), 200 if status['last_error'] is None else 409
+    
+    if not reloader.request_reload(document_id):
+        return jsonify({
+            'success': False,
+            'error': 'A reload is already in progress',
+            'data': reloader.status
+        }), 409
+    
+    return jsonify({
+        'success': True,
+        'message': 'Reload started in background',
+        'data': reloader.status
+    }), 202
+
+@app.route('/api/rag/admin/reload', methods=['GET'])
+def reload_status():
+    """Get hot reload status"""
+    if reloader is None:
+        return jsonify({
+            'success': False,
+            'error': 'Chatbot not initialized'
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'data': reloader.status
+    })
+
 @app.route('/api/rag/conversation/summary', methods=['GET'])
 def get_conversation_summary():
     """Get conversation history summary"""
@@ -281,10 +521,69 @@ def get_server_stats():
             'uptime_hours': uptime / 3600,
             'queries_per_minute': server_stats['total_queries'] / max(uptime / 60, 1),
             'start_time': server_stats['start_time'],
-            'current_document': chatbot.document_id if chatbot else None
+            'current_document': chatbot.document_id if chatbot else None,
+            'reranker': chatbot.reranker.stats() if chatbot and chatbot.reranker else None,
+            'generator': chatbot.generator.stats() if chatbot and chatbot.generator else None
         }
     })
 
+@app.route('/api/rag/admin/slow-queries', methods=['GET'])
+def slow_queries():
+    """Most recent slow queries, newest first"""
+    if not admin_authorized():
+        return jsonify({
+            'success': False,
+            'error': 'Invalid admin token'
+        }), 401
+    
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        'success': True,
+        'data': {
+            'threshold_ms': slow_query_log.threshold_ms,
+            'logged': slow_query_log.logged,
+            'queries': slow_query_log.recent(limit)
+        }
+    })
+
+@app.route('/api/rag/memory', methods=['GET'])
+def memory_usage():
+    """
+    Memory of the process and of each loaded document, by component
+    
+    Query parameters:
+        tracemalloc=N (optional, top N allocation sites; the first call starts tracing)
+        group_by=lineno|filename|traceback (optional, for tracemalloc)
+    """
+    bots = [chatbot] if chatbot is not None else []
+    report = memory_report.memory_report(bots)
+    report['memory_limit_mb'] = float(os.environ.get('RAG_MEMORY_LIMIT_MB', 0)) or None
+    
+    top = request.args.get('tracemalloc', type=int)
+    group_by = request.args.get('group_by', 'lineno')
+    if top is not None and (top < 0 or group_by not in memory_report.TRACEMALLOC_GROUPINGS):
+        return jsonify({
+            'success': False,
+            'error': f"tracemalloc must be >= 0 and group_by one of {', '.join(memory_report.TRACEMALLOC_GROUPINGS)}"
+        }), 400
+    if top:
+        if not admin_authorized():
+            return jsonify({
+                'success': False,
+                'error': 'Invalid admin token'
+            }), 401
+        report['tracemalloc'] = memory_report.tracemalloc_top(top, group_by)
+    
+    return jsonify({
+        'success': True,
+        'data': report
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return app.response_class(metrics_registry.render(), content_type=CONTENT_TYPE)
+
 @app.route('/api/rag/suggest', methods=['POST'])
 def suggest_questions():
     """Suggest follow-up questions based on previous query"""
@@ -310,47 +609,43 @@ def suggest_questions():
             'error': str(e)
         }), 500
 
+SMART_SUGGESTIONS = {
+    'deduction': [
+        "What are the investment options under Section 80C?",
+        "How to claim 80C deductions?",
+        "What is the maximum limit for Section 80C?",
+        "Can I claim 80C for my children's tuition fees?"
+    ],
+    'regime': [
+        "Which regime is better for salaried employees?",
+        "Can I switch between tax regimes every year?",
+        "What deductions are not available in new regime?",
+        "How to calculate tax under both regimes?"
+    ],
+    'hra': [
+        "How is HRA exemption calculated?",
+        "Can I claim HRA and home loan together?",
+        "What documents are needed for HRA?",
+        "When is HRA not available?"
+    ],
+    'calculation': [
+        "What are the tax slabs for this year?",
+        "How to reduce my tax liability?",
+        "What is standard deduction?",
+        "How is cess calculated on income tax?"
+    ],
+    None: [
+        "What are the major tax deductions available?",
+        "How do I file my income tax return?",
+        "What is the difference between old and new tax regime?",
+        "What documents do I need for tax filing?"
+    ]
+}
+
 def generate_smart_suggestions(query: str) -> list:
     """Generate contextual follow-up questions"""
-    query_lower = query.lower()
-    
-    suggestions = []
-    
-    if '80c' in query_lower or 'deduction' in query_lower:
-        suggestions = [
-            "What are the investment options under Section 80C?",
-            "How to claim 80C deductions?",
-            "What is the maximum limit for Section 80C?",
-            "Can I claim 80C for my children's tuition fees?"
-        ]
-    elif 'regime' in query_lower:
-        suggestions = [
-            "Which regime is better for salaried employees?",
-            "Can I switch between tax regimes every year?",
-            "What deductions are not available in new regime?",
-            "How to calculate tax under both regimes?"
-        ]
-    elif 'hra' in query_lower:
-        suggestions = [
-            "How is HRA exemption calculated?",
-            "Can I claim HRA and home loan together?",
-            "What documents are needed for HRA?",
-            "When is HRA not available?"
-        ]
-    elif 'calculate' in query_lower or 'tax' in query_lower:
-        suggestions = [
-            "What are the tax slabs for this year?",
-            "How to reduce my tax liability?",
-            "What is standard deduction?",
-            "How is cess calculated on income tax?"
-        ]
-    else:
-        suggestions = [
-            "What are the major tax deductions available?",
-            "How do I file my income tax return?",
-            "What is the difference between old and new tax regime?",
-            "What documents do I need for tax filing?"
-        ]
+    # Topic keywords are shared with the chatbots (text_analysis.suggestion_topic)
+    suggestions = SMART_SUGGESTIONS[suggestion_topic(query)]
     
     return suggestions[:4]  # Return top 4 suggestions
 
@@ -360,6 +655,10 @@ if __name__ == '__main__':
     print("=" * 60)
     print("📂 Working directory:", os.getcwd())
     
+    # Trace allocations from startup so tracemalloc snapshots include the loaded index
+    if os.environ.get('RAG_TRACEMALLOC'):
+        memory_report.start_tracemalloc()
+    
     # Initialize chatbot
     if not init_chatbot():
         logger.warning("⚠️ Warning: Chatbot initialization failed. Server will start but queries will fail.")
@@ -375,6 +674,7 @@ if __name__ == '__main__':
     print(f"📝 API endpoint: http://localhost:{port}/api/rag/query")
     print(f"🏥 Health check: http://localhost:{port}/health")
     print(f"📊 Statistics: http://localhost:{port}/api/rag/stats")
+    print(f"📈 Metrics: http://localhost:{port}/metrics")
     print("=" * 60)
     print("\n📚 Available Endpoints:")
     print("   POST /api/rag/query              - Query the chatbot")
@@ -383,8 +683,13 @@ if __name__ == '__main__':
     print("   GET  /api/rag/conversation/summary - Get conversation history")
     print("   POST /api/rag/conversation/clear   - Clear conversation")
     print("   GET  /api/rag/stats              - Server statistics")
+    print("   GET  /api/rag/memory             - Memory by document and component")
     print("   POST /api/rag/suggest            - Get question suggestions")
+    print("   POST /api/rag/admin/reload       - Hot reload a rebuilt index")
+    print("   GET  /api/rag/admin/reload       - Hot reload status")
+    print("   GET  /api/rag/admin/slow-queries - Recent slow queries")
     print("   GET  /health                     - Health check")
+    print("   GET  /metrics                    - Prometheus metrics")
     print("=" * 60)
     
     app.run(host='0.0.0.0', port=port, debug=debug_mode)
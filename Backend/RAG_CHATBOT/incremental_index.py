@@ -0,0 +1,298 @@
+"""
+Incremental FAISS index updates keyed by stable content-hash chunk IDs
+Every chunk gets a 63-bit ID derived from its normalised text, so re-ingesting
+an amended document only embeds chunks whose text is new. Vectors live in an
+ID-mapped FAISS index (add_with_ids / remove_ids); ids.npy maps each row of
+chunks.bin to its vector ID so search hits can be translated back to rows.
+"""
+
+import os
+import hashlib
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import faiss
+
+from chunk_store import CHUNK_STORE_FILENAME, LEGACY_CHUNKS_FILENAME, open_chunk_store, write_chunk_store
+from index_manifest import write_faiss_index_atomic
+
+ROW_IDS_FILENAME = "ids.npy"
+FAISS_INDEX_FILENAME = "index.faiss"
+
+_ID_MASK = 0x7FFFFFFFFFFFFFFF
+
+
+def normalize_chunk_text(text: str) -> str:
+    """Collapse whitespace so re-extraction noise does not change chunk IDs"""
+    return " ".join(text.split())
+
+
+class ChunkIdAssigner:
+    """
+    Assign content-hash IDs to chunks as they stream in
+
+    Repeated identical chunks get distinct IDs by hashing their occurrence
+    number along with the text, so the IDs stay unique and stable. Occurrences
+    are counted per first-occurrence ID, so no chunk text is retained.
+    """
+
+    def __init__(self):
+        self._occurrences = {}
+
+    def assign(self, text: str) -> int:
+        """ID of the next chunk in document order"""
+        normalized = normalize_chunk_text(text)
+        base_id = _content_id(normalized)
+        occurrence = self._occurrences.get(base_id, 0)
+        self._occurrences[base_id] = occurrence + 1
+        if occurrence == 0:
+            return base_id
+        return _content_id(f"{normalized}\x00{occurrence}")
+
+
+def _content_id(key: str) -> int:
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') & _ID_MASK
+
+
+def stable_chunk_ids(texts: List[str]) -> np.ndarray:
+    """
+    Compute content-hash IDs for a list of chunks
+
+    Args:
+        texts (List[str]): Chunk texts in document order
+
+    Returns:
+        np.ndarray: int64 IDs, one per chunk
+    """
+    assigner = ChunkIdAssigner()
+    return np.fromiter((assigner.assign(text) for text in texts), dtype=np.int64, count=len(texts))
+
+
+class RowIdMap:
+    """Translate vector IDs returned by an ID-mapped index back to chunk rows"""
+
+    def __init__(self, row_ids: np.ndarray):
+        self.row_ids = np.asarray(row_ids, dtype=np.int64)
+        self._order = np.argsort(self.row_ids, kind='stable')
+        self._sorted_ids = self.row_ids[self._order]
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def rows(self, ids: np.ndarray) -> np.ndarray:
+        """Map an array of vector IDs to row numbers (-1 for unknown IDs)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self._sorted_ids) == 0:
+            return np.full(ids.shape, -1, dtype=np.int64)
+        positions = np.clip(np.searchsorted(self._sorted_ids, ids), 0, len(self._sorted_ids) - 1)
+        found = (self._sorted_ids[positions] == ids) & (ids >= 0)
+        return np.where(found, self._order[positions], -1)
+
+
+def load_row_id_map(vector_dir: str, index=None) -> Optional[RowIdMap]:
+    """
+    Load ids.npy for an ID-mapped database, or None for positional indexes
+
+    Args:
+        vector_dir (str): Vector database directory
+        index: The loaded FAISS index; a positional index ignores a stale ids.npy
+
+    Returns:
+        RowIdMap: Vector ID to row map, or None when hits are already row numbers
+    """
+    path = os.path.join(vector_dir, ROW_IDS_FILENAME)
+    if not os.path.exists(path):
+        return None
+    if index is not None and not isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return None
+    return RowIdMap(np.load(path))
+
+
+def check_row_counts(index, row_id_map: Optional[RowIdMap], chunk_count: int,
+                     manifest: Optional[Dict] = None):
+    """
+    Refuse a vector database whose files do not describe the same rows
+
+    save() replaces index.faiss, ids.npy and chunks.bin one at a time, so a
+    crash in between leaves files from two builds side by side.
+
+    Args:
+        index: Loaded FAISS index
+        row_id_map (RowIdMap): Loaded ids.npy, or None for a positional index
+        chunk_count (int): Chunks in chunks.bin
+        manifest (Dict): Manifest of the database, if it has one
+
+    Raises:
+        ValueError: When the vector, row-id, chunk or manifest counts disagree
+    """
+    if row_id_map is not None and len(row_id_map) != index.ntotal:
+        raise ValueError(f"index has {index.ntotal} vectors but ids.npy maps {len(row_id_map)} rows")
+    if chunk_count != index.ntotal:
+        raise ValueError(f"index has {index.ntotal} vectors but there are {chunk_count} chunks")
+    if manifest is not None and manifest.get('count') != index.ntotal:
+        raise ValueError(f"index has {index.ntotal} vectors but the manifest records {manifest.get('count')}")
+
+
+class IncrementalIndex:
+    """ID-mapped FAISS index that is updated in place from a new list of chunks"""
+
+    def __init__(self, vector_dir: str):
+        """
+        Open (or prepare to create) the index stored in vector_dir
+
+        Positional indexes written by earlier builds are migrated without
+        re-embedding: their vectors are reconstructed and re-added under the
+        content-hash IDs of the existing chunks.
+
+        Args:
+            vector_dir (str): Directory of a *_vectors database
+        """
+        self.vector_dir = vector_dir
+        self.index = None
+        self.row_ids = np.empty(0, dtype=np.int64)
+
+        index_path = os.path.join(vector_dir, FAISS_INDEX_FILENAME)
+        if os.path.exists(index_path):
+            self._load(index_path)
+
+    def _load(self, index_path: str):
+        index = faiss.read_index(index_path)
+        ids_path = os.path.join(self.vector_dir, ROW_IDS_FILENAME)
+
+        if os.path.exists(ids_path) and isinstance(index, faiss.IndexIDMap2):
+            row_ids = np.load(ids_path)
+            if len(row_ids) != index.ntotal:
+                # Left by an interrupted save(); the stored vectors cannot be trusted
+                print(f"⚠️ Existing index has {index.ntotal} vectors but ids.npy maps {len(row_ids)} rows, "
+                      f"rebuilding from scratch")
+                return
+            self.index = index
+            self.row_ids = row_ids
+            return
+
+        # Migrate a positional index built before stable IDs existed
+        try:
+            chunks = open_chunk_store(self.vector_dir)
+        except FileNotFoundError:
+            print(f"⚠️ No chunks found for existing index in {self.vector_dir}, rebuilding from scratch")
+            return
+        if len(chunks) != index.ntotal:
+            print(f"⚠️ Existing index has {index.ntotal} vectors but {len(chunks)} chunks, rebuilding from scratch")
+            return
+
+        print(f"🔄 Migrating {index.ntotal} existing vectors to stable chunk IDs...")
+        ids = stable_chunk_ids(list(chunks))
+        vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.empty((0, index.d), dtype='float32')
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+        if len(ids):
+            self.index.add_with_ids(vectors, ids)
+        self.row_ids = ids
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    def existing_ids(self) -> np.ndarray:
+        """IDs of every vector currently stored in the index"""
+        if self.index is None:
+            return np.empty(0, dtype=np.int64)
+        return faiss.vector_to_array(self.index.id_map).astype(np.int64)
+
+    def update(self, texts: List[str], embed_fn: Callable[[List[str]], object]) -> Dict:
+        """
+        Bring the index in line with a new list of chunks
+
+        Args:
+            texts (List[str]): The complete, ordered chunk list of the new document version
+            embed_fn (Callable): Embeds a list of texts, returning a (n, dim) array-like
+
+        Returns:
+            Dict: Counts of added, removed, unchanged and total vectors
+        """
+        ids = stable_chunk_ids(texts)
+        existing = self.existing_ids()
+
+        new_mask = ~np.isin(ids, existing)
+        stale_ids = existing[~np.isin(existing, ids)]
+
+        if stale_ids.size:
+            self.index.remove_ids(stale_ids)
+
+        new_positions = np.flatnonzero(new_mask)
+        if new_positions.size:
+            vectors = np.asarray(embed_fn([texts[i] for i in new_positions]), dtype='float32')
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+            self.index.add_with_ids(np.ascontiguousarray(vectors), ids[new_positions])
+
+        self.row_ids = ids
+        return {
+            'added': int(new_positions.size),
+            'removed': int(stale_ids.size),
+            'unchanged': int(len(ids) - new_positions.size),
+            'total': int(self.ntotal)
+        }
+
+    def add_vectors(self, vectors: np.ndarray, ids: np.ndarray):
+        """Append embedded vectors under their chunk IDs (streaming builds)"""
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+        self.index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+
+    def finish_stream(self, row_ids: np.ndarray) -> int:
+        """
+        Complete a streaming update once every chunk has been seen
+
+        Removes vectors whose IDs no longer occur in the document and adopts
+        row_ids as the new row order.
+
+        Args:
+            row_ids (np.ndarray): IDs of all chunks of the new version, in row order
+
+        Returns:
+            int: Number of stale vectors removed
+        """
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        existing = self.existing_ids()
+        stale_ids = existing[~np.isin(existing, row_ids)]
+        if stale_ids.size:
+            self.index.remove_ids(stale_ids)
+        self.row_ids = row_ids
+        return int(stale_ids.size)
+
+    def save(self, texts: Optional[List[str]] = None):
+        """
+        Write index.faiss, ids.npy and chunks.bin for the current chunk list
+
+        Streaming builds write chunks.bin themselves and pass texts=None.
+
+        Each file is replaced atomically but not the set, so callers write the
+        manifest (write_index_manifest) afterwards: a crash in between leaves a
+        manifest that no longer matches, and loaders refuse the database
+        (check_row_counts, verify_index_manifest).
+
+        A LangChain index.pkl left by an older build is removed, since its
+        positional docstore no longer matches the ID-mapped index.
+        """
+        os.makedirs(self.vector_dir, exist_ok=True)
+        write_faiss_index_atomic(self.index, os.path.join(self.vector_dir, FAISS_INDEX_FILENAME))
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.vector_dir, prefix=".ids_", suffix=".npy")
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, self.row_ids)
+        os.replace(tmp_path, os.path.join(self.vector_dir, ROW_IDS_FILENAME))
+
+        if texts is not None:
+            write_chunk_store(os.path.join(self.vector_dir, CHUNK_STORE_FILENAME), texts)
+
+        legacy_path = os.path.join(self.vector_dir, LEGACY_CHUNKS_FILENAME)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+    def search(self, query_vectors: np.ndarray, k: int):
+        """Search the index and return (distances, chunk rows)"""
+        distances, ids = self.index.search(np.asarray(query_vectors, dtype='float32'), k)
+        return distances, RowIdMap(self.row_ids).rows(ids)
@@ -0,0 +1,126 @@
+"""
+Integrity manifest for vector databases
+Index builders write manifest.json last, after index.faiss, ids.npy and
+chunks.bin are complete, so readers such as the hot reloader can tell a
+finished build from one that is still being written (or was interrupted
+between those files).
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import faiss
+
+INDEX_MANIFEST_FILENAME = "manifest.json"
+INDEX_MANIFEST_VERSION = 1
+CHECKSUMMED_FILES = ("index.faiss", "ids.npy", "chunks.bin")
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Stream a file through SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_faiss_index_atomic(index, path: str):
+    """Write a FAISS index to a temporary file and move it into place"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".index_", suffix=".faiss")
+    os.close(fd)
+    try:
+        faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_index_manifest(vector_dir: str, dimension: int, count: int, extra: Optional[Dict] = None) -> str:
+    """
+    Record dimension, vector count and file checksums of a finished build
+
+    Args:
+        vector_dir (str): Directory of a *_vectors database
+        dimension (int): Embedding dimension of the FAISS index
+        count (int): Number of vectors in the FAISS index
+        extra (Dict): Additional fields to store (model name, build options, ...)
+
+    Returns:
+        str: Path of the written manifest
+    """
+    files = {}
+    for name in CHECKSUMMED_FILES:
+        path = os.path.join(vector_dir, name)
+        if os.path.exists(path):
+            files[name] = {
+                'sha256': file_sha256(path),
+                'size': os.path.getsize(path)
+            }
+
+    manifest = {
+        'format_version': INDEX_MANIFEST_VERSION,
+        'dimension': int(dimension),
+        'count': int(count),
+        'files': files,
+        'created_at': datetime.now().isoformat()
+    }
+    if extra:
+        manifest.update(extra)
+
+    manifest_path = os.path.join(vector_dir, INDEX_MANIFEST_FILENAME)
+    fd, tmp_path = tempfile.mkstemp(dir=vector_dir, prefix=".manifest_")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def read_index_manifest(vector_dir: str) -> Optional[Dict]:
+    """Return the manifest of a vector database, or None if it has none"""
+    manifest_path = os.path.join(vector_dir, INDEX_MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def verify_index_manifest(vector_dir: str, dimension: Optional[int] = None,
+                          count: Optional[int] = None) -> Tuple[bool, str]:
+    """
+    Check a vector database against its manifest
+
+    Args:
+        vector_dir (str): Directory of a *_vectors database
+        dimension (int): Dimension of the loaded index, if already known
+        count (int): Vector count of the loaded index, if already known
+
+    Returns:
+        Tuple[bool, str]: (passed, explanation)
+    """
+    manifest = read_index_manifest(vector_dir)
+    if manifest is None:
+        return True, "no manifest, checksums not verified"
+
+    if dimension is not None and manifest.get('dimension') != dimension:
+        return False, f"dimension {dimension} does not match manifest ({manifest.get('dimension')})"
+    if count is not None and manifest.get('count') != count:
+        return False, f"vector count {count} does not match manifest ({manifest.get('count')})"
+
+    for name, expected in manifest.get('files', {}).items():
+        path = os.path.join(vector_dir, name)
+        if not os.path.exists(path):
+            return False, f"{name} is missing"
+        if os.path.getsize(path) != expected['size']:
+            return False, f"{name} size does not match manifest"
+        if file_sha256(path) != expected['sha256']:
+            return False, f"{name} checksum does not match manifest"
+
+    return True, "manifest verified"
@@ -0,0 +1,251 @@
+"""
+Zero-downtime hot reload of rebuilt vector databases
+Watches the vector_database/ and document_metadata/ volumes (or reacts to an
+explicit reload request), loads the new index in a background thread,
+validates it and then swaps it in with a single reference assignment.
+Requests already running keep the chatbot they started with, so in-flight
+queries finish on the old index.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from index_manifest import verify_index_manifest
+
+logger = logging.getLogger(__name__)
+
+# Files whose change means a document needs to be reloaded
+WATCHED_VECTOR_FILES = ("index.faiss", "ids.npy", "chunks.bin", "index.pkl", "manifest.json")
+
+
+class IndexValidationError(Exception):
+    """Raised when a freshly loaded index fails validation"""
+
+
+class IndexReloader:
+    """Background loader that validates and atomically swaps chatbot instances"""
+
+    def __init__(self,
+                 build_chatbot: Callable,
+                 get_chatbot: Callable,
+                 set_chatbot: Callable,
+                 vector_db_path: str = "vector_database",
+                 metadata_path: str = "document_metadata",
+                 poll_interval: float = 5.0,
+                 settle_seconds: float = 3.0):
+        """
+        Args:
+            build_chatbot (Callable): document_id -> new chatbot instance
+            get_chatbot (Callable): returns the chatbot currently serving traffic
+            set_chatbot (Callable): installs a new chatbot for subsequent requests
+            vector_db_path (str): Directory holding *_vectors databases
+            metadata_path (str): Directory holding *_metadata.json files
+            poll_interval (float): Seconds between file system polls
+            settle_seconds (float): Files must be unchanged this long before reloading
+        """
+        self.build_chatbot = build_chatbot
+        self.get_chatbot = get_chatbot
+        self.set_chatbot = set_chatbot
+        self.vector_db_path = vector_db_path
+        self.metadata_path = metadata_path
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watch_thread = None
+        self._signatures: Dict[str, Tuple] = {}
+
+        self.status = {
+            'generation': 0,
+            'reloading': False,
+            'watching': False,
+            'last_reload_at': None,
+            'last_reload_seconds': None,
+            'last_validation': None,
+            'last_error': None
+        }
+
+    def snapshot(self, document_id: str) -> Tuple:
+        """Size and mtime of every file that makes up a document's database"""
+        paths = [os.path.join(self.vector_db_path, f"{document_id}_vectors", name)
+                 for name in WATCHED_VECTOR_FILES]
+        paths.append(os.path.join(self.metadata_path, f"{document_id}_metadata.json"))
+        paths.append(os.path.join(self.metadata_path, f"{document_id}_columns", "manifest.json"))
+
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def validate(self, candidate, document_id: str) -> str:
+        """
+        Validate a freshly loaded chatbot before it takes traffic
+
+        Checks that the requested document was loaded (not a fallback), that the
+        index dimension matches the embedding model, that vectors and chunks line
+        up, that the manifest checksums match and that a probe search succeeds.
+
+        Returns:
+            str: Summary of the checks that passed
+        """
+        index = getattr(candidate, 'faiss_index', None)
+        if index is None:
+            raise IndexValidationError("index failed to load")
+        if candidate.document_id != document_id:
+            raise IndexValidationError(
+                f"loaded '{candidate.document_id}' instead of '{document_id}'")
+
+        model_dimension = candidate.model.get_sentence_embedding_dimension()
+        if index.d != model_dimension:
+            raise IndexValidationError(
+                f"index dimension {index.d} does not match model dimension {model_dimension}")
+
+        if index.ntotal != len(candidate.chunks):
+            raise IndexValidationError(
+                f"index has {index.ntotal} vectors but {len(candidate.chunks)} chunks")
+        if index.ntotal == 0:
+            raise IndexValidationError("index is empty")
+
+        vector_dir = os.path.join(self.vector_db_path, f"{document_id}_vectors")
+        manifest_ok, manifest_message = verify_index_manifest(vector_dir, index.d, index.ntotal)
+        if not manifest_ok:
+            raise IndexValidationError(manifest_message)
+
+        probe = candidate.model.encode(["income tax"]).astype('float32')
+        index.search(probe, 1)
+
+        summary = f"dimension={index.d}, vectors={index.ntotal}, {manifest_message}"
+        if candidate.metadata and len(candidate.metadata) != index.ntotal:
+            summary += f", warning: {len(candidate.metadata)} metadata rows"
+        return summary
+
+    def reload(self, document_id: Optional[str] = None) -> Dict:
+        """
+        Load, validate and swap in a document synchronously
+
+        Args:
+            document_id (str): Document to load, defaults to the current one
+
+        Returns:
+            Dict: Copy of the reload status
+        """
+        with self._reload_lock:
+            return self._reload_locked(document_id)
+
+    def _reload_locked(self, document_id: Optional[str]) -> Dict:
+        """Body of reload(); the caller holds _reload_lock"""
+        current = self.get_chatbot()
+        if document_id is None:
+            document_id = current.document_id if current else "ITA_primary"
+
+        self.status['reloading'] = True
+        start = time.time()
+        try:
+            logger.info(f"🔄 Hot reload: loading '{document_id}' in background")
+            candidate = self.build_chatbot(document_id)
+            validation = self.validate(candidate, document_id)
+
+            # Requests already running keep their reference to the old instance
+            current = self.get_chatbot()
+            if current is not None and current.document_id == document_id:
+                candidate.conversation_history = current.conversation_history
+            self.set_chatbot(candidate)
+
+            self._signatures[document_id] = self.snapshot(document_id)
+            self.status.update({
+                'generation': self.status['generation'] + 1,
+                'last_reload_at': datetime.now().isoformat(),
+                'last_reload_seconds': round(time.time() - start, 3),
+                'last_validation': validation,
+                'last_error': None
+            })
+            logger.info(f"✅ Hot reload of '{document_id}' complete ({validation})")
+        except Exception as e:
+            self._signatures[document_id] = self.snapshot(document_id)
+            self.status['last_error'] = f"{type(e).__name__}: {e}"
+            logger.error(f"❌ Hot reload of '{document_id}' rejected: {e}")
+        finally:
+            self.status['reloading'] = False
+
+        return dict(self.status)
+
+    def request_reload(self, document_id: Optional[str] = None) -> bool:
+        """
+        Start a reload in a background thread
+
+        Returns:
+            bool: False if a reload is already running
+        """
+        # Take the lock here, not in the thread, so two concurrent requests cannot both start one
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            thread = threading.Thread(target=self._reload_and_release, args=(document_id,), daemon=True,
+                                      name="index-reload")
+            thread.start()
+        except BaseException:
+            self._reload_lock.release()
+            raise
+        return True
+
+    def _reload_and_release(self, document_id: Optional[str]):
+        """Background reload started by request_reload, which acquired _reload_lock for it"""
+        try:
+            self._reload_locked(document_id)
+        finally:
+            self._reload_lock.release()
+
+    def start_watching(self):
+        """Poll the database volumes and reload the served document when it changes"""
+        if self._watch_thread is not None:
+            return
+        current = self.get_chatbot()
+        if current is not None:
+            self._signatures[current.document_id] = self.snapshot(current.document_id)
+
+        self._stop_event.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, daemon=True,
+                                              name="index-watcher")
+        self._watch_thread.start()
+        self.status['watching'] = True
+        logger.info(f"👀 Watching {self.vector_db_path}/ and {self.metadata_path}/ for rebuilt indexes")
+
+    def stop_watching(self):
+        """Stop the polling thread"""
+        self._stop_event.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=self.poll_interval * 2)
+        self._watch_thread = None
+        self.status['watching'] = False
+
+    def _watch_loop(self):
+        while not self._stop_event.wait(self.poll_interval):
+            current = self.get_chatbot()
+            if current is None or self._reload_lock.locked():
+                continue
+
+            document_id = current.document_id
+            signature = self.snapshot(document_id)
+            if document_id not in self._signatures:
+                self._signatures[document_id] = signature
+                continue
+            if signature == self._signatures[document_id]:
+                continue
+
+            # Wait for the writer to finish before loading
+            if self._stop_event.wait(self.settle_seconds):
+                break
+            if self.snapshot(document_id) != signature:
+                continue
+
+            logger.info(f"📦 Detected rebuilt database for '{document_id}'")
+            self.reload(document_id)
@@ -0,0 +1,354 @@
+"""
+Streaming, bounded-memory ingestion pipeline
+A PDF flows through pages -> cleaned text -> chunks -> near-duplicate filter ->
+embedding batches -> index appends as a chain of generators. Each stage runs on its own thread and
+hands items to the next through a small bounded queue, so extraction, cleaning,
+chunking and embedding overlap while only a few pages and batches are held in
+memory at once. Chunk text is streamed straight into chunks.bin; only the small
+per-chunk metadata rows and IDs are kept until the end of the build.
+"""
+
+import os
+import time
+import queue
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from build_report import BuildReport
+from checkpoint import BuildCheckpoint
+from chunk_store import CHUNK_STORE_FILENAME, ChunkStoreWriter
+from dedup import DEFAULT_DEDUP_THRESHOLD, NearDuplicateIndex, link_duplicates
+from incremental_index import ChunkIdAssigner, IncrementalIndex
+from pdf_extraction import count_pdf_pages, default_worker_count, iter_pdf_pages
+from text_chunker import OffsetTextSplitter, PageOffsetMap
+
+# (chunk number before filtering, char_start, char_end, text, first page, last page)
+ChunkRecord = Tuple[int, int, int, str, int, int]
+
+_DONE = object()
+
+
+class _StageFailure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def bounded(iterable: Iterable, maxsize: int = 4, name: str = "stage") -> Iterator:
+    """
+    Run an iterable on a background thread, buffering at most maxsize items
+
+    Exceptions raised by the producer are re-raised in the consumer. Closing
+    the returned generator stops the producer and closes its iterable.
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_StageFailure(e))
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name=f"ingest-{name}", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageFailure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class IngestPipeline:
+    """Stream one PDF into an ID-mapped vector database"""
+
+    def __init__(self, splitter: OffsetTextSplitter, clean_fn: Callable[[str], str],
+                 embed_fn: Callable[[List[str]], object], batch_size: int = 256,
+                 queue_size: int = 4, workers: Optional[int] = None,
+                 min_page_chars: int = 50, min_chunk_chars: int = 100,
+                 dedup_threshold: Optional[float] = DEFAULT_DEDUP_THRESHOLD):
+        """
+        Args:
+            splitter (OffsetTextSplitter): Chunker; its first separator must be "\\n\\n"
+            clean_fn (Callable): Cleans the raw text of one page
+            embed_fn (Callable): Embeds a list of texts, returning a (n, dim) array-like
+            batch_size (int): Chunks per embedding batch
+            queue_size (int): Items buffered between two stages
+            workers (int): PDF extraction processes (default: RAG_EXTRACT_WORKERS or all cores)
+            min_page_chars (int): Cleaned pages this short are skipped
+            min_chunk_chars (int): Chunks this short are dropped
+            dedup_threshold (float): Similarity from which a chunk is dropped as a
+                near-duplicate of an earlier one, or None to keep every chunk
+        """
+        self.splitter = splitter
+        self.clean_fn = clean_fn
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.workers = workers
+        self.min_page_chars = min_page_chars
+        self.min_chunk_chars = min_chunk_chars
+        self.dedup_threshold = dedup_threshold
+
+    def iter_pages(self, pdf_path: str, total_pages: int, workers: int,
+                   failed_pages: List[int], report: BuildReport) -> Iterator[Tuple[int, str]]:
+        """Stage 1+2: extracted pages -> (page number, cleaned page segment)"""
+        extracted = iter_pdf_pages(pdf_path, workers, total_pages=total_pages)
+        while True:
+            with report.stage('extract'):
+                page = next(extracted, None)
+            if page is None:
+                return
+            page_num, text, error = page
+            report.add('extract', items=1)
+            report.progress('extract', total_pages)
+            if (page_num - 1) % 25 == 0:  # Progress indicator every 25 pages
+                print(f"   Processing page {page_num}/{total_pages}")
+
+            if error is not None:
+                print(f"⚠️ Error processing page {page_num}: {error}")
+                failed_pages.append(page_num)
+                continue
+
+            if not text or not text.strip():
+                failed_pages.append(page_num)
+                continue
+
+            with report.stage('clean', 1):
+                cleaned_text = self.clean_fn(text)
+            if len(cleaned_text.strip()) > self.min_page_chars:  # Only meaningful content
+                yield page_num, f"\n\n=== Page {page_num} ===\n{cleaned_text}"
+
+    def iter_chunks(self, pages: Iterable[Tuple[int, str]], page_map: PageOffsetMap,
+                    counts: Dict, report: BuildReport) -> Iterator[ChunkRecord]:
+        """Stage 3: page segments -> chunk records with exact page ranges"""
+        waited = [0.0]  # Time spent waiting for pages, excluded from the chunk stage
+
+        def segments():
+            offset = 0
+            upstream = iter(pages)
+            while True:
+                pulled = time.perf_counter()
+                page = next(upstream, None)
+                waited[0] += time.perf_counter() - pulled
+                if page is None:
+                    return
+                page_num, segment = page
+                page_map.page_starts.append(offset)
+                page_map.page_numbers.append(page_num)
+                offset += len(segment)
+                yield segment
+
+        # A chunk is only yielded after every segment it touches was pulled, so
+        # page_map already covers it
+        chunk_spans = enumerate(self.splitter.iter_segment_chunks(segments()))
+        while True:
+            started, waited_before = time.perf_counter(), waited[0]
+            item = next(chunk_spans, None)
+            report.add('chunk', time.perf_counter() - started - (waited[0] - waited_before),
+                       0 if item is None else 1)
+            if item is None:
+                return
+            number, (start, end, text) = item
+            counts['initial_chunks'] = number + 1
+            if len(text.strip()) <= self.min_chunk_chars:
+                continue
+            first_page, last_page = page_map.page_range(start, end)
+            yield number, start, end, text, first_page, last_page
+
+    def iter_unique(self, chunks: Iterable[ChunkRecord], detector: NearDuplicateIndex,
+                    duplicates: Dict, report: BuildReport) -> Iterator[ChunkRecord]:
+        """Stage 3b: drop near-duplicate chunks, remembering their canonical chunk and page"""
+        for record in chunks:
+            with report.stage('dedup', 1):
+                canonical = detector.check(record[0], record[3])
+            if canonical is None:
+                yield record
+            else:
+                duplicates[record[0]] = (canonical, record[4])
+
+    def iter_batches(self, chunks: Iterable[ChunkRecord], known_ids: set) -> Iterator[Tuple[List[ChunkRecord], List[int], List[bool]]]:
+        """Stage 4: assign stable IDs and group chunks into batches"""
+        assigner = ChunkIdAssigner()
+        records, ids, is_new = [], [], []
+        for record in chunks:
+            chunk_id = assigner.assign(record[3])
+            records.append(record)
+            ids.append(chunk_id)
+            is_new.append(chunk_id not in known_ids)
+            if len(records) >= self.batch_size:
+                yield records, ids, is_new
+                records, ids, is_new = [], [], []
+        if records:
+            yield records, ids, is_new
+
+    def iter_embedded(self, batches: Iterable, embed_fn: Callable[[List[str]], object],
+                      report: BuildReport) -> Iterator:
+        """Stage 5: embed only the chunks whose IDs are not in the index yet"""
+        for records, ids, is_new in batches:
+            new_texts = [record[3] for record, new in zip(records, is_new) if new]
+            vectors = None
+            if new_texts:
+                with report.stage('embed', len(new_texts)):
+                    vectors = np.asarray(embed_fn(new_texts), dtype='float32')
+                report.progress('embed')
+            yield records, ids, is_new, vectors
+
+    def checkpoint_pages(self, pages: Iterable[Tuple[int, str]], checkpoint: BuildCheckpoint,
+                         total_pages: int, failed_pages: List[int]) -> Iterator[Tuple[int, str]]:
+        """Pass pages through while saving them as the 'pages' checkpoint stage"""
+        writer = checkpoint.stage_writer('pages')
+        page_numbers = []
+        try:
+            for page_num, segment in pages:
+                writer.append(segment)
+                page_numbers.append(page_num)
+                yield page_num, segment
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        checkpoint.complete_stage('pages', {
+            'page_numbers': page_numbers,
+            'failed_pages': sorted(failed_pages),
+            'total_pages': total_pages
+        })
+
+    def run(self, pdf_path: str, vector_dir: str,
+            metadata_fn: Callable[[ChunkRecord], Dict],
+            checkpoint: Optional[BuildCheckpoint] = None,
+            report: Optional[BuildReport] = None) -> Dict:
+        """
+        Stream a PDF into vector_dir, updating an existing database in place
+
+        Args:
+            pdf_path (str): Path to the PDF file
+            vector_dir (str): Directory of the *_vectors database
+            metadata_fn (Callable): Builds the metadata row of one chunk record
+            checkpoint (BuildCheckpoint): Saves cleaned pages and embedded batches,
+                and reuses those of an interrupted run it was resumed from
+            report (BuildReport): Receives per-stage timings (default: a new, silent report)
+
+        Returns:
+            Dict: Page statistics, 'metadatas' in chunk order, 'index_update'
+                  counts, 'initial_chunks', 'deduplication' counts, the updated
+                  'index' and the 'build_report'; None when the PDF produced no chunks (the
+                  database is left untouched)
+        """
+        if report is None:
+            report = BuildReport(os.path.basename(vector_dir), 'ingest_pipeline', live=False)
+        failed_pages = []
+        if checkpoint is not None and checkpoint.has_stage('pages'):
+            page_texts, page_info = checkpoint.load_stage('pages')
+            total_pages = page_info['total_pages']
+            workers = 0
+            failed_pages.extend(page_info['failed_pages'])
+            source = zip(page_info['page_numbers'], page_texts)
+            print(f"♻️ Using {len(page_texts)} checkpointed pages of {total_pages} "
+                  f"(batches of {self.batch_size} chunks)")
+        else:
+            total_pages = count_pdf_pages(pdf_path)
+            workers = max(1, min(self.workers or default_worker_count(), max(total_pages, 1)))
+            print(f"📄 Total pages: {total_pages} ({workers} extraction workers, "
+                  f"batches of {self.batch_size} chunks)")
+            source = self.iter_pages(pdf_path, total_pages, workers, failed_pages, report)
+            if checkpoint is not None:
+                source = self.checkpoint_pages(source, checkpoint, total_pages, failed_pages)
+        embed_fn = self.embed_fn if checkpoint is None else checkpoint.embed_fn(self.embed_fn)
+
+        index = IncrementalIndex(vector_dir)
+        known_ids = set(index.existing_ids().tolist())
+        print(f"🔄 Streaming into {vector_dir} ({index.ntotal} vectors already indexed)...")
+
+        counts = {'initial_chunks': 0}
+        page_map = PageOffsetMap([], [])
+        metadatas = []
+        chunk_rows = {}  # Chunk number -> metadata row
+        row_ids = []
+        added = 0
+
+        pages = bounded(source, self.queue_size, "pages")
+        chunks = bounded(self.iter_chunks(pages, page_map, counts, report),
+                         self.queue_size * self.batch_size, "chunks")
+        detector = NearDuplicateIndex(self.dedup_threshold) if self.dedup_threshold else None
+        duplicates = {}
+        if detector is not None:
+            chunks = self.iter_unique(chunks, detector, duplicates, report)
+        embedded = bounded(self.iter_embedded(self.iter_batches(chunks, known_ids), embed_fn, report),
+                           self.queue_size, "embeddings")
+
+        writer = ChunkStoreWriter(os.path.join(vector_dir, CHUNK_STORE_FILENAME))
+        try:
+            for records, ids, is_new, vectors in embedded:
+                with report.stage('save', len(records)):
+                    for record in records:
+                        writer.append(record[3])
+                        chunk_rows[record[0]] = len(metadatas)
+                        metadatas.append(metadata_fn(record))
+                row_ids.extend(ids)
+                if vectors is not None:
+                    with report.stage('index', len(vectors)):
+                        index.add_vectors(vectors, [chunk_id for chunk_id, new in zip(ids, is_new) if new])
+                    added += len(vectors)
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            # Stop every stage thread now rather than when the generators are collected
+            for stage in (embedded, chunks, pages):
+                stage.close()
+
+        if not row_ids:
+            writer.abort()
+            return None
+
+        link_duplicates(metadatas, chunk_rows, duplicates)
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        with report.stage('index'):
+            removed = index.finish_stream(row_ids)
+        with report.stage('save'):
+            writer.close()
+            index.save()
+
+        processed_pages = len(page_map.page_numbers)
+        return {
+            'index': index,
+            'metadatas': metadatas,
+            'initial_chunks': counts['initial_chunks'],
+            'total_pages': total_pages,
+            'processed_pages': processed_pages,
+            'failed_pages': sorted(failed_pages),
+            'success_rate': (processed_pages / total_pages) * 100 if total_pages else 0.0,
+            'extraction_workers': workers,
+            'build_report': report,
+            'deduplication': detector.stats() if detector is not None else None,
+            'index_update': {
+                'added': added,
+                'removed': removed,
+                'unchanged': int(len(row_ids) - added),
+                'total': int(index.ntotal)
+            }
+        }
@@ -5,39 +5,62 @@ Creates a high-quality vector database specifically for ITA.pdf
 """
 
 import os
-import json
 import time
-import PyPDF2
 import faiss
 import numpy as np
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from sentence_transformers import SentenceTransformer
 import pickle
 from typing import List, Dict, Optional
-import re
+import shutil
+from text_chunker import OffsetTextSplitter
+from ingest_pipeline import IngestPipeline
+from checkpoint import DEFAULT_CHECKPOINT_DIR, input_fingerprint, open_build_checkpoint
+from build_report import BuildReport, report_path_for
+from dedup import DEFAULT_DEDUP_THRESHOLD
+from text_analysis import classify_content, clean_legal_text, find_section_reference
+from embedding_cache import DEFAULT_CACHE_PATH, open_embedding_cache
+from embedding_pool import DEFAULT_BATCH_SIZE, BatchEmbedder
+from metadata_store import write_document_metadata
+from index_manifest import write_index_manifest
 
 class ITAVectorizer:
-    def __init__(self):
-        """Initialize the ITA PDF vectorizer with optimized settings"""
+    def __init__(self, embedding_cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+                 extraction_workers: Optional[int] = None, embedding_batch_size: int = 256,
+                 embedding_processes: Optional[int] = None, encode_batch_size: int = DEFAULT_BATCH_SIZE,
+                 dedup_threshold: Optional[float] = DEFAULT_DEDUP_THRESHOLD):
+        """
+        Initialize the ITA PDF vectorizer with optimized settings
+        
+        Args:
+            embedding_cache_path (str): SQLite embedding cache, or None to always call the model
+            extraction_workers (int): Processes for PDF text extraction (default: all cores)
+            embedding_batch_size (int): Chunks per embedding batch in the streaming build
+            embedding_processes (int): Encode processes (default: RAG_EMBED_PROCESSES or 1)
+            encode_batch_size (int): Texts per model forward pass
+            dedup_threshold (float): Similarity from which a chunk is dropped as a
+                near-duplicate of an earlier one, or None to keep every chunk
+        """
         print("🚀 Initializing ITA PDF Vectorizer...")
         
         # Use smaller chunks for better precision with legal documents
         self.chunk_size = 800
         self.chunk_overlap = 150
-        
-        # Initialize embeddings model
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name='all-MiniLM-L6-v2',
-            model_kwargs={'device': 'cpu'}
+        self.extraction_workers = extraction_workers
+        self.embedding_batch_size = embedding_batch_size
+        self.dedup_threshold = dedup_threshold
+        
+        # Initialize batched (optionally multi-process) embedding model
+        self.embedder = BatchEmbedder(
+            'all-MiniLM-L6-v2',
+            batch_size=encode_batch_size,
+            processes=embedding_processes,
+            device='cpu'
         )
+        self.embedding_cache = open_embedding_cache('all-MiniLM-L6-v2', embedding_cache_path)
         
-        # Initialize text splitter with legal document optimizations
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        # Initialize offset-tracking text splitter with legal document optimizations
+        self.text_splitter = OffsetTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
-            length_function=len,
             separators=[
                 "\n\n",  # Paragraph breaks
                 "\n",    # Line breaks
@@ -51,191 +74,55 @@ class ITAVectorizer:
         
         print("✅ Vectorizer initialized successfully!")
     
-    def extract_text_from_pdf(self, pdf_path: str) -> Dict:
-        """Extract text from ITA.pdf with enhanced processing"""
-        print(f"📖 Extracting text from: {pdf_path}")
-        
-        text_by_page = {}
-        total_text = ""
-        failed_pages = []
-        
-        try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
-                
-                print(f"📄 Total pages in ITA.pdf: {total_pages}")
-                
-                for page_num in range(total_pages):
-                    if page_num % 25 == 0:  # Progress indicator every 25 pages
-                        print(f"   Processing page {page_num + 1}/{total_pages}")
-                    
-                    try:
-                        page = pdf_reader.pages[page_num]
-                        text = page.extract_text()
-                        
-                        if text and text.strip():
-                            # Clean and preprocess text
-                            cleaned_text = self.clean_legal_text(text)
-                            if len(cleaned_text.strip()) > 50:  # Only meaningful content
-                                text_by_page[page_num + 1] = cleaned_text
-                                total_text += f"\n\n=== Page {page_num + 1} ===\n{cleaned_text}"
-                        else:
-                            failed_pages.append(page_num + 1)
-                            
-                    except Exception as e:
-                        print(f"⚠️ Error processing page {page_num + 1}: {e}")
-                        failed_pages.append(page_num + 1)
-                        continue
-                
-                processed_pages = len(text_by_page)
-                print(f"✅ Successfully processed {processed_pages}/{total_pages} pages")
-                
-                if failed_pages:
-                    print(f"⚠️ Failed to process {len(failed_pages)} pages: {failed_pages[:10]}{'...' if len(failed_pages) > 10 else ''}")
-                
-                return {
-                    'total_text': total_text,
-                    'text_by_page': text_by_page,
-                    'total_pages': total_pages,
-                    'processed_pages': processed_pages,
-                    'failed_pages': failed_pages,
-                    'success_rate': (processed_pages / total_pages) * 100
-                }
-                
-        except Exception as e:
-            print(f"❌ Error reading ITA.pdf: {e}")
-            return None
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed chunks, skipping the model for chunks already in the embedding cache"""
+        if self.embedding_cache is None:
+            return self.embedder.encode(texts)
+        return self.embedding_cache.encode(texts, self.embedder.encode)
     
     def clean_legal_text(self, text: str) -> str:
         """Clean and preprocess legal document text"""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Fix common OCR issues in legal documents
-        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)  # Add space between camelCase
-        text = re.sub(r'(\d+)([A-Z])', r'\1 \2', text)    # Add space between number and letter
-        
-        # Clean up section numbering
-        text = re.sub(r'(\d+)\s*\.\s*(\d+)', r'\1.\2', text)  # Fix section numbering
-        
-        # Remove page headers/footers patterns
-        text = re.sub(r'Page\s+\d+.*', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'Income\s+Tax\s+Act.*\d{4}', '', text, flags=re.IGNORECASE)
-        
-        return text.strip()
+        return clean_legal_text(text)
     
-    def create_enhanced_chunks(self, pdf_data: Dict) -> List[Dict]:
-        """Create enhanced chunks with comprehensive metadata"""
-        print(f"🧩 Creating optimized text chunks...")
-        
-        total_text = pdf_data['total_text']
-        text_by_page = pdf_data['text_by_page']
-        
-        # Split text into chunks
-        chunks = self.text_splitter.split_text(total_text)
-        
-        print(f"📝 Created {len(chunks)} initial chunks")
-        
-        # Create enhanced metadata for each chunk
-        chunks_with_metadata = []
-        
-        for i, chunk in enumerate(chunks):
-            # Find which page this chunk belongs to
-            page_num = self.find_page_for_chunk(chunk, text_by_page)
-            
-            # Extract section information if available
-            section_info = self.extract_section_info(chunk)
-            
-            # Analyze chunk content type
-            content_type = self.analyze_chunk_content(chunk)
-            
-            chunk_metadata = {
-                'chunk_id': f"ita_chunk_{i:04d}",
-                'page': page_num,
-                'length': len(chunk),
-                'section': section_info,
-                'content_type': content_type,
-                'preview': chunk[:150] + "..." if len(chunk) > 150 else chunk
-            }
-            
-            chunks_with_metadata.append({
-                'text': chunk,
-                'metadata': chunk_metadata
-            })
-        
-        # Filter out very short or empty chunks
-        filtered_chunks = [
-            chunk for chunk in chunks_with_metadata 
-            if len(chunk['text'].strip()) > 100  # Minimum meaningful content
-        ]
-        
-        print(f"✅ Created {len(filtered_chunks)} high-quality chunks (filtered from {len(chunks)})")
-        return filtered_chunks
-    
-    def find_page_for_chunk(self, chunk: str, text_by_page: Dict) -> int:
-        """Find which page a chunk belongs to with improved accuracy"""
-        # Look for page markers first
-        page_match = re.search(r'=== Page (\d+) ===', chunk)
-        if page_match:
-            return int(page_match.group(1))
-        
-        # Use word overlap method as fallback
-        chunk_words = set(chunk.lower().split()[:15])  # Use first 15 words
-        
-        best_page = 1
-        best_score = 0
-        
-        for page_num, page_text in text_by_page.items():
-            page_words = set(page_text.lower().split())
-            overlap = len(chunk_words.intersection(page_words))
-            
-            if overlap > best_score:
-                best_score = overlap
-                best_page = page_num
-        
-        return best_page
+    def build_chunk_metadata(self, number: int, chunk: str, char_start: int, char_end: int,
+                             page_num: int, page_end: int) -> Dict:
+        """Metadata row for one chunk, located by its offsets and page range"""
+        return {
+            'chunk_id': f"ita_chunk_{number:04d}",
+            'page': page_num,
+            'page_end': page_end,
+            'char_start': char_start,
+            'char_end': char_end,
+            'length': len(chunk),
+            'section': self.extract_section_info(chunk),
+            'content_type': self.analyze_chunk_content(chunk),
+            'preview': chunk[:150] + "..." if len(chunk) > 150 else chunk
+        }
     
     def extract_section_info(self, chunk: str) -> str:
         """Extract section information from chunk"""
-        # Look for section patterns in legal documents
-        section_patterns = [
-            r'Section\s+(\d+[A-Z]*)',
-            r'Chapter\s+([IVX]+)',
-            r'Rule\s+(\d+)',
-            r'Sub-section\s+\((\d+)\)',
-            r'Clause\s+\(([a-z])\)'
-        ]
-        
-        for pattern in section_patterns:
-            match = re.search(pattern, chunk, re.IGNORECASE)
-            if match:
-                return match.group(0)
-        
-        return "General"
+        return find_section_reference(chunk) or "General"
     
     def analyze_chunk_content(self, chunk: str) -> str:
         """Analyze the type of content in the chunk"""
-        chunk_lower = chunk.lower()
-        
-        if any(word in chunk_lower for word in ['definition', 'means', 'shall mean']):
-            return 'definition'
-        elif any(word in chunk_lower for word in ['exemption', 'exempt', 'not taxable']):
-            return 'exemption'
-        elif any(word in chunk_lower for word in ['penalty', 'fine', 'punishment']):
-            return 'penalty'
-        elif any(word in chunk_lower for word in ['procedure', 'process', 'filing']):
-            return 'procedure'
-        elif any(word in chunk_lower for word in ['rate', 'percentage', 'calculation']):
-            return 'calculation'
-        elif any(word in chunk_lower for word in ['deduction', 'allowance', 'relief']):
-            return 'deduction'
-        else:
-            return 'general'
+        return classify_content(chunk)
     
-    def create_ita_vector_database(self) -> bool:
-        """Create comprehensive vector database for ITA.pdf"""
+    def create_ita_vector_database(self, incremental: bool = True, resume: bool = False,
+                                   checkpoint_dir: Optional[str] = DEFAULT_CHECKPOINT_DIR,
+                                   progress: Optional[bool] = None) -> bool:
+        """
+        Create or incrementally update the vector database for ITA.pdf
+        
+        Args:
+            incremental (bool): Reuse vectors of unchanged chunks from the existing
+                ITA_primary database and embed only new or changed chunks
+            resume (bool): Continue an interrupted run from its checkpoints
+            checkpoint_dir (str): Where cleaned pages and embedded batches are
+                checkpointed during the run, or None to disable checkpointing
+            progress (bool): Print live stage throughput (default: RAG_BUILD_PROGRESS)
+        """
         start_time = time.time()
+        report = BuildReport('ITA_primary', 'ita_vectorizer', live=progress)
         
         pdf_path = "ITA.pdf"
         
@@ -246,92 +133,171 @@ class ITAVectorizer:
         print(f"🚀 Starting comprehensive vectorization of ITA.pdf")
         print(f"📊 File size: {os.path.getsize(pdf_path) / (1024*1024):.2f} MB")
         
-        # Extract text from PDF
-        pdf_data = self.extract_text_from_pdf(pdf_path)
-        if not pdf_data:
-            return False
-        
-        print(f"📈 Text extraction success rate: {pdf_data['success_rate']:.1f}%")
-        
-        # Create chunks with metadata
-        chunks_with_metadata = self.create_enhanced_chunks(pdf_data)
-        
-        if not chunks_with_metadata:
-            print("❌ No chunks created")
-            return False
-        
-        # Prepare texts for vectorization
-        texts = [chunk['text'] for chunk in chunks_with_metadata]
-        metadatas = [chunk['metadata'] for chunk in chunks_with_metadata]
-        
-        print(f"🔄 Creating FAISS vector database with {len(texts)} chunks...")
-        
         try:
-            # Create FAISS vector store with progress indication
-            vector_store = FAISS.from_texts(
-                texts=texts,
-                embedding=self.embeddings,
-                metadatas=metadatas
-            )
-            
             # Create directories
             os.makedirs("vector_database", exist_ok=True)
             os.makedirs("document_metadata", exist_ok=True)
             
-            # Save vector database with specific name for ITA
+            # Stream pages -> chunks -> embedding batches into the ID-mapped index,
+            # embedding only new or changed chunks
             vector_db_path = "vector_database/ITA_primary_vectors"
-            vector_store.save_local(vector_db_path)
+            if not incremental and os.path.exists(vector_db_path):
+                shutil.rmtree(vector_db_path)
+            
+            # Separate from rebuild_vector_db's checkpoints, whose fingerprint never matches this builder's
+            checkpoint = open_build_checkpoint('ITA_primary_incremental', input_fingerprint(
+                pdf_path, builder='ita_vectorizer', chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap, model='all-MiniLM-L6-v2'
+            ), resume, checkpoint_dir)
+            
+            pipeline = IngestPipeline(
+                self.text_splitter, self.clean_legal_text, self.embed_texts,
+                batch_size=self.embedding_batch_size, workers=self.extraction_workers,
+                dedup_threshold=self.dedup_threshold
+            )
+            result = pipeline.run(
+                pdf_path, vector_db_path,
+                lambda record: self.build_chunk_metadata(record[0], record[3], record[1],
+                                                         record[2], record[4], record[5]),
+                checkpoint=checkpoint,
+                report=report
+            )
+            if result is None:
+                print("❌ No chunks created")
+                return False
+            
+            vector_index = result['index']
+            metadatas = result['metadatas']
+            update_stats = result['index_update']
+            
+            print(f"✅ Successfully processed {result['processed_pages']}/{result['total_pages']} pages")
+            failed_pages = result['failed_pages']
+            if failed_pages:
+                print(f"⚠️ Failed to process {len(failed_pages)} pages: {failed_pages[:10]}{'...' if len(failed_pages) > 10 else ''}")
+            print(f"📈 Text extraction success rate: {result['success_rate']:.1f}%")
+            print(f"✅ Created {len(metadatas)} high-quality chunks (filtered from {result['initial_chunks']})")
+            dedup_stats = result['deduplication']
+            if dedup_stats is not None:
+                print(f"🧹 Dropped {dedup_stats['duplicates']} near-duplicate chunks "
+                      f"(similarity ≥ {dedup_stats['threshold']})")
+            print(f"🧮 Embedded {update_stats['added']} new chunks, reused {update_stats['unchanged']}, "
+                  f"removed {update_stats['removed']} stale vectors")
+            if self.embedding_cache is not None:
+                print(self.embedding_cache.report())
+            
+            for meta, content_id in zip(metadatas, vector_index.row_ids):
+                meta['content_id'] = int(content_id)
             
             # Save comprehensive metadata
             processing_time = time.time() - start_time
             
             # Analyze content distribution
             content_types = {}
-            for chunk in chunks_with_metadata:
-                content_type = chunk['metadata']['content_type']
+            for meta in metadatas:
+                content_type = meta['content_type']
                 content_types[content_type] = content_types.get(content_type, 0) + 1
             
+            metadata_file = "document_metadata/ITA_primary_metadata.json"
             metadata = {
                 'filename': 'ITA.pdf',
                 'document_id': 'ITA_primary',
-                'total_pages': pdf_data['total_pages'],
-                'processed_pages': pdf_data['processed_pages'],
-                'total_chunks': len(chunks_with_metadata),
+                'total_pages': result['total_pages'],
+                'processed_pages': result['processed_pages'],
+                'total_chunks': len(metadatas),
                 'chunk_size': self.chunk_size,
                 'chunk_overlap': self.chunk_overlap,
                 'processing_time': f"{processing_time:.2f} seconds",
-                'success_rate': f"{pdf_data['success_rate']:.1f}%",
+                'build_report': os.path.basename(report_path_for(metadata_file)),
+                'success_rate': f"{result['success_rate']:.1f}%",
                 'content_distribution': content_types,
-                'failed_pages': pdf_data.get('failed_pages', []),
+                'failed_pages': result['failed_pages'],
+                'extraction_workers': result['extraction_workers'],
+                'index_update': update_stats,
+                'deduplication': dedup_stats,
+                'embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None,
                 'chunks_metadata': metadatas,
                 'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
                 'model_used': 'all-MiniLM-L6-v2'
             }
             
-            with open("document_metadata/ITA_primary_metadata.json", 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
+            with report.stage('save'):
+                write_document_metadata(metadata_file, metadata)
+                
+                # Manifest goes last so a running server only reloads complete builds
+                write_index_manifest(vector_db_path, vector_index.index.d, vector_index.ntotal, {
+                    'document_id': 'ITA_primary',
+                    'embedding_model': 'all-MiniLM-L6-v2',
+                    'deduplicated': dedup_stats is not None
+                })
+            
+            report.details.update({
+                'total_pages': result['total_pages'],
+                'processed_pages': result['processed_pages'],
+                'total_chunks': len(metadatas),
+                'extraction_workers': result['extraction_workers'],
+                'embedding_processes': self.embedder.processes,
+                'index_update': update_stats,
+                'deduplication': dedup_stats,
+                'embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None
+            })
+            report_file = report.write(metadata_file)
             
             print(f"\n🎉 ITA.pdf Vector Database Created Successfully!")
             print(f"=" * 50)
             print(f"📄 Document: ITA.pdf")
-            print(f"📊 Pages processed: {pdf_data['processed_pages']}/{pdf_data['total_pages']} ({pdf_data['success_rate']:.1f}%)")
-            print(f"🧩 Total chunks: {len(chunks_with_metadata)}")
+            print(f"📊 Pages processed: {result['processed_pages']}/{result['total_pages']} ({result['success_rate']:.1f}%)")
+            print(f"🧩 Total chunks: {len(metadatas)}")
             print(f"⏱️ Processing time: {processing_time:.2f} seconds")
             print(f"🏷️ Content types: {content_types}")
             print(f"💾 Vector database: vector_database/ITA_primary_vectors")
-            print(f"📝 Metadata: document_metadata/ITA_primary_metadata.json")
+            print(f"📝 Metadata: document_metadata/ITA_primary_metadata.json (+ ITA_primary_columns/)")
+            print(report.summary())
+            print(f"📈 Build report: {report_file}")
+            
+            if checkpoint is not None:
+                checkpoint.clear()
             
             return True
             
         except Exception as e:
             print(f"❌ Error creating vector database: {e}")
+            if checkpoint_dir:
+                print(f"💡 Completed stages are checkpointed; re-run with --resume to continue")
             return False
 
 def main():
     """Main function to create ITA vector database"""
-    vectorizer = ITAVectorizer()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Create or update the ITA_primary vector database")
+    parser.add_argument('--full', action='store_true',
+                        help="Discard the existing index and re-embed every chunk")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted run from its checkpoints")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes for PDF text extraction (default: all cores)")
+    parser.add_argument('--batch-size', type=int, default=256,
+                        help="Chunks per embedding batch (default: 256)")
+    parser.add_argument('--embed-processes', type=int, default=None,
+                        help="Processes for embedding (default: RAG_EMBED_PROCESSES or 1)")
+    parser.add_argument('--encode-batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Texts per model forward pass (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="Keep near-duplicate chunks in the index")
+    parser.add_argument('--progress', action='store_true', default=None,
+                        help="Print live stage throughput (default: RAG_BUILD_PROGRESS)")
+    args = parser.parse_args()
+    
+    vectorizer = ITAVectorizer(extraction_workers=args.workers, embedding_batch_size=args.batch_size,
+                               embedding_processes=args.embed_processes,
+                               encode_batch_size=args.encode_batch_size,
+                               dedup_threshold=None if args.no_dedup else DEFAULT_DEDUP_THRESHOLD)
     
-    success = vectorizer.create_ita_vector_database()
+    try:
+        success = vectorizer.create_ita_vector_database(incremental=not args.full, resume=args.resume,
+                                                        progress=args.progress)
+    finally:
+        vectorizer.embedder.close()
     
     if success:
         print(f"\n✅ ITA.pdf is now ready for RAG chatbot!")
@@ -0,0 +1,300 @@
+"""
+Memory accounting of the loaded chatbots
+Breaks the process's memory down by component of each loaded document: the
+SentenceTransformer weights, the FAISS index, the chunks, the chunk metadata,
+the row-id map, the query cache, the conversation history, the re-ranker and
+the answer generator.
+
+Heap objects are measured with a recursive sys.getsizeof walk (NumPy arrays by
+nbytes, torch modules by their state_dict tensors, FAISS indexes by their
+serialized size). Memory-mapped stores (chunks.bin, columnar metadata) report
+their file size and, on Linux, how much of it is resident from /proc/self/smaps.
+tracemalloc snapshots are available on request for finding what the
+breakdown does not cover.
+"""
+
+import os
+import sys
+import tracemalloc
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from chunk_store import ChunkStore
+from metadata_store import ColumnarMetadata
+
+# Component order in reports
+MEMORY_COMPONENTS = ['model', 'faiss_index', 'chunks', 'metadata', 'row_id_map',
+                     'query_cache', 'conversation_history', 'reranker', 'generator']
+
+# snapshot.statistics() groupings
+TRACEMALLOC_GROUPINGS = ('lineno', 'filename', 'traceback')
+
+_faiss_sizes = {}
+
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """
+    Approximate bytes held by an object and everything it references
+
+    Args:
+        obj: Object to measure
+        seen (set): ids already counted (shared objects are counted once)
+
+    Returns:
+        int: Size in bytes
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        # Views and memory maps do not own their data
+        return sys.getsizeof(obj) if obj.base is not None else obj.nbytes + sys.getsizeof(obj)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_sizeof(key, seen) + deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_sizeof(item, seen)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def _tensor_bytes(value, seen: set) -> int:
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item, seen) for item in value)
+    if not (hasattr(value, 'numel') and hasattr(value, 'element_size')):
+        return 0
+    try:
+        key = value.data_ptr()
+    except Exception:
+        key = id(value)
+    if key in seen:
+        return 0
+    seen.add(key)
+    return value.numel() * value.element_size()
+
+
+def model_bytes(model) -> int:
+    """
+    Tensor bytes of a torch module (0 for anything else)
+
+    Walks the state_dict rather than parameters() so that int8 weights packed by
+    dynamic quantization are counted; tied weights are counted once.
+    """
+    if model is None or not hasattr(model, 'state_dict'):
+        return 0
+    seen = set()
+    return int(sum(_tensor_bytes(value, seen) for value in model.state_dict().values()))
+
+
+def faiss_index_bytes(index) -> int:
+    """Serialized size of a FAISS index, cached per index object and vector count"""
+    if index is None:
+        return 0
+    key = (id(index), index.ntotal)
+    if key not in _faiss_sizes:
+        import faiss
+        _faiss_sizes.clear()
+        _faiss_sizes[key] = int(faiss.serialize_index(index).nbytes)
+    return _faiss_sizes[key]
+
+
+def process_rss() -> Dict[str, int]:
+    """Current and peak resident set size of this process in bytes"""
+    current = peak = 0
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    current = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+        peak = peak if sys.platform == 'darwin' else peak * 1024
+    return {'rss_bytes': current, 'peak_rss_bytes': peak}
+
+
+def mapped_resident_bytes() -> Dict[str, int]:
+    """Resident bytes of each file mapped into this process (Linux only, else empty)"""
+    resident = {}
+    path = None
+    try:
+        with open('/proc/self/smaps', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if not fields:
+                    continue
+                if not fields[0].endswith(':'):
+                    # Mapping header: address perms offset dev inode [path]
+                    path = fields[5] if len(fields) > 5 else None
+                elif fields[0] == 'Rss:' and path:
+                    resident[path] = resident.get(path, 0) + int(fields[1]) * 1024
+    except OSError:
+        return {}
+    return resident
+
+
+def _mapped_files(store) -> List[str]:
+    if isinstance(store, ChunkStore):
+        return [store.path] if store.nbytes else []
+    if isinstance(store, ColumnarMetadata):
+        return [os.path.join(store.columns_dir, column['file']) for column in store.manifest['columns']]
+    return []
+
+
+def _store_usage(store, resident: Dict[str, int], seen: set) -> Dict:
+    """Heap bytes of an in-memory list, or mapped and resident bytes of a memory-mapped store"""
+    files = _mapped_files(store)
+    if not files:
+        return {'bytes': deep_sizeof(store, seen), 'items': len(store) if store is not None else 0}
+    mapped = sum(os.path.getsize(path) for path in files if os.path.exists(path))
+    return {
+        'bytes': 0,
+        'items': len(store),
+        'mapped_bytes': mapped,
+        'resident_mapped_bytes': sum(resident.get(os.path.realpath(path), 0) for path in files)
+    }
+
+
+def chatbot_memory(bot, resident: Optional[Dict[str, int]] = None, seen: Optional[set] = None) -> Dict[str, Dict]:
+    """
+    Memory of one chatbot by component
+
+    Args:
+        bot (AdvancedRAGChatbot): Loaded chatbot
+        resident (Dict): mapped_resident_bytes() result, to share between chatbots
+        seen (set): ids already counted (e.g. a model shared with another chatbot)
+
+    Returns:
+        Dict: {component: {'bytes': heap bytes, ...}}; shared objects are marked 'shared'
+    """
+    resident = mapped_resident_bytes() if resident is None else resident
+    seen = set() if seen is None else seen
+    report = {}
+
+    model = getattr(bot, 'model', None)
+    report['model'] = {'bytes': model_bytes(model), 'shared': id(model) in seen}
+    seen.add(id(model))
+
+    index = getattr(bot, 'faiss_index', None)
+    report['faiss_index'] = {'bytes': faiss_index_bytes(index), 'items': index.ntotal if index is not None else 0}
+
+    report['chunks'] = _store_usage(getattr(bot, 'chunks', None), resident, seen)
+    report['metadata'] = _store_usage(getattr(bot, 'metadata', None), resident, seen)
+    report['row_id_map'] = {'bytes': deep_sizeof(getattr(bot, 'row_id_map', None), seen)}
+
+    cache = getattr(bot, 'query_cache', None)
+    if hasattr(cache, 'stats'):
+        # QueryCache keeps a running total of the sizes it evicts by
+        stats = cache.stats()
+        report['query_cache'] = {'bytes': stats['bytes'], 'items': stats['entries'], 'evictions': stats['evictions'],
+                                 'max_bytes': stats['max_bytes'], 'max_entries': stats['max_entries']}
+    else:
+        report['query_cache'] = {'bytes': deep_sizeof(cache, seen), 'items': len(cache) if cache is not None else 0}
+    history = getattr(bot, 'conversation_history', [])
+    report['conversation_history'] = {'bytes': deep_sizeof(history, seen), 'items': len(history)}
+
+    reranker = getattr(bot, 'reranker', None)
+    if reranker is not None:
+        shared = id(reranker) in seen
+        loaded = reranker._model
+        report['reranker'] = {
+            'bytes': 0 if shared else model_bytes(getattr(loaded, 'model', loaded)) + deep_sizeof(reranker._cache, seen),
+            'items': len(reranker._cache),
+            'shared': shared
+        }
+        seen.add(id(reranker))
+
+    generator = getattr(bot, 'generator', None)
+    if generator is not None:
+        shared = id(generator) in seen
+        report['generator'] = {
+            'bytes': 0 if shared else model_bytes(generator._model),
+            'quantized': generator.quantized,
+            'shared': shared
+        }
+        seen.add(id(generator))
+    return report
+
+
+def memory_report(bots: Iterable) -> Dict:
+    """
+    Memory of the process and of each loaded chatbot
+
+    Args:
+        bots: Loaded chatbots (an object shared by several is counted once)
+
+    Returns:
+        Dict: {'process': {...}, 'documents': {document_id: {component: {...}}}}
+    """
+    resident = mapped_resident_bytes()
+    seen = set()
+    documents = {}
+    accounted = 0
+    for bot in bots:
+        components = chatbot_memory(bot, resident, seen)
+        for usage in components.values():
+            if not usage.get('shared'):
+                accounted += usage['bytes'] + usage.get('resident_mapped_bytes', 0)
+        documents[bot.document_id] = components
+
+    process = process_rss()
+    process['accounted_bytes'] = accounted
+    process['unaccounted_bytes'] = max(0, process['rss_bytes'] - accounted) if process['rss_bytes'] else None
+    return {'process': process, 'documents': documents}
+
+
+def start_tracemalloc() -> bool:
+    """Start tracing allocations (RAG_TRACEMALLOC frames per trace, default 1); False if already tracing"""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(int(os.environ.get('RAG_TRACEMALLOC', 1) or 1))
+    return True
+
+
+def tracemalloc_top(limit: int = 20, group_by: str = 'lineno') -> Dict:
+    """
+    Largest allocation sites traced by tracemalloc
+
+    Tracing is started on first use (or at startup with RAG_TRACEMALLOC=<frames>);
+    only allocations made after that are seen.
+
+    Args:
+        limit (int): Sites to return
+        group_by (str): 'lineno', 'filename' or 'traceback'
+
+    Returns:
+        Dict: Traced totals and the top allocation sites
+    """
+    if group_by not in TRACEMALLOC_GROUPINGS:
+        raise ValueError(f"Unknown group_by {group_by!r}, expected one of {TRACEMALLOC_GROUPINGS}")
+    if start_tracemalloc():
+        return {'tracing': True, 'started': True, 'top': []}
+
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ])
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        'tracing': True,
+        'started': False,
+        'traced_bytes': current,
+        'traced_peak_bytes': peak,
+        'top': [
+            {'site': str(stat.traceback).strip(), 'bytes': stat.size, 'blocks': stat.count}
+            for stat in snapshot.statistics(group_by)[:limit]
+        ]
+    }
@@ -0,0 +1,372 @@
+"""
+Columnar chunk metadata store for the RAG vector databases
+Replaces the monolithic chunks_metadata list in document_metadata/*.json with
+one memory-mapped file per field, so loading is O(1) and a per-hit metadata
+lookup is a handful of array reads. The JSON files are still written as an
+export and are converted to the columnar layout on first load.
+
+Layout of document_metadata/<name>_columns/:
+    manifest.json          document-level fields, row count and column kinds
+    <field>.npy            'int' / 'float' columns
+    <field>.codes.npy      'enum' columns (values listed in the manifest)
+    <field>.chunks         'text' / 'json' columns (chunk store format)
+"""
+
+import os
+import json
+import shutil
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from chunk_store import ChunkStore, write_chunk_store
+
+METADATA_FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+METADATA_SUFFIX = "_metadata.json"
+COLUMNS_SUFFIX = "_columns"
+
+# A string field becomes an enum when it has at most this share of distinct values
+ENUM_MAX_DISTINCT_RATIO = 0.5
+
+_MISSING = object()
+
+
+def columns_dir_for(metadata_file_path: str) -> str:
+    """Map document_metadata/<name>_metadata.json to document_metadata/<name>_columns"""
+    base = metadata_file_path
+    if base.endswith(METADATA_SUFFIX):
+        base = base[:-len(METADATA_SUFFIX)]
+    else:
+        base = os.path.splitext(base)[0]
+    return base + COLUMNS_SUFFIX
+
+
+def _column_kind(values: List) -> str:
+    """Pick the most compact column kind that represents every value exactly"""
+    if any(v is _MISSING or v is None or isinstance(v, bool) for v in values):
+        return 'json'
+    if all(isinstance(v, int) for v in values):
+        return 'int'
+    if all(isinstance(v, (int, float)) for v in values):
+        return 'float'
+    if all(isinstance(v, str) for v in values):
+        distinct = len(set(values))
+        if distinct <= max(1, int(len(values) * ENUM_MAX_DISTINCT_RATIO)):
+            return 'enum'
+        return 'text'
+    return 'json'
+
+
+def write_columnar_metadata(columns_dir: str, chunks_metadata: List[Dict],
+                            document_info: Dict, source_path: Optional[str] = None) -> str:
+    """
+    Write chunk metadata in the columnar layout
+
+    Args:
+        columns_dir (str): Destination directory, replaced atomically
+        chunks_metadata (List[Dict]): One metadata dict per chunk, in index order
+        document_info (Dict): Document-level fields (filename, totals, ...)
+        source_path (str): JSON export the columns were derived from, used to detect staleness
+
+    Returns:
+        str: Path of the written columns directory
+    """
+    count = len(chunks_metadata)
+    field_names = []
+    for row in chunks_metadata:
+        for key in row:
+            if key not in field_names:
+                field_names.append(key)
+
+    tmp_dir = f"{columns_dir}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    try:
+        columns = []
+        for name in field_names:
+            values = [row.get(name, _MISSING) for row in chunks_metadata]
+            kind = _column_kind(values)
+            column = {'name': name, 'kind': kind}
+
+            if kind == 'int':
+                column['file'] = f"{name}.npy"
+                np.save(os.path.join(tmp_dir, column['file']), np.asarray(values, dtype=np.int64))
+            elif kind == 'float':
+                column['file'] = f"{name}.npy"
+                np.save(os.path.join(tmp_dir, column['file']), np.asarray(values, dtype=np.float64))
+            elif kind == 'enum':
+                enum_values = sorted(set(values))
+                lookup = {value: code for code, value in enumerate(enum_values)}
+                dtype = np.uint16 if len(enum_values) <= np.iinfo(np.uint16).max else np.int32
+                column['file'] = f"{name}.codes.npy"
+                column['values'] = enum_values
+                np.save(os.path.join(tmp_dir, column['file']),
+                        np.asarray([lookup[v] for v in values], dtype=dtype))
+            elif kind == 'text':
+                column['file'] = f"{name}.chunks"
+                write_chunk_store(os.path.join(tmp_dir, column['file']), values)
+            else:
+                # Empty string marks a missing key, anything else is a JSON document
+                column['file'] = f"{name}.chunks"
+                write_chunk_store(
+                    os.path.join(tmp_dir, column['file']),
+                    ("" if v is _MISSING else json.dumps(v, ensure_ascii=False) for v in values)
+                )
+
+            columns.append(column)
+
+        source = None
+        if source_path and os.path.exists(source_path):
+            stat = os.stat(source_path)
+            source = {
+                'file': os.path.basename(source_path),
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns
+            }
+
+        manifest = {
+            'format_version': METADATA_FORMAT_VERSION,
+            'count': count,
+            'columns': columns,
+            'document': {k: v for k, v in document_info.items() if k != 'chunks_metadata'},
+            'source': source
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        old_dir = None
+        if os.path.exists(columns_dir):
+            old_dir = f"{columns_dir}.old-{os.getpid()}"
+            os.replace(columns_dir, old_dir)
+        os.replace(tmp_dir, columns_dir)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return columns_dir
+
+
+class ColumnarMetadata(Sequence):
+    """Lazy, memory-mapped view over a columnar metadata directory"""
+
+    def __init__(self, columns_dir: str):
+        """
+        Open a columnar metadata directory
+
+        Args:
+            columns_dir (str): Directory written by write_columnar_metadata()
+        """
+        self.columns_dir = columns_dir
+        with open(os.path.join(columns_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get('format_version') != METADATA_FORMAT_VERSION:
+            raise ValueError(f"Unsupported metadata format in {columns_dir}")
+
+        self.info = self.manifest.get('document', {})
+        self._count = self.manifest['count']
+        self._columns = []
+        for column in self.manifest['columns']:
+            path = os.path.join(columns_dir, column['file'])
+            if column['kind'] in ('int', 'float', 'enum'):
+                data = np.load(path, mmap_mode='r') if self._count else np.load(path)
+            else:
+                data = ChunkStore(path)
+            self._columns.append((column['name'], column['kind'], data, column.get('values')))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+
+        index = int(index)
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("metadata index out of range")
+
+        row = {}
+        for name, kind, data, values in self._columns:
+            if kind == 'int':
+                row[name] = int(data[index])
+            elif kind == 'float':
+                row[name] = float(data[index])
+            elif kind == 'enum':
+                row[name] = values[int(data[index])]
+            elif kind == 'text':
+                row[name] = data[index]
+            else:
+                raw = data[index]
+                if raw:
+                    row[name] = json.loads(raw)
+        return row
+
+    @property
+    def field_names(self) -> List[str]:
+        return [name for name, _, _, _ in self._columns]
+
+    def column(self, name: str) -> Union[np.ndarray, Sequence]:
+        """
+        Raw column access for vectorised filtering
+
+        Returns the NumPy array for 'int'/'float' columns, the code array for
+        'enum' columns (see enum_values) and a lazy sequence otherwise.
+        """
+        for column_name, _, data, _ in self._columns:
+            if column_name == name:
+                return data
+        raise KeyError(name)
+
+    def enum_values(self, name: str) -> List[str]:
+        """Distinct values of an 'enum' column, indexed by code"""
+        for column_name, kind, _, values in self._columns:
+            if column_name == name:
+                if kind != 'enum':
+                    raise ValueError(f"Column '{name}' is not an enum column")
+                return values
+        raise KeyError(name)
+
+    def is_stale(self, source_path: str) -> bool:
+        """True when the JSON export has been rewritten since the columns were built"""
+        source = self.manifest.get('source')
+        if not source or not os.path.exists(source_path):
+            return False
+        stat = os.stat(source_path)
+        return stat.st_size != source['size'] or stat.st_mtime_ns != source['mtime_ns']
+
+    def to_dict(self) -> Dict:
+        """Rebuild the full JSON export document"""
+        document = dict(self.info)
+        document['chunks_metadata'] = [self[i] for i in range(self._count)]
+        return document
+
+    def close(self):
+        """Release memory maps held by the text columns"""
+        for _, _, data, _ in self._columns:
+            if isinstance(data, ChunkStore):
+                data.close()
+        self._columns = []
+
+
+def write_document_metadata(metadata_file_path: str, document_metadata: Dict) -> str:
+    """
+    Write the JSON export and its columnar counterpart for one document
+
+    Args:
+        metadata_file_path (str): Path of the <name>_metadata.json export
+        document_metadata (Dict): Document metadata including 'chunks_metadata'
+
+    Returns:
+        str: Path of the columns directory
+    """
+    with open(metadata_file_path, 'w', encoding='utf-8') as f:
+        json.dump(document_metadata, f, indent=2, ensure_ascii=False)
+
+    return write_columnar_metadata(
+        columns_dir_for(metadata_file_path),
+        document_metadata.get('chunks_metadata', []),
+        document_metadata,
+        source_path=metadata_file_path
+    )
+
+
+def load_document_metadata(metadata_dir: str, metadata_file: str) -> Tuple[Optional[Dict], Optional[Sequence]]:
+    """
+    Load document info and per-chunk metadata, preferring the columnar layout
+
+    The JSON export is parsed only when the columns are missing or stale, and
+    the columns are written then so later loads are O(1).
+
+    Args:
+        metadata_dir (str): The document_metadata directory
+        metadata_file (str): File name of the <name>_metadata.json export
+
+    Returns:
+        Tuple[Dict, Sequence[Dict]]: (document info, chunk metadata), or (None, None) if absent
+    """
+    json_path = os.path.join(metadata_dir, metadata_file)
+    columns_dir = columns_dir_for(json_path)
+
+    if os.path.exists(os.path.join(columns_dir, MANIFEST_FILENAME)):
+        try:
+            columns = ColumnarMetadata(columns_dir)
+            if not columns.is_stale(json_path):
+                return columns.info, columns
+            columns.close()
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable columnar metadata {columns_dir}: {e}")
+
+    if not os.path.exists(json_path):
+        return None, None
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        metadata_info = json.load(f)
+    chunks_metadata = metadata_info.get('chunks_metadata', [])
+
+    try:
+        print(f"🔄 Converting {json_path} to columnar metadata...")
+        write_columnar_metadata(columns_dir, chunks_metadata, metadata_info, source_path=json_path)
+        columns = ColumnarMetadata(columns_dir)
+        return columns.info, columns
+    except OSError as e:
+        print(f"⚠️ Could not write columnar metadata ({e}), using JSON in memory")
+        return metadata_info, chunks_metadata
+
+
+def export_json(columns_dir: str, output_path: str) -> str:
+    """Export a columnar metadata directory back to the JSON format"""
+    columns = ColumnarMetadata(columns_dir)
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(columns.to_dict(), f, indent=2, ensure_ascii=False)
+    finally:
+        columns.close()
+    return output_path
+
+
+def main():
+    """Convert every JSON metadata file under document_metadata/ to the columnar layout"""
+    import sys
+
+    if len(sys.argv) > 2 and sys.argv[1] == "export":
+        columns_dir = sys.argv[2]
+        output_path = sys.argv[3] if len(sys.argv) > 3 else columns_dir[:-len(COLUMNS_SUFFIX)] + METADATA_SUFFIX
+        export_json(columns_dir, output_path)
+        print(f"✅ Exported {columns_dir} to {output_path}")
+        return
+
+    metadata_dir = sys.argv[1] if len(sys.argv) > 1 else "document_metadata"
+    if not os.path.exists(metadata_dir):
+        print(f"❌ Metadata directory not found: {metadata_dir}")
+        return
+
+    for filename in sorted(os.listdir(metadata_dir)):
+        if not filename.endswith(METADATA_SUFFIX):
+            continue
+        json_path = os.path.join(metadata_dir, filename)
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                metadata_info = json.load(f)
+            columns_dir = write_columnar_metadata(
+                columns_dir_for(json_path),
+                metadata_info.get('chunks_metadata', []),
+                metadata_info,
+                source_path=json_path
+            )
+            columns = ColumnarMetadata(columns_dir)
+            kinds = ", ".join(f"{c['name']}:{c['kind']}" for c in columns.manifest['columns'])
+            print(f"✅ {filename}: {len(columns)} rows ({kinds})")
+            columns.close()
+        except Exception as e:
+            print(f"❌ {filename}: {e}")
+
+
+if __name__ == "__main__":
+    main()
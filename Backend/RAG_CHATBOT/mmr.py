@@ -0,0 +1,114 @@
+"""
+Maximal marginal relevance (MMR) diversification of retrieval candidates
+The index is searched for top_k * oversample candidates together with their
+stored vectors (faiss search_and_reconstruct, so nothing is re-embedded), then
+MMR repeatedly picks the candidate that maximises
+
+    lambda * sim(query, candidate) - (1 - lambda) * max sim(candidate, already picked)
+
+All similarities come from one candidate x candidate matrix product; each pick
+is a vectorised argmax, so there are no Python-level pairwise loops.
+lambda = 1 keeps the plain relevance order, lower values favour diversity.
+"""
+
+import os
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_OVERSAMPLE = 3
+
+
+def default_mmr_lambda() -> Optional[float]:
+    """MMR lambda used when a caller gives none (RAG_MMR_LAMBDA; unset disables MMR)"""
+    value = os.environ.get('RAG_MMR_LAMBDA')
+    return float(value) if value else None
+
+
+def default_oversample() -> int:
+    """Candidates fetched per requested chunk (RAG_MMR_OVERSAMPLE, default 3)"""
+    return max(1, int(os.environ.get('RAG_MMR_OVERSAMPLE', DEFAULT_OVERSAMPLE)))
+
+
+def search_with_vectors(index, query_vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Search an index and return the stored vectors of the hits
+
+    Returns:
+        Tuple: (distances, labels, vectors of shape (nq, k, d)); vectors is None
+               when the index type cannot reconstruct stored vectors
+    """
+    try:
+        return index.search_and_reconstruct(query_vectors, k)
+    except RuntimeError:
+        distances, labels = index.search(query_vectors, k)
+        return distances, labels, None
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def mmr_order(query_vector: np.ndarray, candidate_vectors: np.ndarray, lambda_: float,
+              k: Optional[int] = None) -> np.ndarray:
+    """
+    MMR selection order over candidates
+
+    Args:
+        query_vector (np.ndarray): Query embedding, shape (d,)
+        candidate_vectors (np.ndarray): Candidate embeddings, shape (n, d)
+        lambda_ (float): Relevance weight in [0, 1]
+        k (int): Number of candidates to select (default: all, i.e. a full re-ordering)
+
+    Returns:
+        np.ndarray: Candidate positions in selection order
+    """
+    n = len(candidate_vectors)
+    k = n if k is None else min(k, n)
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+
+    candidates = _normalize(np.asarray(candidate_vectors, dtype='float32'))
+    relevance = candidates @ _normalize(np.asarray(query_vector, dtype='float32'))
+    similarity = candidates @ candidates.T
+
+    order = np.empty(k, dtype=np.int64)
+    # Max similarity to any picked candidate (negative similarity is no bonus)
+    redundancy = np.zeros(n, dtype='float32')
+    available = np.ones(n, dtype=bool)
+    for step in range(k):
+        scores = lambda_ * relevance - (1.0 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        order[step] = pick
+        available[pick] = False
+        np.maximum(redundancy, similarity[pick], out=redundancy)
+    return order
+
+
+def diversify(query_vector: np.ndarray, distances: Sequence[float], labels: Sequence[int],
+              vectors: Optional[np.ndarray], lambda_: float,
+              embed_fn: Callable[[List[int]], np.ndarray]) -> List[Tuple[float, int]]:
+    """
+    Re-order one query's (distance, label) hits by MMR
+
+    Args:
+        query_vector (np.ndarray): Query embedding, shape (d,)
+        distances, labels: Search results of the query (labels < 0 are dropped)
+        vectors (np.ndarray): Stored vectors of the hits, or None if unavailable
+        lambda_ (float): Relevance weight in [0, 1]
+        embed_fn (Callable): Embeds hits by label when vectors is None
+
+    Returns:
+        List[Tuple[float, int]]: (distance, label) pairs in MMR order
+    """
+    valid = [position for position, label in enumerate(labels) if label >= 0]
+    if not valid:
+        return []
+    if vectors is not None:
+        candidate_vectors = np.asarray(vectors)[valid]
+    else:
+        candidate_vectors = embed_fn([labels[position] for position in valid])
+    order = mmr_order(query_vector, candidate_vectors, lambda_)
+    return [(distances[valid[i]], labels[valid[i]]) for i in order]
@@ -0,0 +1,138 @@
+"""
+Parallel PDF text extraction
+Splits the page range of a PDF into small tasks that run on a process pool.
+Every worker opens the PDF itself, so nothing large is pickled between
+processes, and results are handed back strictly in page order together with a
+per-page failure list.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import PyPDF2
+
+# (1-based page number, extracted text or None, error message or None)
+PageResult = Tuple[int, Optional[str], Optional[str]]
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Number of pages in a PDF"""
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> List[PageResult]:
+    """
+    Extract pages [start, end) of a PDF (0-based, end exclusive)
+
+    Runs inside worker processes; a failing page is reported, not raised.
+    """
+    results = []
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for page_index in range(start, end):
+            try:
+                text = reader.pages[page_index].extract_text() or ""
+                results.append((page_index + 1, text, None))
+            except Exception as e:
+                results.append((page_index + 1, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _page_ranges(total_pages: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + pages_per_task, total_pages))
+            for start in range(0, total_pages, pages_per_task)]
+
+
+def default_worker_count() -> int:
+    """Worker count used when none is given (RAG_EXTRACT_WORKERS or all cores)"""
+    configured = os.environ.get('RAG_EXTRACT_WORKERS')
+    if configured:
+        return max(1, int(configured))
+    return os.cpu_count() or 1
+
+
+def iter_pdf_pages(pdf_path: str, workers: Optional[int] = None,
+                   pages_per_task: Optional[int] = None,
+                   total_pages: Optional[int] = None) -> Iterator[PageResult]:
+    """
+    Yield (page_number, text, error) for every page, in page order
+
+    At most two tasks per worker are in flight, so memory stays bounded even
+    when the consumer is slower than extraction.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        workers (int): Worker processes; 1 extracts in the calling process
+        pages_per_task (int): Pages handed to a worker at a time
+        total_pages (int): Page count, if the caller already knows it
+    """
+    if total_pages is None:
+        total_pages = count_pdf_pages(pdf_path)
+    if total_pages == 0:
+        return
+
+    workers = max(1, min(workers or default_worker_count(), total_pages))
+    if pages_per_task is None:
+        # Several tasks per worker balance out pages that are slow to parse
+        pages_per_task = max(1, min(25, -(-total_pages // (workers * 4))))
+
+    ranges = _page_ranges(total_pages, pages_per_task)
+
+    if workers == 1:
+        for start, end in ranges:
+            yield from extract_page_range(pdf_path, start, end)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        remaining = iter(ranges)
+        for start, end in remaining:
+            pending.append(executor.submit(extract_page_range, pdf_path, start, end))
+            if len(pending) >= workers * 2:
+                break
+
+        while pending:
+            results = pending.popleft().result()
+            next_range = next(remaining, None)
+            if next_range is not None:
+                pending.append(executor.submit(extract_page_range, pdf_path, *next_range))
+            yield from results
+
+
+def extract_pdf_pages(pdf_path: str, workers: Optional[int] = None,
+                      pages_per_task: Optional[int] = None) -> Dict:
+    """
+    Extract every page of a PDF across a process pool
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        workers (int): Worker processes (defaults to RAG_EXTRACT_WORKERS or all cores)
+        pages_per_task (int): Pages handed to a worker at a time
+
+    Returns:
+        Dict: 'pages' as (page_number, text) in page order, 'failed_pages' and
+              'errors' for pages that raised, plus 'total_pages' and 'workers'
+    """
+    total_pages = count_pdf_pages(pdf_path)
+    workers = max(1, min(workers or default_worker_count(), max(total_pages, 1)))
+
+    pages = []
+    failed_pages = []
+    errors = {}
+    for page_number, text, error in iter_pdf_pages(pdf_path, workers, pages_per_task, total_pages):
+        if error is not None:
+            failed_pages.append(page_number)
+            errors[page_number] = error
+        else:
+            pages.append((page_number, text))
+
+    return {
+        'pages': pages,
+        'failed_pages': failed_pages,
+        'errors': errors,
+        'total_pages': total_pages,
+        'workers': workers
+    }
@@ -0,0 +1,256 @@
+"""
+On-demand profiling of queries and a slow-query log
+A request can ask to be profiled ("profile": "sample" or "cprofile"), and a
+fraction of all requests can be profiled at random (RAG_PROFILE_SAMPLE_RATE).
+
+    sample    a background thread samples the request thread's stack every
+              RAG_PROFILE_INTERVAL_MS (default 1 ms) and counts collapsed stacks,
+              written as <name>.collapsed for flamegraph.pl / speedscope
+              (pure-Python stretches are only seen at the GIL switch
+              interval, 5 ms by default, so very fast queries get few samples)
+    cprofile  deterministic cProfile of the request, written as <name>.prof
+
+Dumps go to RAG_PROFILE_DIR (default: profiles/). Queries slower than
+RAG_SLOW_QUERY_MS (default 1000) are logged with their stage breakdown,
+candidate count and cache status, kept in memory for the admin endpoint and
+appended as JSON lines to RAG_SLOW_QUERY_LOG when set.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import random
+import cProfile
+import logging
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('sample', 'cprofile')
+DEFAULT_PROFILE_DIR = os.environ.get('RAG_PROFILE_DIR', 'profiles')
+DEFAULT_SLOW_QUERY_MS = 1000.0
+DEFAULT_SLOW_QUERY_HISTORY = 100
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Periodically sample one thread's stack and count identical (collapsed) stacks"""
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.001):
+        """
+        Args:
+            thread_id (int): Thread to sample (default: the calling thread)
+            interval (float): Seconds between samples
+        """
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self) -> List[str]:
+        """'root;...;leaf count' lines, the input format of flamegraph.pl"""
+        return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+    def top_functions(self, limit: int = 15) -> List[Dict]:
+        """Functions by the share of samples in which they were on top of the stack"""
+        total = sum(self.stacks.values())
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [{'function': function, 'samples': count, 'share': round(count / total, 3)}
+                for function, count in leaves.most_common(limit)]
+
+
+class RequestProfile:
+    """Profile of one request in either mode"""
+
+    def __init__(self, mode: str, interval: float):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}, expected one of {PROFILE_MODES}")
+        self.mode = mode
+        self.sampler = StackSampler(interval=interval) if mode == 'sample' else None
+        self.profiler = cProfile.Profile() if mode == 'cprofile' else None
+        self.path = None
+
+    def start(self):
+        if self.sampler is not None:
+            self.sampler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+        else:
+            self.profiler.disable()
+
+    def write(self, directory: str, name: str) -> str:
+        """Dump the profile (.collapsed or .prof) and return its path"""
+        os.makedirs(directory, exist_ok=True)
+        if self.sampler is not None:
+            self.path = os.path.join(directory, f"{name}.collapsed")
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(self.sampler.collapsed()) + '\n')
+        else:
+            self.path = os.path.join(directory, f"{name}.prof")
+            self.profiler.dump_stats(self.path)
+        return self.path
+
+    def summary(self, limit: int = 15) -> Dict:
+        """Hottest functions, for the API response and the slow-query log"""
+        if self.sampler is not None:
+            return {
+                'mode': self.mode,
+                'samples': sum(self.sampler.stacks.values()),
+                'interval_ms': self.sampler.interval * 1000,
+                'top_functions': self.sampler.top_functions(limit),
+                'file': self.path
+            }
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(limit)
+        return {
+            'mode': self.mode,
+            'total_calls': stats.total_calls,
+            'top_functions': stream.getvalue().strip().splitlines()[-limit:],
+            'file': self.path
+        }
+
+
+def profile_mode_for(requested=None) -> Optional[str]:
+    """
+    Profile mode for a request: the one it asked for, or a random sample
+
+    Args:
+        requested: 'sample', 'cprofile', True (= 'sample') or None
+
+    Returns:
+        str: Mode to profile with, or None to not profile
+    """
+    if requested is True:
+        return 'sample'
+    if requested in PROFILE_MODES:
+        return requested
+    rate = float(os.environ.get('RAG_PROFILE_SAMPLE_RATE', 0))
+    if rate > 0 and random.random() < rate:
+        return os.environ.get('RAG_PROFILE_MODE', 'sample')
+    return None
+
+
+@contextmanager
+def profile_request(mode: Optional[str]):
+    """Profile the block in mode; yields the RequestProfile, or None when mode is None"""
+    if mode is None:
+        yield None
+        return
+    interval = float(os.environ.get('RAG_PROFILE_INTERVAL_MS', 1)) / 1000.0
+    profile = RequestProfile(mode, interval)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
+
+
+class SlowQueryLog:
+    """Queries over a latency threshold, with their stage breakdown"""
+
+    def __init__(self, threshold_ms: Optional[float] = None, path: Optional[str] = None,
+                 history: int = DEFAULT_SLOW_QUERY_HISTORY):
+        """
+        Args:
+            threshold_ms (float): Log queries slower than this (default: RAG_SLOW_QUERY_MS or 1000)
+            path (str): JSON-lines file to append entries to (default: RAG_SLOW_QUERY_LOG, unset = none)
+            history (int): Recent entries kept in memory
+        """
+        if threshold_ms is None:
+            threshold_ms = float(os.environ.get('RAG_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS))
+        self.threshold_ms = threshold_ms
+        self.path = path if path is not None else os.environ.get('RAG_SLOW_QUERY_LOG')
+        self.entries = deque(maxlen=history)
+        self.logged = 0
+        self._lock = threading.Lock()
+
+    def record(self, query: str, document_id: str, trace, results: int,
+               profile: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Log a finished query if it was slow
+
+        Args:
+            query (str): User's question
+            document_id (str): Document that served it
+            trace (QueryTrace): The request's stage timings and counters
+            results (int): Chunks returned
+            profile (Dict): Profile summary, when the request was profiled
+
+        Returns:
+            Dict: The log entry, or None if the query was fast enough
+        """
+        timings = trace.to_dict()
+        if timings['total_ms'] < self.threshold_ms:
+            return None
+        counters = timings['counters']
+        entry = {
+            'timestamp': datetime.now().isoformat(),
+            'query': query,
+            'document_id': document_id,
+            'total_ms': timings['total_ms'],
+            'stages_ms': timings['stages_ms'],
+            'candidates': counters.get('candidates', 0),
+            'results': results,
+            'cache': 'hit' if counters.get('cache_hits') and not counters.get('cache_misses') else 'miss',
+            'cache_hits': counters.get('cache_hits', 0),
+            'cache_misses': counters.get('cache_misses', 0),
+            'profile': profile
+        }
+        with self._lock:
+            self.entries.append(entry)
+            self.logged += 1
+            if self.path:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        logger.warning(f"🐢 Slow query ({entry['total_ms']:.0f} ms > {self.threshold_ms:.0f} ms): "
+                       f"{query[:80]!r} stages={entry['stages_ms']}")
+        return entry
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        with self._lock:
+            return list(self.entries)[-limit:][::-1]
+
+
+def profile_name(document_id: str) -> str:
+    """File name stem of a request profile"""
+    return f"{document_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{int(time.perf_counter_ns() % 1_000_000):06d}"
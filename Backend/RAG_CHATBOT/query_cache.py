@@ -0,0 +1,104 @@
+"""
+Query result cache with an entry and byte budget
+Replaces the chatbots' plain dict cache, which dropped its 20 oldest entries
+whenever it passed 100. Entries are sized with the same accounting as the
+/api/rag/memory report, and least recently used entries are evicted once
+either RAG_QUERY_CACHE_ENTRIES (default 100) or RAG_QUERY_CACHE_MB (default
+64) is exceeded.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from memory_report import deep_sizeof
+
+DEFAULT_MAX_ENTRIES = 100
+DEFAULT_MAX_MB = 64.0
+
+
+class QueryCache:
+    """LRU mapping of cache key to retrieved chunks, bounded by entries and bytes"""
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            max_entries (int): Entries kept (default: RAG_QUERY_CACHE_ENTRIES or 100)
+            max_bytes (int): Bytes kept (default: RAG_QUERY_CACHE_MB or 64 MB)
+        """
+        if max_entries is None:
+            max_entries = int(os.environ.get('RAG_QUERY_CACHE_ENTRIES', DEFAULT_MAX_ENTRIES))
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('RAG_QUERY_CACHE_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self.nbytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._entries[key]
+            self._entries.move_to_end(key)
+            return value
+
+    def get(self, key, default=None):
+        """Cached value (marked as recently used), or default"""
+        with self._lock:
+            value = self._entries.get(key, default)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        size = deep_sizeof(key) + deep_sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._sizes[key]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self.nbytes += size
+            self._evict(self.max_entries, self.max_bytes)
+
+    def _evict(self, max_entries: int, max_bytes: int):
+        while self._entries and (len(self._entries) > max_entries or self.nbytes > max_bytes):
+            key, _ = self._entries.popitem(last=False)
+            self.nbytes -= self._sizes.pop(key)
+            self.evictions += 1
+
+    def shrink(self, fraction: float = 0.5) -> int:
+        """
+        Evict least recently used entries until at most fraction of the bytes remain
+
+        Returns:
+            int: Bytes freed
+        """
+        with self._lock:
+            before = self.nbytes
+            self._evict(self.max_entries, int(self.nbytes * fraction))
+            return before - self.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.nbytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,98 @@
+"""
+Per-request stage timings of the chatbot query path
+The server opens a QueryTrace for each request; the chatbots time their stages
+(context augmentation, query enhancement, encode, FAISS search, keyword boost,
+re-rank, answer formatting) with stage(), and record counters such as cache
+hits and candidate counts with count(). Outside a trace both are no-ops, so
+the chatbots pay nothing when used directly. A stage opened inside another
+(e.g. answer generation inside formatting) is subtracted from the outer one,
+so stage times never overlap.
+
+Traces are thread-local: concurrent requests on a threaded server each see
+only their own stages.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Stage order in reports
+QUERY_STAGES = ['context', 'enhance', 'encode', 'search', 'keyword_boost', 'rerank', 'generate', 'format']
+
+_local = threading.local()
+
+
+class QueryTrace:
+    """Stage timings and counters of one request"""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._end = None
+        self.stages = {}
+        self.counters = {}
+        # Time of nested stages, per open stage (innermost last)
+        self._open = []
+
+    def add(self, name: str, seconds: float):
+        """Add time to a stage (a stage that runs twice is summed)"""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def elapsed(self) -> float:
+        """Seconds from opening the trace to closing it (or to now while it is open)"""
+        return (self._end or time.perf_counter()) - self._start
+
+    def to_dict(self) -> Dict:
+        names = [name for name in QUERY_STAGES if name in self.stages]
+        names += sorted(name for name in self.stages if name not in QUERY_STAGES)
+        return {
+            'total_ms': round(self.elapsed() * 1000, 3),
+            'stages_ms': {name: round(self.stages[name] * 1000, 3) for name in names},
+            'counters': dict(self.counters)
+        }
+
+
+def current_trace() -> Optional[QueryTrace]:
+    """Trace of the request running on this thread, if any"""
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def start_trace():
+    """Open a trace for the current thread for the duration of the block"""
+    previous = current_trace()
+    trace = _local.trace = QueryTrace()
+    try:
+        yield trace
+    finally:
+        trace._end = time.perf_counter()
+        _local.trace = previous
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a stage of the current trace"""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    trace._open.append(0.0)
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        nested = trace._open.pop()
+        if trace._open:
+            trace._open[-1] += elapsed
+        trace.add(name, elapsed - nested)
+
+
+def count(name: str, amount: int = 1):
+    """Increment a counter of the current trace"""
+    trace = current_trace()
+    if trace is not None:
+        trace.count(name, amount)
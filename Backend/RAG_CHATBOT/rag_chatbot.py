@@ -1,46 +1,61 @@
 """
 Simplified RAG Chatbot without LangChain dependencies
-Uses direct FAISS and pickle loading for better compatibility
+Uses direct FAISS and chunk store loading for better compatibility
 """
 import os
-import json
 import numpy as np
 from sentence_transformers import SentenceTransformer
-import pickle
 import faiss
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
 import re
 from datetime import datetime
+from chunk_store import open_chunk_store
+from metadata_store import load_document_metadata
+from incremental_index import check_row_counts, load_row_id_map
+from index_manifest import read_index_manifest
+from mmr import default_mmr_lambda, default_oversample, diversify, search_with_vectors
+from reranker import CrossEncoderReranker, reranker_from_env
+from answer_generator import AnswerGenerator, generator_from_env
+import query_trace
+from query_cache import QueryCache
+import text_analysis
+from text_analysis import TAX_KEYWORD_CATEGORIES, TAX_KEYWORDS, section_numbers
 
 class AdvancedRAGChatbot:
-    def __init__(self, document_id: str = None):
+    def __init__(self, document_id: str = None, model: SentenceTransformer = None,
+                 reranker: CrossEncoderReranker = None, generator: AnswerGenerator = None):
         """
         Initialize the Advanced RAG Chatbot with enhanced features
         
         Args:
             document_id (str): Specific document ID to load, or None to use ITA_primary as default
+            model (SentenceTransformer): Already loaded encoder to share, e.g. across hot reloads
+            reranker (CrossEncoderReranker): Re-ranker to share (default: from RAG_RERANKER)
+            generator (AnswerGenerator): Answer generator to share (default: from RAG_GENERATOR)
         """
         print("🚀 Initializing Enhanced RAG Chatbot...")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model = model if model is not None else SentenceTransformer('all-MiniLM-L6-v2')
         self.chunks = []
         self.embeddings = None
         self.metadata = []
+        self.row_id_map = None
+        self.deduplicated = False
+        # MMR diversification of retrieved chunks (None = plain relevance order)
+        self.mmr_lambda = default_mmr_lambda()
+        self.mmr_oversample = default_oversample()
+        # Optional cross-encoder re-ranking of the top candidates
+        self.reranker = reranker if reranker is not None else reranker_from_env()
+        # Optional flan-t5 synthesis of the answer from the retrieved chunks
+        self.generator = generator if generator is not None else generator_from_env()
         self.conversation_history = []
-        self.query_cache = {}  # Cache for frequently asked questions
+        self.query_cache = QueryCache()  # Cache for frequently asked questions (LRU, entry and byte budget)
         
         # Default to ITA_primary if no specific document_id is provided
         self.document_id = document_id if document_id else "ITA_primary"
         
         # Tax-specific keywords for better context understanding
-        self.tax_keywords = {
-            'deduction': ['80c', '80d', '80e', '80g', '24b', 'deduction', 'exemption'],
-            'income': ['salary', 'income', 'earnings', 'revenue', 'profit'],
-            'regime': ['old regime', 'new regime', 'tax regime', 'regime comparison'],
-            'calculation': ['calculate', 'computation', 'formula', 'how to compute'],
-            'filing': ['itr', 'return', 'filing', 'form 16', 'form 26as'],
-            'penalty': ['penalty', 'late fee', 'interest', 'default'],
-            'assessment': ['assessment', 'notice', 'scrutiny']
-        }
+        self.tax_keywords = TAX_KEYWORD_CATEGORIES
+        self.keyword_automaton = TAX_KEYWORDS
         
         # Load the vector database
         self.load_vector_database()
@@ -91,48 +106,32 @@ class AdvancedRAGChatbot:
             # Load FAISS index and chunks
             vector_dir = os.path.join(vector_db_path, vector_file)
             faiss_index_path = os.path.join(vector_dir, "index.faiss")
-            chunks_path = os.path.join(vector_dir, "index.pkl")
             
             # Load FAISS index
             self.faiss_index = faiss.read_index(faiss_index_path)
+            # ID-mapped indexes return content-hash IDs that must be mapped back to rows
+            self.row_id_map = load_row_id_map(vector_dir, self.faiss_index)
+            # Near-duplicates were removed at build time; no need to filter per query
+            manifest = read_index_manifest(vector_dir)
+            self.deduplicated = bool(manifest and manifest.get('deduplicated'))
             
-            # Load chunks - handle both old and new pickle formats
+            # Load chunks from the memory-mapped chunk store (index.pkl is converted once)
             try:
-                with open(chunks_path, 'rb') as f:
-                    data = pickle.load(f)
-                    
-                    # Try to handle LangChain format
-                    if isinstance(data, tuple) and len(data) == 2:
-                        docstore, index_to_id = data
-                        # Extract chunks from docstore
-                        self.chunks = []
-                        for i in range(len(index_to_id)):
-                            if i in index_to_id:
-                                doc_id = index_to_id[i]
-                                if hasattr(docstore, '_dict') and doc_id in docstore._dict:
-                                    doc = docstore._dict[doc_id]
-                                    self.chunks.append(doc.page_content)
-                                else:
-                                    self.chunks.append("")
-                            else:
-                                self.chunks.append("")
-                    else:
-                        # Simple list format
-                        self.chunks = data if isinstance(data, list) else []
+                self.chunks = open_chunk_store(vector_dir)
             except Exception as e:
                 print(f"⚠️ Could not load chunks in standard format: {e}")
                 print("   Trying alternative loading method...")
                 # Create dummy chunks if needed
                 self.chunks = [f"Chunk {i}" for i in range(self.faiss_index.ntotal)]
+            # Refuse files left from two different builds by an interrupted save
+            check_row_counts(self.faiss_index, self.row_id_map, len(self.chunks), manifest)
             
             # Load metadata
-            metadata_path_full = os.path.join(metadata_path, metadata_file)
-            if os.path.exists(metadata_path_full):
-                with open(metadata_path_full, 'r', encoding='utf-8') as f:
-                    metadata_info = json.load(f)
-                    self.metadata = metadata_info.get('chunks_metadata', [])
-                    print(f"✅ Loaded vector database '{self.document_id}' with {len(self.chunks)} chunks")
-                    print(f"📄 Document: {metadata_info.get('filename', 'Unknown')}")
+            metadata_info, chunks_metadata = load_document_metadata(metadata_path, metadata_file)
+            if metadata_info is not None:
+                self.metadata = chunks_metadata
+                print(f"✅ Loaded vector database '{self.document_id}' with {len(self.chunks)} chunks")
+                print(f"📄 Document: {metadata_info.get('filename', 'Unknown')}")
             else:
                 print(f"⚠️ Metadata file not found, using default metadata")
                 self.metadata = [{'page': i//10, 'chunk_id': i} for i in range(len(self.chunks))]
@@ -144,43 +143,86 @@ class AdvancedRAGChatbot:
             self.metadata = []
             self.faiss_index = None
     
-    def find_relevant_chunks(self, query: str, top_k: int = 5, similarity_threshold: float = 0.3) -> List[Dict]:
+    def find_relevant_chunks(self, query: str, top_k: int = 5, similarity_threshold: float = 0.3,
+                             mmr_lambda: Optional[float] = None, oversample: Optional[int] = None,
+                             rerank_budget_ms: Optional[float] = None) -> List[Dict]:
         """
         Find the most relevant chunks for a given query using FAISS with enhanced features
+        
+        Args:
+            query (str): User's question
+            top_k (int): Number of chunks to return
+            similarity_threshold (float): Minimum similarity score to consider
+            mmr_lambda (float): Diversify candidates by MMR with this relevance weight
+                (default: self.mmr_lambda; None there means no MMR)
+            oversample (int): Candidates searched per returned chunk (default: self.mmr_oversample)
+            rerank_budget_ms (float): Cross-encoder time budget when a re-ranker is
+                configured (default: the re-ranker's budget)
         """
         # Check if FAISS is available
         if self.faiss_index is None or len(self.chunks) == 0:
             return []
         
+        if mmr_lambda is None:
+            mmr_lambda = self.mmr_lambda
+        oversample = oversample or self.mmr_oversample
+        
         # Check cache first
-        cache_key = f"{query.lower()}_{top_k}"
-        if cache_key in self.query_cache:
+        # oversample sets how many candidates are searched even without MMR
+        cache_key = f"{query.lower()}_{top_k}x{oversample}"
+        if mmr_lambda is not None:
+            cache_key += f"_mmr{mmr_lambda}"
+        cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            query_trace.count('cache_hits')
             print("📦 Using cached results")
-            return self.query_cache[cache_key]
+            return cached
+        query_trace.count('cache_misses')
         
         try:
             # Enhance query with tax-specific context
-            enhanced_query = self.enhance_query(query)
+            with query_trace.stage('enhance'):
+                enhanced_query = self.enhance_query(query)
             
             # Embed the enhanced query
-            query_embedding = self.model.encode([enhanced_query]).astype('float32')
+            with query_trace.stage('encode'):
+                query_embedding = self.model.encode([enhanced_query]).astype('float32')
             
             # Search using FAISS with more candidates initially
-            search_k = min(top_k * 3, len(self.chunks))
-            scores, indices = self.faiss_index.search(query_embedding, search_k)
+            # The re-ranker picks the final top_k from a larger candidate list
+            with query_trace.stage('search'):
+                collect_k = top_k if self.reranker is None else max(top_k, self.reranker.top_n)
+                search_k = min(max(top_k * oversample, collect_k), len(self.chunks))
+                if mmr_lambda is None:
+                    scores, indices = self.faiss_index.search(query_embedding, search_k)
+                else:
+                    scores, indices, vectors = search_with_vectors(self.faiss_index, query_embedding, search_k)
+                if self.row_id_map is not None:
+                    indices = self.row_id_map.rows(indices)
+                query_trace.count('candidates', search_k)
+            
+                candidates = zip(scores[0], indices[0])
+                if mmr_lambda is not None:
+                    # Visit candidates in MMR order: relevant, but unlike the ones already taken
+                    candidates = diversify(
+                        query_embedding[0], scores[0], indices[0], None if vectors is None else vectors[0],
+                        mmr_lambda, lambda rows: self.model.encode([self.chunks[row] for row in rows])
+                    )
             
             relevant_chunks = []
             seen_content = set()
             
-            for i, (distance, idx) in enumerate(zip(scores[0], indices[0])):
+            for i, (distance, idx) in enumerate(candidates):
                 if idx < len(self.chunks) and idx >= 0:
                     chunk_content = self.chunks[idx]
                     
-                    # Skip duplicates
-                    chunk_preview = chunk_content[:100] if len(chunk_content) > 100 else chunk_content
-                    if chunk_preview in seen_content:
-                        continue
-                    seen_content.add(chunk_preview)
+                    # Skip duplicates (unless the database was deduplicated at build
+                    # time or MMR already diversified the candidates)
+                    if not self.deduplicated and mmr_lambda is None:
+                        chunk_preview = chunk_content[:100] if len(chunk_content) > 100 else chunk_content
+                        if chunk_preview in seen_content:
+                            continue
+                        seen_content.add(chunk_preview)
                     
                     # Convert FAISS distance to similarity score
                     similarity_score = 1.0 / (1.0 + float(distance)) if distance >= 0 else 1.0
@@ -188,7 +230,8 @@ class AdvancedRAGChatbot:
                     # Apply threshold
                     if similarity_score >= similarity_threshold:
                         # Calculate relevance boost
-                        keyword_boost = self.calculate_keyword_relevance(query, chunk_content)
+                        with query_trace.stage('keyword_boost'):
+                            keyword_boost = self.calculate_keyword_relevance(query, chunk_content)
                         final_score = similarity_score * (1 + keyword_boost * 0.2)
                         
                         relevant_chunks.append({
@@ -200,22 +243,22 @@ class AdvancedRAGChatbot:
                             'chunk_id': int(idx)
                         })
                     
-                    if len(relevant_chunks) >= top_k:
+                    if len(relevant_chunks) >= collect_k:
                         break
             
             # Sort by final score
             relevant_chunks.sort(key=lambda x: x['similarity'], reverse=True)
+            cacheable = True
+            if self.reranker is not None and relevant_chunks:
+                with query_trace.stage('rerank'):
+                    relevant_chunks = self.reranker.rerank(query, relevant_chunks, rerank_budget_ms)
+                # A ranking cut short by the budget would be served to requests with a larger one
+                cacheable = self.reranker.fully_scored(relevant_chunks)
             relevant_chunks = relevant_chunks[:top_k]
             
             # Cache the results
-            if len(relevant_chunks) > 0:
+            if len(relevant_chunks) > 0 and cacheable:
                 self.query_cache[cache_key] = relevant_chunks
-                
-                # Limit cache size
-                if len(self.query_cache) > 100:
-                    oldest_keys = list(self.query_cache.keys())[:20]
-                    for key in oldest_keys:
-                        del self.query_cache[key]
             
             return relevant_chunks
             
@@ -225,15 +268,10 @@ class AdvancedRAGChatbot:
     
     def enhance_query(self, query: str) -> str:
         """Enhance query with additional context"""
-        query_lower = query.lower()
-        enhancements = []
-        
-        for category, keywords in self.tax_keywords.items():
-            if any(kw in query_lower for kw in keywords):
-                enhancements.append(category)
+        # All keyword categories in one scan of the query
+        enhancements = self.keyword_automaton.categories(query)
         
-        section_pattern = r'section\s+(\d+[a-z]*)'
-        sections = re.findall(section_pattern, query_lower)
+        sections = section_numbers(query.lower())
         if sections:
             enhancements.extend(sections)
         
@@ -298,8 +336,10 @@ class AdvancedRAGChatbot:
                 'confidence': self.get_confidence_label(chunk_data['similarity'])
             })
         
-        # Generate natural answer based on query type
-        answer = self.format_natural_answer(query, chunk_text, relevant_chunks)
+        # Synthesize an answer when a generator is configured, else extract one by query type
+        answer = self.synthesize_answer(query, relevant_chunks)
+        if not answer:
+            answer = self.format_natural_answer(query, chunk_text, relevant_chunks)
         
         # Add source attribution (minimal)
         source_attribution = self.format_sources(sources)
@@ -312,36 +352,24 @@ class AdvancedRAGChatbot:
         
         return f"{answer}{source_attribution}{confidence_note}"
     
+    def synthesize_answer(self, query: str, relevant_chunks: List[Dict]) -> Optional[str]:
+        """Answer generated from the top chunks (marked when cut short), or None (no generator, over budget or failed)"""
+        if self.generator is None:
+            return None
+        try:
+            with query_trace.stage('generate'):
+                answer = self.generator.answer(query, [chunk['chunk'] for chunk in relevant_chunks[:3]])
+        except Exception as e:
+            print(f"⚠️ Answer generation failed, using extracted answer: {e}")
+            return None
+        if answer and answer.truncated:
+            query_trace.count('generate_truncated')
+            return f"{answer}…\n\n*(Answer cut short to stay within the response time limit)*"
+        return answer
+    
     def is_vague_query(self, query: str) -> bool:
         """Check if query is too vague or non-tax-related"""
-        query_lower = query.lower().strip()
-        
-        # Check for greetings
-        greetings = ['hi', 'hello', 'hey', 'good morning', 'good evening', 'good afternoon']
-        if query_lower in greetings or len(query.split()) <= 1:
-            return True
-        
-        # Check for very generic phrases
-        generic_phrases = ['hello world', 'test', 'testing', 'thanks', 'thank you', 'ok', 'okay']
-        if query_lower in generic_phrases:
-            return True
-        
-        # Check if query has any tax-related keywords
-        tax_keywords = [
-            'tax', 'section', 'deduction', 'exemption', 'income', 'itr', 'filing',
-            'return', 'assessment', 'tds', 'hra', 'lta', 'salary', 'business',
-            'capital gains', 'investment', 'calculation', 'rate', 'regime',
-            'cess', 'surcharge', 'rebate', 'refund', 'notice', 'audit',
-            '80c', '80d', '10', '24', 'form 16', 'pan', 'aadhaar'
-        ]
-        
-        # If query is longer than 2 words and has no tax keywords, it's vague
-        if len(query.split()) > 2:
-            has_tax_keyword = any(keyword in query_lower for keyword in tax_keywords)
-            if not has_tax_keyword:
-                return True
-        
-        return False
+        return text_analysis.is_vague_query(query)
     
     def generate_helpful_prompt(self, query: str) -> str:
         """Generate helpful prompt for vague queries"""
@@ -443,26 +471,36 @@ Please ask a specific tax-related question."""
         
         return f"{confidence_text}\n{quality_text}{disclaimer}"
     
-    def ask(self, query: str, top_k: int = 5, use_context: bool = True) -> str:
-        """Main method to ask questions"""
+    def ask(self, query: str, top_k: int = 5, use_context: bool = True,
+            mmr_lambda: Optional[float] = None, oversample: Optional[int] = None,
+            rerank_budget_ms: Optional[float] = None,
+            return_chunks: bool = False) -> Union[str, Tuple[str, List[Dict]]]:
+        """
+        Main method to ask questions (see find_relevant_chunks for the retrieval options)
+        
+        With return_chunks=True, returns (answer, chunks the answer was built from)
+        so callers need not run the retrieval a second time.
+        """
         print(f"🔍 Processing query: {query}")
         
         if use_context and len(self.conversation_history) > 0:
-            query = self.add_conversation_context(query)
+            with query_trace.stage('context'):
+                query = self.add_conversation_context(query)
         
-        relevant_chunks = self.find_relevant_chunks(query, top_k)
+        relevant_chunks = self.find_relevant_chunks(query, top_k, mmr_lambda=mmr_lambda, oversample=oversample,
+                                                    rerank_budget_ms=rerank_budget_ms)
         
         if not relevant_chunks:
             print("⚠️ No relevant chunks found")
-            return self.generate_fallback_answer(query)
-        
-        print(f"📚 Found {len(relevant_chunks)} relevant chunks")
-        if relevant_chunks:
+            answer = self.generate_fallback_answer(query)
+        else:
+            print(f"📚 Found {len(relevant_chunks)} relevant chunks")
             print(f"   Top similarity: {relevant_chunks[0]['similarity']:.3f}")
+            
+            with query_trace.stage('format'):
+                answer = self.generate_contextual_answer(query, relevant_chunks)
         
-        answer = self.generate_contextual_answer(query, relevant_chunks)
-        
-        return answer
+        return (answer, relevant_chunks) if return_chunks else answer
     
     def add_conversation_context(self, query: str) -> str:
         """Add conversation context"""
@@ -498,5 +536,5 @@ Please ask a specific tax-related question."""
     def clear_history(self):
         """Clear conversation history"""
         self.conversation_history = []
-        self.query_cache = {}
+        self.query_cache.clear()
         print("🧹 Conversation history and cache cleared")
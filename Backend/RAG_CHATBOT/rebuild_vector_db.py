@@ -5,76 +5,130 @@ This script extracts text from the PDF and creates a new FAISS index without Lan
 """
 
 import os
-import json
-import pickle
 import hashlib
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 import faiss
 from sentence_transformers import SentenceTransformer
-import PyPDF2
+from pdf_extraction import count_pdf_pages, default_worker_count, iter_pdf_pages
+from chunk_store import CHUNK_STORE_FILENAME, write_chunk_store
+from incremental_index import ROW_IDS_FILENAME
+from metadata_store import write_document_metadata
+from index_manifest import write_faiss_index_atomic, write_index_manifest
+from embedding_cache import DEFAULT_CACHE_PATH, open_embedding_cache
+from embedding_pool import DEFAULT_BATCH_SIZE, BatchEmbedder
+from checkpoint import DEFAULT_CHECKPOINT_DIR, input_fingerprint, open_build_checkpoint
+from build_report import BuildReport
+from dedup import DEFAULT_DEDUP_THRESHOLD, find_near_duplicates, link_duplicates
 
 class VectorDBRebuilder:
-    def __init__(self, pdf_path: str, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, pdf_path: str, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 embedding_cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+                 extraction_workers: Optional[int] = None, embedding_processes: Optional[int] = None,
+                 encode_batch_size: int = DEFAULT_BATCH_SIZE,
+                 dedup_threshold: Optional[float] = DEFAULT_DEDUP_THRESHOLD):
         self.pdf_path = pdf_path
+        self.dedup_threshold = dedup_threshold
+        self.dedup_stats = None
+        self.extraction_workers = extraction_workers
         self.model = SentenceTransformer(model_name)
+        self.embedder = BatchEmbedder(model_name, batch_size=encode_batch_size,
+                                      processes=embedding_processes, model=self.model)
+        self.embedding_cache = open_embedding_cache(model_name, embedding_cache_path)
         self.chunks = []
         self.metadata = []
+        self.failed_pages = []
+        self.checkpoint = None
+        self.report = BuildReport("ITA_primary", 'rebuild_vector_db', live=False)
         
     def extract_text_from_pdf(self) -> List[Dict]:
         """Extract text chunks from PDF with metadata"""
         print(f"📄 Reading PDF: {self.pdf_path}")
         chunks_with_metadata = []
         
-        with open(self.pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            total_pages = len(pdf_reader.pages)
-            print(f"📚 Total pages: {total_pages}")
+        total_pages = count_pdf_pages(self.pdf_path)
+        workers = self.extraction_workers or default_worker_count()
+        print(f"📚 Total pages: {total_pages} ({workers} extraction workers)")
+        failed_pages = []
+        report = self.report
+        
+        extracted = iter_pdf_pages(self.pdf_path, workers, total_pages=total_pages)
+        while True:
+            with report.stage('extract'):
+                page = next(extracted, None)
+            if page is None:
+                break
+            page_number, text, error = page
+            report.add('extract', items=1)
+            report.progress('extract', total_pages)
+            page_num = page_number - 1
+            if error is not None:
+                print(f"⚠️ Error extracting page {page_number}: {error}")
+                failed_pages.append(page_number)
+                continue
             
-            for page_num in range(total_pages):
-                page = pdf_reader.pages[page_num]
-                text = page.extract_text()
+            chunking_started = report.elapsed()
+            chunks_before = len(chunks_with_metadata)
+            if text.strip():
+                # Split page into chunks (roughly 500 characters each)
+                chunk_size = 500
+                overlap = 100
+                
+                page_text = text.strip()
+                start = 0
+                chunk_id_on_page = 0
                 
-                if text.strip():
-                    # Split page into chunks (roughly 500 characters each)
-                    chunk_size = 500
-                    overlap = 100
+                while start < len(page_text):
+                    end = start + chunk_size
+                    chunk_text = page_text[start:end]
                     
-                    page_text = text.strip()
-                    start = 0
-                    chunk_id_on_page = 0
+                    # Try to break at sentence boundary
+                    if end < len(page_text):
+                        last_period = chunk_text.rfind('.')
+                        last_newline = chunk_text.rfind('\n')
+                        break_point = max(last_period, last_newline)
+                        if break_point > chunk_size * 0.7:  # At least 70% of chunk size
+                            chunk_text = chunk_text[:break_point + 1]
+                            end = start + break_point + 1
                     
-                    while start < len(page_text):
-                        end = start + chunk_size
-                        chunk_text = page_text[start:end]
-                        
-                        # Try to break at sentence boundary
-                        if end < len(page_text):
-                            last_period = chunk_text.rfind('.')
-                            last_newline = chunk_text.rfind('\n')
-                            break_point = max(last_period, last_newline)
-                            if break_point > chunk_size * 0.7:  # At least 70% of chunk size
-                                chunk_text = chunk_text[:break_point + 1]
-                                end = start + break_point + 1
-                        
-                        if len(chunk_text.strip()) > 50:  # Minimum chunk size
-                            chunks_with_metadata.append({
-                                'text': chunk_text.strip(),
-                                'page': page_num + 1,  # 1-indexed pages
-                                'chunk_id': chunk_id_on_page,
-                                'char_start': start,
-                                'char_end': end
-                            })
-                            chunk_id_on_page += 1
-                        
-                        start = end - overlap
-                
-                if (page_num + 1) % 50 == 0:
-                    print(f"   Processed {page_num + 1}/{total_pages} pages...")
+                    if len(chunk_text.strip()) > 50:  # Minimum chunk size
+                        chunks_with_metadata.append({
+                            'text': chunk_text.strip(),
+                            'page': page_num + 1,  # 1-indexed pages
+                            'chunk_id': chunk_id_on_page,
+                            'char_start': start,
+                            'char_end': end
+                        })
+                        chunk_id_on_page += 1
+                    
+                    start = end - overlap
+            report.add('chunk', report.elapsed() - chunking_started, len(chunks_with_metadata) - chunks_before)
+            
+            if (page_num + 1) % 50 == 0:
+                print(f"   Processed {page_num + 1}/{total_pages} pages...")
         
+        self.failed_pages = failed_pages
+        if failed_pages:
+            print(f"⚠️ Failed to extract {len(failed_pages)} pages: {failed_pages[:10]}{'...' if len(failed_pages) > 10 else ''}")
         print(f"✅ Extracted {len(chunks_with_metadata)} chunks")
         return chunks_with_metadata
     
+    def deduplicate(self, chunks_with_metadata: List[Dict]) -> List[Dict]:
+        """Drop near-duplicate chunks, linking them to the chunk they duplicate"""
+        if not self.dedup_threshold:
+            return chunks_with_metadata
+        
+        with self.report.stage('dedup', len(chunks_with_metadata)):
+            keep, duplicate_of, self.dedup_stats = find_near_duplicates(
+                [chunk['text'] for chunk in chunks_with_metadata], self.dedup_threshold
+            )
+            duplicates = {position: (canonical, chunks_with_metadata[position]['page'])
+                          for position, canonical in duplicate_of.items()}
+            kept = [chunks_with_metadata[position] for position in keep]
+            link_duplicates(kept, {position: row for row, position in enumerate(keep)}, duplicates)
+        print(f"🧹 Dropped {self.dedup_stats['duplicates']} near-duplicate chunks")
+        return kept
+    
     def build_faiss_index(self, chunks_with_metadata: List[Dict]) -> faiss.Index:
         """Build FAISS index from chunks"""
         print("🔄 Encoding chunks with sentence transformer...")
@@ -89,26 +143,50 @@ class VectorDBRebuilder:
                 'page': chunk['page'],
                 'chunk_id': chunk['chunk_id'],
                 'char_start': chunk['char_start'],
-                'char_end': chunk['char_end']
+                'char_end': chunk['char_end'],
+                **({'duplicate_pages': chunk['duplicate_pages']} if 'duplicate_pages' in chunk else {})
             }
             for chunk in chunks_with_metadata
         ]
         
-        # Encode all chunks
-        embeddings = self.model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+        # Encode all chunks in length-sorted batches, sending only cache misses to the model
+        encode_fn = self.report.timed('embed', self.embedder.encode)
+        if self.checkpoint is not None:
+            encode_fn = self.checkpoint.embed_fn(encode_fn)
+        if self.embedding_cache is not None:
+            embeddings = self.embedding_cache.encode(texts, encode_fn)
+            print(self.embedding_cache.report())
+        else:
+            embeddings = encode_fn(texts)
         embeddings = embeddings.astype('float32')
         
         # Create FAISS index
         dimension = embeddings.shape[1]
         print(f"📐 Creating FAISS index (dimension: {dimension})...")
-        index = faiss.IndexFlatL2(dimension)
-        index.add(embeddings)
+        with self.report.stage('index', len(embeddings)):
+            index = faiss.IndexFlatL2(dimension)
+            index.add(embeddings)
         
         print(f"✅ FAISS index created with {index.ntotal} vectors")
         return index
     
     def save_vector_database(self, output_dir: str, document_id: str):
         """Save vector database in simplified format"""
+        with self.report.stage('save', len(self.chunks)):
+            metadata_path = self._write_vector_database(output_dir, document_id)
+        
+        self.report.details.update({
+            'total_chunks': len(self.chunks),
+            'failed_pages': self.failed_pages,
+            'deduplication': self.dedup_stats,
+            'embedding_processes': self.embedder.processes,
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None
+        })
+        report_path = self.report.write(metadata_path)
+        print(self.report.summary())
+        print(f"   📈 Build report: {report_path}")
+    
+    def _write_vector_database(self, output_dir: str, document_id: str) -> str:
         os.makedirs(output_dir, exist_ok=True)
         
         # Create document-specific directory
@@ -118,13 +196,16 @@ class VectorDBRebuilder:
         # Save FAISS index
         faiss_path = os.path.join(vector_dir, "index.faiss")
         print(f"💾 Saving FAISS index to: {faiss_path}")
-        faiss.write_index(self.faiss_index, faiss_path)
+        write_faiss_index_atomic(self.faiss_index, faiss_path)
+        # The index is positional; a row map left by an incremental build would misroute every hit
+        stale_ids_path = os.path.join(vector_dir, ROW_IDS_FILENAME)
+        if os.path.exists(stale_ids_path):
+            os.remove(stale_ids_path)
         
-        # Save chunks as simple list (no LangChain objects)
-        chunks_path = os.path.join(vector_dir, "index.pkl")
+        # Save chunks in the compact chunk store format (no LangChain objects)
+        chunks_path = os.path.join(vector_dir, CHUNK_STORE_FILENAME)
         print(f"💾 Saving chunks to: {chunks_path}")
-        with open(chunks_path, 'wb') as f:
-            pickle.dump(self.chunks, f)
+        write_chunk_store(chunks_path, self.chunks)
         
         # Save metadata
         metadata_dir = os.path.join(os.path.dirname(output_dir), "document_metadata")
@@ -141,27 +222,68 @@ class VectorDBRebuilder:
             'total_chunks': len(self.chunks),
             'embedding_model': 'sentence-transformers/all-MiniLM-L6-v2',
             'created_at': timestamp,
+            'deduplication': self.dedup_stats,
             'chunks_metadata': self.metadata,
             'format_version': '2.0'
         }
         
         print(f"💾 Saving metadata to: {metadata_path}")
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata_info, f, indent=2, ensure_ascii=False)
+        write_document_metadata(metadata_path, metadata_info)
+        
+        # Manifest goes last so watchers only see complete builds
+        write_index_manifest(vector_dir, self.faiss_index.d, self.faiss_index.ntotal, {
+            'document_id': document_id,
+            'embedding_model': 'sentence-transformers/all-MiniLM-L6-v2',
+            'deduplicated': self.dedup_stats is not None
+        })
         
         print(f"\n✅ Vector database saved successfully!")
         print(f"   📁 Vectors: {vector_dir}")
         print(f"   📋 Metadata: {metadata_path}")
         print(f"   📊 Total chunks: {len(self.chunks)}")
+        return metadata_path
+    
+    def extract_chunks(self) -> List[Dict]:
+        """Extracted chunks, taken from the 'chunks' checkpoint when one was saved"""
+        if self.checkpoint is not None and self.checkpoint.has_stage('chunks'):
+            texts, info = self.checkpoint.load_stage('chunks')
+            self.failed_pages = info['failed_pages']
+            print(f"♻️ Using {len(texts)} checkpointed chunks")
+            return [dict(meta, text=text) for meta, text in zip(info['chunks_metadata'], texts)]
+        
+        chunks_with_metadata = self.extract_text_from_pdf()
+        if self.checkpoint is not None:
+            self.checkpoint.save_stage('chunks', [chunk['text'] for chunk in chunks_with_metadata], {
+                'chunks_metadata': [{key: chunk[key] for key in ('page', 'chunk_id', 'char_start', 'char_end')}
+                                    for chunk in chunks_with_metadata],
+                'failed_pages': self.failed_pages
+            })
+        return chunks_with_metadata
     
-    def rebuild(self, output_dir: str = "./vector_database", document_id: str = "ITA_primary"):
-        """Full rebuild process"""
+    def rebuild(self, output_dir: str = "./vector_database", document_id: str = "ITA_primary",
+                resume: bool = False, checkpoint_dir: Optional[str] = DEFAULT_CHECKPOINT_DIR,
+                progress: Optional[bool] = None):
+        """
+        Full rebuild process
+        
+        Extracted chunks and embedded batches are checkpointed while the rebuild
+        runs; with resume=True an interrupted rebuild continues from them.
+        Stage timings are written as a build report next to the metadata, and
+        printed live when progress is on (default: RAG_BUILD_PROGRESS).
+        """
         print("=" * 60)
         print("🔨 REBUILDING VECTOR DATABASE")
         print("=" * 60)
+        self.report = BuildReport(document_id, 'rebuild_vector_db', live=progress)
+        
+        # Separate from ita_vectorizer's checkpoints, whose fingerprint never matches this builder's
+        self.checkpoint = open_build_checkpoint(f"{document_id}_rebuild", input_fingerprint(
+            self.pdf_path, builder='rebuild_vector_db', chunk_size=500, chunk_overlap=100,
+            model=self.embedder.model_name
+        ), resume, checkpoint_dir)
         
         # Step 1: Extract text
-        chunks_with_metadata = self.extract_text_from_pdf()
+        chunks_with_metadata = self.deduplicate(self.extract_chunks())
         
         # Step 2: Build FAISS index
         self.faiss_index = self.build_faiss_index(chunks_with_metadata)
@@ -169,11 +291,30 @@ class VectorDBRebuilder:
         # Step 3: Save everything
         self.save_vector_database(output_dir, document_id)
         
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+            self.checkpoint = None
+        
         print("\n" + "=" * 60)
         print("✅ REBUILD COMPLETE!")
         print("=" * 60)
 
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Rebuild the ITA_primary vector database from ITA.pdf")
+    parser.add_argument('--embed-processes', type=int, default=None,
+                        help="Processes for embedding (default: RAG_EMBED_PROCESSES or 1)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Texts per model forward pass (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted rebuild from its checkpoints")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="Keep near-duplicate chunks in the index")
+    parser.add_argument('--progress', action='store_true', default=None,
+                        help="Print live stage throughput (default: RAG_BUILD_PROGRESS)")
+    args = parser.parse_args()
+    
     # Configuration
     PDF_PATH = "./ITA.pdf"
     OUTPUT_DIR = "./vector_database"
@@ -185,11 +326,19 @@ def main():
         return
     
     # Rebuild
-    rebuilder = VectorDBRebuilder(PDF_PATH)
-    rebuilder.rebuild(OUTPUT_DIR, DOCUMENT_ID)
+    rebuilder = VectorDBRebuilder(PDF_PATH, embedding_processes=args.embed_processes,
+                                  encode_batch_size=args.batch_size,
+                                  dedup_threshold=None if args.no_dedup else DEFAULT_DEDUP_THRESHOLD)
+    try:
+        rebuilder.rebuild(OUTPUT_DIR, DOCUMENT_ID, resume=args.resume, progress=args.progress)
+    except Exception:
+        print("💡 Completed stages are checkpointed; re-run with --resume to continue")
+        raise
+    finally:
+        rebuilder.embedder.close()
     
-    print("\n🚀 You can now restart the RAG server to use the new database")
-    print("   docker-compose restart rag-server")
+    print("\n🚀 The running RAG server picks up the new database automatically")
+    print("   To reload immediately: curl -X POST http://localhost:5555/api/rag/admin/reload")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,208 @@
+"""
+Latency-budgeted cross-encoder re-ranking of retrieved chunks
+A cross-encoder scores (query, chunk) pairs jointly and orders chunks far
+better than the bi-encoder distance, but costs a model forward pass per pair.
+The re-ranker therefore only scores the top-N candidates, in batches, within a
+per-request time budget: before each batch a running estimate of the cost per
+pair decides how many uncached candidates still fit, and scoring stops once
+none do. While budget remains, one pair is always scored as a probe, so the
+first request measures a single pair instead of a full batch and an estimate
+inflated by one slow batch recovers instead of locking re-ranking out.
+Candidates that were not scored keep their retrieval order behind the
+re-ranked ones. Scores are cached per (query, chunk).
+
+Enabled in the chatbots with RAG_RERANKER=1 (see reranker_from_env).
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_TOP_N = 10
+DEFAULT_BUDGET_MS = 150.0
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_CACHE_SIZE = 4096
+
+# Weight of the newest batch in the per-pair latency estimate
+_LATENCY_SMOOTHING = 0.3
+
+
+def _chunk_key(candidate: Dict) -> Hashable:
+    """Cache key of a candidate: its text, so keys stay valid across index reloads"""
+    return hash(candidate['chunk'])
+
+
+class CrossEncoderReranker:
+    """Re-rank retrieval candidates with a cross-encoder under a time budget"""
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, top_n: int = DEFAULT_TOP_N,
+                 budget_ms: float = DEFAULT_BUDGET_MS, batch_size: int = DEFAULT_BATCH_SIZE,
+                 cache_size: int = DEFAULT_CACHE_SIZE, max_length: int = 256, model=None):
+        """
+        Args:
+            model_name (str): sentence-transformers CrossEncoder model
+            top_n (int): Candidates considered for re-ranking
+            budget_ms (float): Default scoring time budget per request
+            batch_size (int): Pairs per forward pass
+            cache_size (int): (query, chunk) scores kept (least recently used are evicted)
+            max_length (int): Token limit of a (query, chunk) pair
+            model: Already loaded CrossEncoder
+        """
+        self.model_name = model_name
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self.batch_size = max(1, batch_size)
+        self.cache_size = cache_size
+        self.max_length = max_length
+        self._model = model
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._seconds_per_pair = None
+        self.last_stats = {}
+
+    @property
+    def model(self):
+        """Cross-encoder, loaded on first use (outside any request budget)"""
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model_name, max_length=self.max_length, device='cpu')
+        return self._model
+
+    def _cached(self, key) -> Optional[float]:
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _store(self, scores: Dict):
+        with self._lock:
+            self._cache.update(scores)
+            for key in scores:
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _affordable(self, remaining_seconds: float, probe: bool) -> int:
+        """
+        Uncached pairs that fit in the remaining budget
+
+        Args:
+            remaining_seconds (float): Budget left for this request
+            probe (bool): Allow one pair even if the estimate says none fits
+
+        Returns:
+            int: Pairs to score (1 before any estimate, 0 once the budget is spent)
+        """
+        if remaining_seconds <= 0:
+            return 0
+        if self._seconds_per_pair is None:
+            return 1
+        allowed = int(remaining_seconds / self._seconds_per_pair)
+        return max(1, allowed) if probe else allowed
+
+    def rerank(self, query: str, candidates: List[Dict], budget_ms: Optional[float] = None,
+               key_fn: Callable[[Dict], Hashable] = _chunk_key) -> List[Dict]:
+        """
+        Order candidates by cross-encoder score
+
+        Args:
+            query (str): User's question
+            candidates (List[Dict]): Retrieval results with a 'chunk' text, best first
+            budget_ms (float): Scoring time budget for this request (default: self.budget_ms)
+            key_fn (Callable): Cache key of a candidate
+
+        Returns:
+            List[Dict]: Scored candidates by descending 'rerank_score', then the
+                        unscored ones in their original order
+        """
+        model = self.model  # Loading the model does not count against the budget
+        started = time.perf_counter()
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000.0
+        head = candidates[:self.top_n]
+
+        scores = {}
+        uncached = []
+        for position, candidate in enumerate(head):
+            key = (query, key_fn(candidate))
+            score = self._cached(key)
+            if score is None:
+                uncached.append((position, key))
+            else:
+                scores[position] = score
+        cache_hits = len(scores)
+
+        # Size every batch by what the rest of the budget allows; retrieval order decides who is scored
+        scored = {}
+        start = 0
+        while start < len(uncached):
+            count = min(self.batch_size, self._affordable(budget - (time.perf_counter() - started), probe=not scored))
+            if count == 0:
+                break
+            batch = uncached[start:start + count]
+            start += len(batch)
+            batch_started = time.perf_counter()
+            batch_scores = model.predict(
+                [(query, head[position]['chunk']) for position, _ in batch],
+                batch_size=self.batch_size, show_progress_bar=False
+            )
+            per_pair = (time.perf_counter() - batch_started) / len(batch)
+            self._seconds_per_pair = per_pair if self._seconds_per_pair is None else (
+                _LATENCY_SMOOTHING * per_pair + (1 - _LATENCY_SMOOTHING) * self._seconds_per_pair)
+            for (position, key), score in zip(batch, batch_scores):
+                scores[position] = float(score)
+                scored[key] = float(score)
+        truncated = len(uncached) - start
+        if scored:
+            self._store(scored)
+
+        ranked = sorted(scores, key=lambda position: scores[position], reverse=True)
+        result = []
+        for position in ranked:
+            candidate = dict(head[position])
+            candidate['rerank_score'] = scores[position]
+            result.append(candidate)
+        result.extend(candidate for position, candidate in enumerate(head) if position not in scores)
+        result.extend(candidates[self.top_n:])
+
+        self.last_stats = {
+            'considered': len(head),
+            'scored': len(scored),
+            'cache_hits': cache_hits,
+            'truncated': truncated,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+        return result
+
+    def fully_scored(self, ranked: List[Dict]) -> bool:
+        """True unless rerank() ran out of budget before scoring every candidate it considered"""
+        return all('rerank_score' in candidate for candidate in ranked[:self.top_n])
+
+    def stats(self) -> Dict:
+        return {
+            'model': self.model_name,
+            'top_n': self.top_n,
+            'budget_ms': self.budget_ms,
+            'cache_entries': len(self._cache),
+            'ms_per_pair': round(self._seconds_per_pair * 1000, 3) if self._seconds_per_pair else None,
+            'last': self.last_stats
+        }
+
+
+def reranker_from_env() -> Optional[CrossEncoderReranker]:
+    """
+    Re-ranker configured by environment, or None when disabled
+
+    RAG_RERANKER=1 enables it; RAG_RERANK_MODEL, RAG_RERANK_TOP_N and
+    RAG_RERANK_BUDGET_MS override the defaults.
+    """
+    if os.environ.get('RAG_RERANKER', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    return CrossEncoderReranker(
+        os.environ.get('RAG_RERANK_MODEL', DEFAULT_RERANK_MODEL),
+        top_n=int(os.environ.get('RAG_RERANK_TOP_N', DEFAULT_TOP_N)),
+        budget_ms=float(os.environ.get('RAG_RERANK_BUDGET_MS', DEFAULT_BUDGET_MS))
+    )
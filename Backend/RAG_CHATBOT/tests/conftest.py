@@ -0,0 +1,10 @@
+"""
+Shared pytest setup for the RAG chatbot modules
+The modules are flat scripts imported by name, so the RAG_CHATBOT directory is
+put on sys.path. Run from Backend/RAG_CHATBOT with `python -m pytest tests`.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,116 @@
+"""
+Tests for build checkpoints: input fingerprints, stage files and resumed embedding
+"""
+
+import os
+
+import numpy as np
+
+from checkpoint import BuildCheckpoint, input_fingerprint, open_build_checkpoint
+
+TEXTS = [f"chunk {i}" for i in range(10)]
+
+
+class CountingEmbedder:
+    """Embedding function that records which texts it was asked to embed"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), i] for i, text in enumerate(texts)], dtype='float32')
+
+
+def _source(tmp_path, content=b"%PDF original"):
+    path = tmp_path / "act.pdf"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_fingerprint_tracks_file_and_settings(tmp_path):
+    source = _source(tmp_path)
+    fingerprint = input_fingerprint(source, chunk_size=800, chunk_overlap=150)
+    assert fingerprint == input_fingerprint(source, chunk_size=800, chunk_overlap=150)
+    assert fingerprint != input_fingerprint(source, chunk_size=600, chunk_overlap=150)
+
+    _source(tmp_path, b"%PDF rewritten with different content")
+    assert fingerprint != input_fingerprint(source, chunk_size=800, chunk_overlap=150)
+
+
+def test_resume_keeps_stages_and_batches(tmp_path):
+    work_dir = str(tmp_path / "checkpoints")
+    fingerprint = input_fingerprint(_source(tmp_path), chunk_size=800)
+
+    first = BuildCheckpoint("ITA", fingerprint, work_dir=work_dir)
+    first.save_stage("chunks", TEXTS, {'count': len(TEXTS)})
+    embedder = CountingEmbedder()
+    vectors = first.embed(TEXTS, embedder, batch_size=4)
+    assert len(embedder.calls) == 3
+
+    resumed = BuildCheckpoint("ITA", fingerprint, resume=True, work_dir=work_dir)
+    assert resumed.resumed
+    assert resumed.has_stage("chunks")
+    chunks, info = resumed.load_stage("chunks")
+    assert list(chunks) == TEXTS
+    assert info == {'count': len(TEXTS)}
+    chunks.close()
+
+    embedder = CountingEmbedder()
+    assert np.array_equal(resumed.embed(TEXTS, embedder, batch_size=4), vectors)
+    assert embedder.calls == []
+
+
+def test_resume_embeds_only_missing_batches(tmp_path):
+    work_dir = str(tmp_path / "checkpoints")
+    fingerprint = input_fingerprint(_source(tmp_path))
+
+    BuildCheckpoint("ITA", fingerprint, work_dir=work_dir).embed(TEXTS[:8], CountingEmbedder(), batch_size=4)
+
+    embedder = CountingEmbedder()
+    vectors = BuildCheckpoint("ITA", fingerprint, resume=True, work_dir=work_dir).embed(
+        TEXTS, embedder, batch_size=4)
+    assert embedder.calls == [TEXTS[8:]]
+    assert vectors.shape == (len(TEXTS), 2)
+
+
+def test_changed_fingerprint_starts_over(tmp_path):
+    work_dir = str(tmp_path / "checkpoints")
+    source = _source(tmp_path)
+
+    stale = BuildCheckpoint("ITA", input_fingerprint(source, chunk_size=800), work_dir=work_dir)
+    stale.save_stage("chunks", TEXTS, {})
+    stale.embed(TEXTS, CountingEmbedder(), batch_size=4)
+
+    fresh = BuildCheckpoint("ITA", input_fingerprint(source, chunk_size=600), resume=True, work_dir=work_dir)
+    assert not fresh.resumed
+    assert not fresh.has_stage("chunks")
+    assert fresh.embedded_batch_count() == 0
+
+
+def test_without_resume_starts_over(tmp_path):
+    work_dir = str(tmp_path / "checkpoints")
+    fingerprint = input_fingerprint(_source(tmp_path))
+    BuildCheckpoint("ITA", fingerprint, work_dir=work_dir).save_stage("pages", ["page"], {})
+
+    checkpoint = BuildCheckpoint("ITA", fingerprint, work_dir=work_dir)
+    assert not checkpoint.resumed
+    assert not checkpoint.has_stage("pages")
+
+
+def test_incomplete_stage_is_not_resumed(tmp_path):
+    work_dir = str(tmp_path / "checkpoints")
+    fingerprint = input_fingerprint(_source(tmp_path))
+    checkpoint = BuildCheckpoint("ITA", fingerprint, work_dir=work_dir)
+    with checkpoint.stage_writer("pages") as writer:
+        writer.extend(["page 1", "page 2"])
+    # complete_stage() was never called, as if the build stopped here
+    assert not BuildCheckpoint("ITA", fingerprint, resume=True, work_dir=work_dir).has_stage("pages")
+
+
+def test_clear_and_disabled_checkpoints(tmp_path):
+    work_dir = str(tmp_path / "checkpoints")
+    checkpoint = open_build_checkpoint("ITA", input_fingerprint(_source(tmp_path)), work_dir=work_dir)
+    checkpoint.clear()
+    assert not os.path.exists(checkpoint.path)
+    assert open_build_checkpoint("ITA", {}, work_dir=None) is None
@@ -0,0 +1,110 @@
+"""
+Tests for the binary chunk store and the one-time index.pkl conversion
+"""
+
+import os
+import pickle
+import struct
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from chunk_store import (CHUNK_STORE_FILENAME, CHUNK_STORE_MAGIC, CHUNK_STORE_VERSION,
+                         LEGACY_CHUNKS_FILENAME, ChunkStore, ChunkStoreWriter,
+                         open_chunk_store, write_chunk_store)
+
+CHUNKS = ["Section 80C deduction", "", "Ünïcode – ₹1,50,000", "last chunk\nwith newline"]
+
+
+def test_round_trip_and_layout(tmp_path):
+    path = write_chunk_store(str(tmp_path / CHUNK_STORE_FILENAME), CHUNKS)
+
+    with open(path, 'rb') as f:
+        magic, version, _flags, count = struct.unpack("<8sIIQ", f.read(24))
+    assert magic == CHUNK_STORE_MAGIC
+    assert version == CHUNK_STORE_VERSION
+    assert count == len(CHUNKS)
+
+    store = ChunkStore(path)
+    assert len(store) == len(CHUNKS)
+    assert list(store) == CHUNKS
+    assert store[-1] == CHUNKS[-1]
+    assert store[1:3] == CHUNKS[1:3]
+    assert store.chunk_length(2) == len(CHUNKS[2].encode('utf-8'))
+    store.close()
+
+
+def test_empty_store(tmp_path):
+    store = ChunkStore(write_chunk_store(str(tmp_path / CHUNK_STORE_FILENAME), []))
+    assert len(store) == 0
+    assert list(store) == []
+    store.close()
+
+
+def test_writer_abort_leaves_no_file(tmp_path):
+    path = tmp_path / CHUNK_STORE_FILENAME
+    with pytest.raises(RuntimeError):
+        with ChunkStoreWriter(str(path)) as writer:
+            writer.append("partial")
+            raise RuntimeError("build failed")
+    assert not path.exists()
+    assert os.listdir(tmp_path) == []
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / CHUNK_STORE_FILENAME
+    path.write_bytes(b"not a chunk store at all, just some bytes")
+    with pytest.raises(ValueError):
+        ChunkStore(str(path))
+
+
+def test_converts_plain_list_pickle(tmp_path):
+    with open(tmp_path / LEGACY_CHUNKS_FILENAME, 'wb') as f:
+        pickle.dump(CHUNKS, f)
+
+    chunks = open_chunk_store(str(tmp_path))
+    assert isinstance(chunks, ChunkStore)
+    assert list(chunks) == CHUNKS
+    assert (tmp_path / CHUNK_STORE_FILENAME).exists()
+    chunks.close()
+
+
+class _Docstore:
+    """Stand-in for LangChain's InMemoryDocstore, which keeps documents in _dict"""
+
+    def __init__(self, documents):
+        self._dict = documents
+
+
+def test_converts_docstore_pickle(tmp_path):
+    documents = {f"doc-{i}": SimpleNamespace(page_content=text) for i, text in enumerate(CHUNKS)}
+    # Row 1 points at a missing document and must become an empty chunk
+    index_to_id = {0: "doc-0", 1: "missing", 2: "doc-2", 3: "doc-3"}
+    with open(tmp_path / LEGACY_CHUNKS_FILENAME, 'wb') as f:
+        pickle.dump((_Docstore(documents), index_to_id), f)
+
+    chunks = open_chunk_store(str(tmp_path))
+    assert list(chunks) == [CHUNKS[0], "", CHUNKS[2], CHUNKS[3]]
+    chunks.close()
+
+
+def test_reconverts_when_pickle_is_newer(tmp_path):
+    pkl_path = tmp_path / LEGACY_CHUNKS_FILENAME
+    with open(pkl_path, 'wb') as f:
+        pickle.dump(["old"], f)
+    open_chunk_store(str(tmp_path)).close()
+
+    with open(pkl_path, 'wb') as f:
+        pickle.dump(["new", "chunks"], f)
+    future = time.time() + 10
+    os.utime(pkl_path, (future, future))
+
+    chunks = open_chunk_store(str(tmp_path))
+    assert list(chunks) == ["new", "chunks"]
+    chunks.close()
+
+
+def test_missing_database(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        open_chunk_store(str(tmp_path))
@@ -0,0 +1,122 @@
+"""
+Tests for content-hash chunk IDs, ids.npy loading and incremental updates
+"""
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from chunk_store import write_chunk_store
+from incremental_index import (ROW_IDS_FILENAME, IncrementalIndex, RowIdMap, check_row_counts,
+                               load_row_id_map, stable_chunk_ids)
+
+TEXTS = ["Section 80C deduction", "Old tax regime", "Section 80C deduction", "Form 16"]
+
+
+def _embed(texts):
+    """Deterministic 8-dimensional vectors derived from the texts"""
+    return np.array([np.random.default_rng(sum(map(ord, text))).random(8) for text in texts],
+                    dtype='float32')
+
+
+def test_ids_are_stable_positive_63_bit():
+    ids = stable_chunk_ids(TEXTS)
+    assert ids.dtype == np.int64
+    assert (ids >= 0).all()
+    assert len(set(ids.tolist())) == len(TEXTS)
+    assert np.array_equal(ids, stable_chunk_ids(list(TEXTS)))
+
+
+def test_ids_ignore_whitespace_noise():
+    assert stable_chunk_ids(["Section  80C\n deduction"])[0] == stable_chunk_ids([TEXTS[0]])[0]
+
+
+def test_repeated_text_gets_distinct_ids():
+    ids = stable_chunk_ids(TEXTS)
+    assert ids[0] != ids[2]
+    # The first occurrence keeps the ID it would have on its own
+    assert ids[0] == stable_chunk_ids(TEXTS[:1])[0]
+
+
+def test_row_id_map():
+    ids = stable_chunk_ids(TEXTS)
+    row_map = RowIdMap(ids)
+    assert row_map.rows(ids[::-1]).tolist() == [3, 2, 1, 0]
+    assert row_map.rows(np.array([-1, 12345])).tolist() == [-1, -1]
+    assert RowIdMap(np.empty(0, dtype=np.int64)).rows(np.array([1])).tolist() == [-1]
+
+
+def test_load_row_id_map(tmp_path):
+    assert load_row_id_map(str(tmp_path)) is None
+
+    ids = stable_chunk_ids(TEXTS)
+    np.save(tmp_path / ROW_IDS_FILENAME, ids)
+    id_index = faiss.IndexIDMap2(faiss.IndexFlatL2(8))
+    id_index.add_with_ids(_embed(TEXTS), ids)
+
+    row_map = load_row_id_map(str(tmp_path), id_index)
+    assert len(row_map) == len(TEXTS)
+    _, labels = id_index.search(_embed(TEXTS[3:]), 1)
+    assert row_map.rows(labels[0]).tolist() == [3]
+
+    # A positional index ignores a stale ids.npy
+    assert load_row_id_map(str(tmp_path), faiss.IndexFlatL2(8)) is None
+
+
+def test_update_reuses_unchanged_vectors(tmp_path):
+    index = IncrementalIndex(str(tmp_path))
+    assert index.update(TEXTS, _embed)['added'] == len(TEXTS)
+    index.save(TEXTS)
+
+    embedded = []
+
+    def counting_embed(texts):
+        embedded.extend(texts)
+        return _embed(texts)
+
+    new_texts = TEXTS[1:] + ["Section 87A rebate"]
+    reopened = IncrementalIndex(str(tmp_path))
+    stats = reopened.update(new_texts, counting_embed)
+    assert embedded == ["Section 87A rebate"]
+    assert (stats['added'], stats['removed'], stats['total']) == (1, 1, len(new_texts))
+
+    _, rows = reopened.search(_embed(["Form 16"]), 1)
+    assert new_texts[rows[0][0]] == "Form 16"
+
+
+def test_migrates_positional_index(tmp_path):
+    positional = faiss.IndexFlatL2(8)
+    positional.add(_embed(TEXTS))
+    faiss.write_index(positional, str(tmp_path / "index.faiss"))
+    write_chunk_store(str(tmp_path / "chunks.bin"), TEXTS)
+
+    index = IncrementalIndex(str(tmp_path))
+    assert isinstance(index.index, faiss.IndexIDMap2)
+    assert np.array_equal(index.row_ids, stable_chunk_ids(TEXTS))
+    assert index.update(TEXTS, _embed)['added'] == 0
+
+
+def test_interrupted_save_is_refused(tmp_path):
+    index = IncrementalIndex(str(tmp_path))
+    index.update(TEXTS, _embed)
+    index.save(TEXTS)
+
+    # ids.npy from a different build, as if a save() crashed halfway
+    np.save(tmp_path / ROW_IDS_FILENAME, stable_chunk_ids(TEXTS[:2]))
+    stored = faiss.read_index(str(tmp_path / "index.faiss"))
+    with pytest.raises(ValueError):
+        check_row_counts(stored, load_row_id_map(str(tmp_path), stored), len(TEXTS))
+    assert IncrementalIndex(str(tmp_path)).ntotal == 0
+
+
+def test_check_row_counts():
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(8))
+    ids = stable_chunk_ids(TEXTS)
+    index.add_with_ids(_embed(TEXTS), ids)
+
+    check_row_counts(index, RowIdMap(ids), len(TEXTS), {'count': len(TEXTS)})
+    with pytest.raises(ValueError):
+        check_row_counts(index, RowIdMap(ids), len(TEXTS) - 1)
+    with pytest.raises(ValueError):
+        check_row_counts(index, RowIdMap(ids), len(TEXTS), {'count': len(TEXTS) + 1})
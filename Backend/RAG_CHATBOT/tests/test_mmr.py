@@ -0,0 +1,88 @@
+"""
+Tests for MMR diversification, with and without stored-vector reconstruction
+"""
+
+import numpy as np
+import pytest
+
+from mmr import diversify, mmr_order, search_with_vectors
+
+faiss = pytest.importorskip("faiss")
+
+
+def _clustered_vectors():
+    """Three near-identical vectors close to the query, and two distinct ones further away"""
+    base = np.array([1.0, 0.0, 0.0, 0.0], dtype='float32')
+    return np.array([
+        base,
+        base + [0.0, 0.01, 0.0, 0.0],
+        base + [0.0, 0.0, 0.01, 0.0],
+        [0.6, 0.8, 0.0, 0.0],
+        [0.6, 0.0, 0.0, 0.8],
+    ], dtype='float32'), base
+
+
+def test_lambda_one_keeps_relevance_order():
+    vectors, query = _clustered_vectors()
+    relevance = vectors @ query / np.linalg.norm(vectors, axis=1)
+    expected = np.argsort(-relevance, kind='stable')
+    assert mmr_order(query, vectors, 1.0).tolist() == expected.tolist()
+
+
+def test_low_lambda_prefers_diverse_candidates():
+    vectors, query = _clustered_vectors()
+    order = mmr_order(query, vectors, 0.3, k=3)
+    assert order[0] == 0
+    # The near-duplicates of the first pick are passed over
+    assert set(order[1:].tolist()) == {3, 4}
+
+
+def test_mmr_order_edge_cases():
+    vectors, query = _clustered_vectors()
+    assert mmr_order(query, vectors[:0], 0.5).tolist() == []
+    assert len(mmr_order(query, vectors, 0.5, k=10)) == len(vectors)
+    assert sorted(mmr_order(query, vectors, 0.5).tolist()) == list(range(len(vectors)))
+
+
+def _build(index_type, vectors):
+    ids = np.arange(100, 100 + len(vectors), dtype=np.int64)
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        return index, np.arange(len(vectors))
+    index = index_type(faiss.IndexFlatL2(vectors.shape[1]))
+    index.add_with_ids(vectors, ids)
+    return index, ids
+
+
+@pytest.mark.parametrize("index_type", ["flat", faiss.IndexIDMap2, faiss.IndexIDMap],
+                         ids=["flat", "idmap2", "idmap"])
+def test_diversify_same_with_and_without_reconstruction(index_type):
+    vectors, query = _clustered_vectors()
+    index, row_labels = _build(index_type, vectors)
+    label_row = {int(label): row for row, label in enumerate(row_labels)}
+
+    distances, labels, stored = search_with_vectors(index, query[None, :], len(vectors))
+    if index_type is faiss.IndexIDMap:
+        # IndexIDMap cannot reconstruct; callers re-embed the hits instead
+        assert stored is None
+    else:
+        assert stored.shape == (1, len(vectors), vectors.shape[1])
+
+    def embed_fn(hit_labels):
+        return vectors[[label_row[int(label)] for label in hit_labels]]
+
+    ranked = diversify(query, distances[0], labels[0], None if stored is None else stored[0], 0.3, embed_fn)
+    reembedded = diversify(query, distances[0], labels[0], None, 0.3, embed_fn)
+    assert ranked == reembedded
+    rows = [label_row[int(label)] for _, label in ranked]
+    assert rows[0] == 0
+    assert set(rows[1:3]) == {3, 4}
+
+
+def test_diversify_drops_missing_hits():
+    vectors, query = _clustered_vectors()
+    labels = np.array([0, -1, 3])
+    ranked = diversify(query, [0.0, 9.9, 0.5], labels, vectors[[0, 0, 3]], 0.5, lambda _: None)
+    assert [label for _, label in ranked] == [0, 3]
+    assert diversify(query, [1.0], [-1], None, 0.5, lambda _: None) == []
@@ -0,0 +1,80 @@
+"""
+Tests for the entry- and byte-bounded query result cache
+"""
+
+from memory_report import deep_sizeof
+from query_cache import QueryCache
+
+
+def _result(size: int):
+    """Retrieved-chunk list roughly size bytes large"""
+    return [{'chunk': "x" * size, 'page': 1, 'similarity_score': 0.5}]
+
+
+def test_tracks_bytes_of_keys_and_values():
+    cache = QueryCache(max_entries=10, max_bytes=10 ** 6)
+    cache['a'] = _result(1000)
+    cache['b'] = _result(2000)
+    expected = sum(deep_sizeof(key) + deep_sizeof(value)
+                   for key, value in (('a', _result(1000)), ('b', _result(2000))))
+    assert cache.nbytes == expected
+
+    # Replacing an entry swaps its size instead of adding to it
+    cache['a'] = _result(10)
+    expected += deep_sizeof(_result(10)) - deep_sizeof(_result(1000))
+    assert cache.nbytes == expected
+
+
+def test_byte_budget_evicts_least_recently_used():
+    entry_bytes = deep_sizeof('q0') + deep_sizeof(_result(1000))
+    cache = QueryCache(max_entries=100, max_bytes=int(entry_bytes * 3.5))
+    for i in range(3):
+        cache[f'q{i}'] = _result(1000)
+    assert cache.get('q0') is not None  # q0 is now the most recently used
+
+    cache['q3'] = _result(1000)
+    assert 'q1' not in cache
+    assert all(key in cache for key in ('q0', 'q2', 'q3'))
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.evictions == 1
+
+
+def test_entry_larger_than_budget_is_not_kept():
+    cache = QueryCache(max_entries=10, max_bytes=1000)
+    cache['small'] = _result(10)
+    cache['huge'] = _result(5000)
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+
+
+def test_entry_budget():
+    cache = QueryCache(max_entries=2, max_bytes=10 ** 6)
+    for key in ('a', 'b', 'c'):
+        cache[key] = _result(10)
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (2, cache.nbytes, 1)
+    assert 'a' not in cache
+
+
+def test_shrink_and_clear():
+    cache = QueryCache(max_entries=100, max_bytes=10 ** 6)
+    for i in range(10):
+        cache[f'q{i}'] = _result(1000)
+    before = cache.nbytes
+
+    freed = cache.shrink(0.5)
+    assert freed == before - cache.nbytes
+    assert cache.nbytes <= before * 0.5
+    assert 'q9' in cache and 'q0' not in cache
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+
+
+def test_budget_from_environment(monkeypatch):
+    monkeypatch.setenv('RAG_QUERY_CACHE_ENTRIES', '7')
+    monkeypatch.setenv('RAG_QUERY_CACHE_MB', '0.5')
+    cache = QueryCache()
+    assert cache.max_entries == 7
+    assert cache.max_bytes == 512 * 1024
@@ -0,0 +1,95 @@
+"""
+Tests for the offset-tracking splitter and the page offset map
+"""
+
+import importlib
+import random
+
+import pytest
+
+from text_chunker import DEFAULT_SEPARATORS, OffsetTextSplitter, PageOffsetMap
+
+WORDS = ["income", "tax", "Section", "80C", "deduction", "assessee", "regime", "return",
+         "salary", "exemption", "penalty", "computation", "under", "the", "of", "and"]
+
+
+def legal_text(seed: int, paragraphs: int = 40) -> str:
+    """Paragraphs of clauses and sentences with the separators the vectorizer splits on"""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(paragraphs):
+        lines = []
+        for _ in range(rng.randint(1, 4)):
+            clauses = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 40)))
+                       for _ in range(rng.randint(1, 5))]
+            lines.append(rng.choice(["; ", ": ", ". "]).join(clauses) + ".")
+        out.append("\n".join(lines))
+    # A long unbroken token forces the character-level fallback
+    out.append("x" * rng.randint(300, 900))
+    return "\n\n".join(out)
+
+
+def langchain_splitter_class():
+    for module_name in ("langchain_text_splitters", "langchain.text_splitter"):
+        try:
+            return importlib.import_module(module_name).RecursiveCharacterTextSplitter
+        except ImportError:
+            continue
+    pytest.skip("LangChain text splitters are not installed")
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(800, 150), (200, 50), (64, 0)])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_langchain(seed, chunk_size, chunk_overlap):
+    splitter_class = langchain_splitter_class()
+    text = legal_text(seed)
+    expected = splitter_class(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                              separators=list(DEFAULT_SEPARATORS)).split_text(text)
+    splitter = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    assert splitter.split_text(text) == expected
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_spans_point_into_source(seed):
+    text = legal_text(seed)
+    splitter = OffsetTextSplitter(chunk_size=200, chunk_overlap=50)
+    spans = splitter.split_spans(text)
+    assert [text[s:e] for s, e in spans] == splitter.split_text(text)
+    assert all(0 < e - s <= 200 for s, e in spans)
+    assert [s for s, _ in spans] == sorted(s for s, _ in spans)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_streamed_segments_match_whole_text(seed):
+    rng = random.Random(seed)
+    pages = ["\n\n" + legal_text(seed * 10 + page, paragraphs=rng.randint(1, 6))
+             for page in range(8)]
+    splitter = OffsetTextSplitter(chunk_size=300, chunk_overlap=60)
+    text = "".join(pages)
+
+    streamed = list(splitter.iter_segment_chunks(pages))
+    assert [(s, e) for s, e, _ in streamed] == splitter.split_spans(text)
+    assert all(text[s:e] == chunk for s, e, chunk in streamed)
+
+
+def test_segments_must_start_with_separator():
+    splitter = OffsetTextSplitter(chunk_size=100, chunk_overlap=10)
+    with pytest.raises(ValueError):
+        list(splitter.iter_segment_chunks(["no leading separator"]))
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        OffsetTextSplitter(chunk_size=100, chunk_overlap=100)
+
+
+def test_page_offset_map():
+    pages = PageOffsetMap([0, 100, 250], [3, 4, 5])
+    assert pages.page_at(0) == 3
+    assert pages.page_at(99) == 3
+    assert pages.page_at(100) == 4
+    assert pages.page_at(10_000) == 5
+    assert pages.page_range(90, 260) == (3, 5)
+    # The end offset is exclusive
+    assert pages.page_range(50, 100) == (3, 3)
+    assert PageOffsetMap([], []).page_at(42) == 1
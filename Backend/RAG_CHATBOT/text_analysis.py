@@ -0,0 +1,211 @@
+"""
+Shared text analysis for query handling and ingestion
+All keyword lists and patterns live here. Questions that need every category
+hit ("which categories does this query touch", "does it contain any tax term")
+run on compiled keyword automata: the keywords of all categories are merged
+into one prefix trie, compiled into a single regular expression, and one scan
+reports every hit, identical to `any(kw in text for kw in keywords)` per
+category. Content type and suggestion topic stay plain scans in priority
+order (the automaton measured no faster on these short lists), and section
+references stop at the first matching pattern; see
+benchmarks/bench_text_analysis.py. Legal-text normalisation keeps one pass per
+rule: a single alternation of all rules is tried at every character and
+measured slower than separate passes whose patterns start with a rare
+character (a non-space whitespace, an uppercase letter, a digit).
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+# Query-side keyword categories (used for query enhancement)
+TAX_KEYWORD_CATEGORIES = {
+    'deduction': ['80c', '80d', '80e', '80g', '24b', 'deduction', 'exemption'],
+    'income': ['salary', 'income', 'earnings', 'revenue', 'profit'],
+    'regime': ['old regime', 'new regime', 'tax regime', 'regime comparison'],
+    'calculation': ['calculate', 'computation', 'formula', 'how to compute'],
+    'filing': ['itr', 'return', 'filing', 'form 16', 'form 26as'],
+    'penalty': ['penalty', 'late fee', 'interest', 'default'],
+    'assessment': ['assessment', 'notice', 'scrutiny']
+}
+
+# Any of these makes a query tax-related (see is_vague_query)
+TAX_TERMS = [
+    'tax', 'section', 'deduction', 'exemption', 'income', 'itr', 'filing',
+    'return', 'assessment', 'tds', 'hra', 'lta', 'salary', 'business',
+    'capital gains', 'investment', 'calculation', 'rate', 'regime',
+    'cess', 'surcharge', 'rebate', 'refund', 'notice', 'audit',
+    '80c', '80d', '10', '24', 'form 16', 'pan', 'aadhaar'
+]
+
+GREETINGS = {'hi', 'hello', 'hey', 'good morning', 'good evening', 'good afternoon'}
+GENERIC_PHRASES = {'hello world', 'test', 'testing', 'thanks', 'thank you', 'ok', 'okay'}
+
+# Chunk content types, in priority order (first hit wins)
+CONTENT_TYPE_KEYWORDS = {
+    'definition': ['definition', 'means', 'shall mean'],
+    'exemption': ['exemption', 'exempt', 'not taxable'],
+    'penalty': ['penalty', 'fine', 'punishment'],
+    'procedure': ['procedure', 'process', 'filing'],
+    'calculation': ['rate', 'percentage', 'calculation'],
+    'deduction': ['deduction', 'allowance', 'relief']
+}
+
+# Section reference patterns, in priority order (first pattern that matches wins)
+SECTION_PATTERNS = [
+    r'Section\s+(\d+[A-Z]*)',
+    r'Chapter\s+([IVX]+)',
+    r'Rule\s+(\d+)',
+    r'Sub-section\s+\((\d+)\)',
+    r'Clause\s+\(([a-z])\)'
+]
+
+
+def _trie_pattern(node: Dict) -> str:
+    """Regex for a keyword trie; longer keywords are tried before their prefixes"""
+    branches = []
+    for char in sorted(key for key in node if key != ''):
+        branches.append(re.escape(char) + _trie_pattern(node[char]))
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # A keyword ends here: make the longer continuations optional (greedy)
+        return '(?:' + body + ')?'
+    return body
+
+
+class KeywordAutomaton:
+    """Single-scan substring matcher for several keyword categories"""
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        """
+        Compile the keywords of every category into one automaton
+
+        Args:
+            categories (Dict[str, Iterable[str]]): Category name -> keywords;
+                dict order is the order categories() reports hits in
+        """
+        self.category_order = list(categories)
+        keyword_categories = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword_categories.setdefault(keyword.lower(), set()).add(category)
+
+        trie = {}
+        for keyword in keyword_categories:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = True
+
+        # A search at a position finds the longest keyword starting there;
+        # every shorter keyword starting there is a prefix of it
+        self._hits = {}
+        for keyword in keyword_categories:
+            hit = set()
+            for end in range(1, len(keyword) + 1):
+                hit |= keyword_categories.get(keyword[:end], set())
+            self._hits[keyword] = frozenset(hit)
+
+        self._search = re.compile(_trie_pattern(trie) if trie else '(?!)').search
+
+    def _matches(self, text_lower: str):
+        """Longest keyword at every position where one starts (overlaps included)"""
+        search = self._search
+        match = search(text_lower)
+        while match is not None:
+            yield match.group()
+            match = search(text_lower, match.start() + 1)
+
+    def scan(self, text: str) -> Set[str]:
+        """All categories with at least one keyword in text (case-insensitive)"""
+        found = set()
+        hits = self._hits
+        for keyword in self._matches(text.lower()):
+            found |= hits[keyword]
+        return found
+
+    def categories(self, text: str) -> List[str]:
+        """Categories hit by text, in category order"""
+        found = self.scan(text)
+        return [category for category in self.category_order if category in found]
+
+    def contains_any(self, text: str) -> bool:
+        """True if text contains any keyword of any category"""
+        return self._search(text.lower()) is not None
+
+
+TAX_KEYWORDS = KeywordAutomaton(TAX_KEYWORD_CATEGORIES)
+TAX_TERMS_AUTOMATON = KeywordAutomaton({'tax': TAX_TERMS})
+
+_SECTION_NUMBER = re.compile(r'section\s+(\d+[a-z]*)')
+_SECTION_REFERENCES = [re.compile(pattern, re.IGNORECASE) for pattern in SECTION_PATTERNS]
+
+# clean_legal_text rules. Single spaces are left alone, and the camelCase and
+# digit-uppercase splits are one rule that is only checked before an uppercase letter
+_WHITESPACE = re.compile(r'[^\S ]\s*| \s+')
+_CASE_SPLIT = re.compile(r'(?=[A-Z])(?<=[a-z0-9])')
+_SECTION_NUMBERING = re.compile(r'(\d)\s*\.\s*(\d+)')
+_PAGE_HEADER = re.compile(r'Page\s+\d+.*', re.IGNORECASE)
+_ACT_FOOTER = re.compile(r'Income\s+Tax\s+Act.*\d{4}', re.IGNORECASE)
+
+
+def section_numbers(query_lower: str) -> List[str]:
+    """Section numbers mentioned as 'section 80c' in a lowercased query"""
+    return _SECTION_NUMBER.findall(query_lower)
+
+
+def find_section_reference(text: str) -> Optional[str]:
+    """First section reference in text, by pattern priority"""
+    for pattern in _SECTION_REFERENCES:
+        match = pattern.search(text)
+        if match:
+            return match.group(0)
+    return None
+
+
+def suggestion_topic(query: str) -> Optional[str]:
+    """Follow-up suggestion topic of a query: 'deduction', 'regime', 'hra', 'calculation' or None"""
+    query_lower = query.lower()
+    if '80c' in query_lower or 'deduction' in query_lower:
+        return 'deduction'
+    if 'regime' in query_lower:
+        return 'regime'
+    if 'hra' in query_lower:
+        return 'hra'
+    if 'calculate' in query_lower or 'tax' in query_lower:
+        return 'calculation'
+    return None
+
+
+def clean_legal_text(text: str) -> str:
+    """Normalise extracted legal text (whitespace, OCR spacing, numbering, headers)"""
+    text = _WHITESPACE.sub(' ', text)
+    text = _CASE_SPLIT.sub(' ', text)
+    text = _SECTION_NUMBERING.sub(r'\1.\2', text)
+    text = _PAGE_HEADER.sub('', text)
+    text = _ACT_FOOTER.sub('', text)
+    return text.strip()
+
+
+def classify_content(chunk: str) -> str:
+    """Content type of a chunk (first matching CONTENT_TYPE_KEYWORDS category)"""
+    chunk_lower = chunk.lower()
+    for content_type, keywords in CONTENT_TYPE_KEYWORDS.items():
+        if any(word in chunk_lower for word in keywords):
+            return content_type
+    return 'general'
+
+
+def is_vague_query(query: str) -> bool:
+    """True for greetings, generic phrases and longer queries without tax terms"""
+    query_lower = query.lower().strip()
+    word_count = len(query.split())
+
+    if query_lower in GREETINGS or word_count <= 1:
+        return True
+    if query_lower in GENERIC_PHRASES:
+        return True
+
+    # If query is longer than 2 words and has no tax keywords, it's vague
+    return word_count > 2 and not TAX_TERMS_AUTOMATON.contains_any(query_lower)
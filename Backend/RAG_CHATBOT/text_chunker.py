@@ -0,0 +1,229 @@
+"""
+Offset-tracking recursive text chunker
+Splits text the same way as LangChain's RecursiveCharacterTextSplitter
+(separators tried in order, separators kept at the start of the next piece,
+pieces merged up to chunk_size with chunk_overlap), but returns character
+spans into the source text instead of copies. PageOffsetMap maps those spans
+to page ranges with a binary search over page start offsets, so a chunk's
+pages are known exactly without re-tokenising any page.
+"""
+
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+Span = Tuple[int, int]
+
+# (start, end, text) of a chunk produced by OffsetTextSplitter.iter_segment_chunks
+StreamChunk = Tuple[int, int, str]
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", ".", ";", ":", " ", ""]
+
+
+class OffsetTextSplitter:
+    """Recursive character splitter that returns (start, end) offsets"""
+
+    def __init__(self, chunk_size: int = 800, chunk_overlap: int = 150,
+                 separators: Optional[List[str]] = None, strip_whitespace: bool = True):
+        """
+        Args:
+            chunk_size (int): Maximum chunk length in characters
+            chunk_overlap (int): Characters shared between consecutive chunks
+            separators (List[str]): Split points, coarsest first; "" means hard cuts
+            strip_whitespace (bool): Trim whitespace from both ends of each span
+        """
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators if separators is not None else list(DEFAULT_SEPARATORS)
+        self.strip_whitespace = strip_whitespace
+
+    def split_spans(self, text: str, start: int = 0, end: Optional[int] = None) -> List[Span]:
+        """
+        Split text[start:end] into chunk spans
+
+        Returns:
+            List[Tuple[int, int]]: Offsets into text, in order
+        """
+        end = len(text) if end is None else end
+        spans = []
+        for span in self._split(text, start, end, self.separators):
+            span = self._strip(text, span)
+            if span[1] > span[0]:
+                spans.append(span)
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunk strings (drop-in for the LangChain splitter)"""
+        return [text[s:e] for s, e in self.split_spans(text)]
+
+    def iter_segment_chunks(self, segments: Iterable[str]) -> Iterator[StreamChunk]:
+        """
+        Split text that arrives in segments, holding at most one segment at a time
+
+        Every segment must start with the first separator (the page markers
+        built by the vectorizers start with "\\n\\n"), which makes segment
+        boundaries top-level split points. As long as no segment ends with
+        part of that separator (cleaned page text never ends in a newline),
+        the chunks are identical to split_spans() on the concatenated segments.
+
+        Yields:
+            Tuple[int, int, str]: Start and end offsets into the concatenated
+                text, and the chunk text
+        """
+        for chunk in self._segment_chunks(segments):
+            if chunk[1] > chunk[0]:
+                yield chunk
+
+    def _segment_chunks(self, segments: Iterable[str]) -> Iterator[StreamChunk]:
+        separator = self.separators[0] if self.separators else ""
+        if not separator:
+            raise ValueError("streaming needs a non-empty first separator")
+        remaining = self.separators[1:]
+
+        window = []  # (start, end, text) of contiguous pieces awaiting merge
+        window_total = 0
+        base = 0
+        for segment in segments:
+            if not segment.startswith(separator):
+                raise ValueError("every segment must start with the first separator")
+            for piece_start, piece_end in self._pieces(segment, 0, len(segment), separator):
+                length = piece_end - piece_start
+                if length > self.chunk_size:
+                    if window:
+                        yield self._stream_chunk(window)
+                        window, window_total = [], 0
+                    for s, e in (self._split(segment, piece_start, piece_end, remaining)
+                                 if remaining else [(piece_start, piece_end)]):
+                        yield self._stream_chunk([(base + s, base + e, segment[s:e])])
+                    continue
+
+                # Same windowing as _merge, applied as pieces arrive
+                if window_total + length > self.chunk_size and window:
+                    yield self._stream_chunk(window)
+                    while window and (window_total > self.chunk_overlap
+                                      or window_total + length > self.chunk_size):
+                        window_total -= window[0][1] - window[0][0]
+                        window.pop(0)
+                window.append((base + piece_start, base + piece_end, segment[piece_start:piece_end]))
+                window_total += length
+            base += len(segment)
+
+        if window:
+            yield self._stream_chunk(window)
+
+    def _stream_chunk(self, pieces: List[StreamChunk]) -> StreamChunk:
+        text = "".join(piece[2] for piece in pieces)
+        start, end = self._strip(text, (0, len(text)))
+        offset = pieces[0][0]
+        return offset + start, offset + end, text[start:end]
+
+    def _strip(self, text: str, span: Span) -> Span:
+        if not self.strip_whitespace:
+            return span
+        s, e = span
+        while s < e and text[s].isspace():
+            s += 1
+        while e > s and text[e - 1].isspace():
+            e -= 1
+        return s, e
+
+    def _pieces(self, text: str, start: int, end: int, separator: str) -> List[Span]:
+        """Split a region at every separator, keeping the separator with the next piece"""
+        pieces = []
+        piece_start = start
+        position = text.find(separator, start, end)
+        while position != -1:
+            if position > piece_start:
+                pieces.append((piece_start, position))
+            piece_start = position
+            position = text.find(separator, position + len(separator), end)
+        if end > piece_start:
+            pieces.append((piece_start, end))
+        return pieces
+
+    def _hard_cut(self, start: int, end: int) -> List[Span]:
+        """Fixed windows for text without any usable separator"""
+        step = self.chunk_size - self.chunk_overlap
+        spans = []
+        position = start
+        while position < end:
+            spans.append((position, min(position + self.chunk_size, end)))
+            if position + self.chunk_size >= end:
+                break
+            position += step
+        return spans
+
+    def _split(self, text: str, start: int, end: int, separators: List[str]) -> List[Span]:
+        separator = ""
+        remaining = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = ""
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[i + 1:]
+                break
+
+        if separator == "":
+            return self._hard_cut(start, end)
+
+        chunks = []
+        mergeable = []
+        for piece in self._pieces(text, start, end, separator):
+            if piece[1] - piece[0] <= self.chunk_size:
+                mergeable.append(piece)
+                continue
+            if mergeable:
+                chunks.extend(self._merge(mergeable))
+                mergeable = []
+            if remaining:
+                chunks.extend(self._split(text, piece[0], piece[1], remaining))
+            else:
+                chunks.append(piece)
+        if mergeable:
+            chunks.extend(self._merge(mergeable))
+        return chunks
+
+    def _merge(self, pieces: List[Span]) -> List[Span]:
+        """Merge contiguous pieces into chunks of at most chunk_size with overlap"""
+        chunks = []
+        window = []
+        total = 0
+        for piece in pieces:
+            length = piece[1] - piece[0]
+            if total + length > self.chunk_size and window:
+                chunks.append((window[0][0], window[-1][1]))
+                while window and (total > self.chunk_overlap or total + length > self.chunk_size):
+                    total -= window[0][1] - window[0][0]
+                    window.pop(0)
+            window.append(piece)
+            total += length
+        if window:
+            chunks.append((window[0][0], window[-1][1]))
+        return chunks
+
+
+class PageOffsetMap:
+    """Binary-search map from character offsets to page numbers"""
+
+    def __init__(self, page_starts: Sequence[int], page_numbers: Sequence[int]):
+        """
+        Args:
+            page_starts (Sequence[int]): Offset where each page begins, ascending
+            page_numbers (Sequence[int]): Page number for each entry of page_starts
+        """
+        self.page_starts = list(page_starts)
+        self.page_numbers = list(page_numbers)
+
+    def page_at(self, offset: int) -> int:
+        """Page containing a character offset"""
+        if not self.page_starts:
+            return 1
+        position = bisect_right(self.page_starts, offset) - 1
+        return self.page_numbers[max(position, 0)]
+
+    def page_range(self, start: int, end: int) -> Tuple[int, int]:
+        """First and last page covered by the span [start, end)"""
+        return self.page_at(start), self.page_at(max(start, end - 1))
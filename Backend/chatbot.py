@@ -1,85 +1,114 @@
 import os
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
-import numpy as np
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+import sys
+from pdf_cache import get_embedding_model, load_document, top_k_chunks
 
-def create_rag_chatbot(pdf_path, question):
+# The answer generator is shared with the RAG server
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'RAG_CHATBOT'))
+from answer_generator import AnswerGenerator
+
+# flan-t5-small, loaded once per process and int8-quantized on CPU; concurrent
+# callers are batched. Beam search by default, as before.
+generator = AnswerGenerator(
+    "google/flan-t5-small",  # Smaller model for better compatibility
+    decoding=os.environ.get('CHATBOT_DECODING', 'beam'),
+    num_beams=4,
+    max_new_tokens=150
+)
+
+def context_answer(relevant_chunks):
+    """Fallback answer quoting the relevant chunks"""
+    context = " ".join(relevant_chunks)
+    return f"Based on the document, here's the relevant information for your question:\n\n{context}"
+
+def create_rag_chatbot(pdf_path, question, decoding=None, max_latency_ms=None):
     """
     Creates a RAG model chatbot using the provided PDF document.
-    Uses local models to avoid API issues.
+    Uses local models to avoid API issues. Chunks and embeddings are cached by
+    PDF content (see pdf_cache.py) and models stay loaded between calls.
 
     Args:
         pdf_path (str): The path to the PDF document.
         question (str): The user's question.
+        decoding (str): 'greedy' or 'beam' (default: CHATBOT_DECODING or 'beam').
+        max_latency_ms (float): Generation budget; past it the context is returned instead.
 
     Returns:
         str: The chatbot's answer.
     """
     print(f"Processing question: {question}")
-    print("Loading PDF and extracting text...")
     
-    # Step 1: Extract text from the PDF
-    text = ""
-    with open(pdf_path, "rb") as f:
-        pdf_reader = PdfReader(f)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-
-    print(f"Extracted {len(text)} characters from PDF")
+    # Steps 1-2: Extract, split and embed the PDF (cached by content hash)
+    chunks, chunk_embeddings = load_document(pdf_path, chunk_size=500, chunk_overlap=100)
 
-    # Step 2: Split the text into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=100,
-        length_function=len
-    )
-    chunks = text_splitter.split_text(text)
-    print(f"Split text into {len(chunks)} chunks")
+    # Step 3: Embed the question and find relevant chunks
+    question_embedding = get_embedding_model().encode([question])
 
-    # Step 3: Create vector embeddings and find relevant chunks
-    print("Loading embedding model...")
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    print("Creating embeddings for chunks...")
-    chunk_embeddings = embedding_model.encode(chunks)
-    question_embedding = embedding_model.encode([question])
-
-    # Find most similar chunks
-    similarities = np.dot(chunk_embeddings, question_embedding.T).flatten()
-    top_k = min(3, len(chunks))  # Get top 3 most relevant chunks or all if less than 3
-    top_indices = np.argsort(similarities)[-top_k:][::-1]
+    # Find the top 3 most similar chunks (or all if less than 3)
+    top_indices = top_k_chunks(chunk_embeddings, question_embedding, 3)[0]
     
     relevant_chunks = [chunks[i] for i in top_indices]
-    context = " ".join(relevant_chunks)
     
-    print("Loading text generation model...")
     # Step 4: Use local text generation model
     try:
-        # Try to use a local T5 model for question answering
-        model_name = "google/flan-t5-small"  # Smaller model for better compatibility
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-        
-        # Create prompt
-        prompt = f"Context: {context}\n\nQuestion: {question}\n\nAnswer:"
+        # Try to use the local T5 model for question answering
+        answer = generator.answer(question, relevant_chunks, decoding, max_latency_ms)
+        if not answer:
+            raise RuntimeError("no answer generated" if max_latency_ms is None
+                               else f"no answer within {max_latency_ms} ms")
         
-        # Generate answer
-        inputs = tokenizer.encode(prompt, return_tensors="pt", max_length=512, truncation=True)
-        outputs = model.generate(inputs, max_length=150, num_beams=4, early_stopping=True)
-        answer = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        print("Generated answer using T5 model")
+        print("Generated answer using T5 model" + (" (cut short by the latency budget)" if answer.truncated else ""))
         
     except Exception as e:
         print(f"T5 model failed: {e}")
         print("Falling back to simple context-based response")
         # Fallback to simple context-based response
-        answer = f"Based on the document, here's the relevant information for your question:\n\n{context}"
+        answer = context_answer(relevant_chunks)
     
     return answer
 
+def create_rag_chatbot_batch(pdf_path, questions, decoding=None, max_latency_ms=None):
+    """
+    Answers many questions about one PDF document, for offline Q&A jobs.
+    The PDF is extracted and embedded once, all questions are encoded in one
+    batch and ranked against the chunks with one matrix product, and the T5
+    answers are queued on the shared generator, which generates them
+    generator.max_batch_size prompts at a time.
+
+    Args:
+        pdf_path (str): The path to the PDF document.
+        questions (list): The users' questions.
+        decoding (str): 'greedy' or 'beam' (default: CHATBOT_DECODING or 'beam').
+        max_latency_ms (float): Generation budget per batch of max_batch_size questions.
+
+    Returns:
+        list: One answer per question, in order. Generated answers keep their
+        truncated flag; the others quote the context.
+    """
+    if not questions:
+        return []
+    print(f"Processing {len(questions)} question(s)")
+    
+    chunks, chunk_embeddings = load_document(pdf_path, chunk_size=500, chunk_overlap=100)
+    question_embeddings = get_embedding_model().encode(list(questions))
+    relevant_chunks = [[chunks[i] for i in indices]
+                       for indices in top_k_chunks(chunk_embeddings, question_embeddings, 3)]
+    
+    answers = []
+    for start in range(0, len(questions), generator.max_batch_size):
+        end = start + generator.max_batch_size
+        try:
+            answers.extend(generator.answer_many(questions[start:end], relevant_chunks[start:end],
+                                                 decoding, max_latency_ms))
+        except Exception as e:
+            print(f"T5 model failed: {e}")
+            answers.extend([None] * len(questions[start:end]))
+    truncated = sum(1 for answer in answers if answer is not None and answer.truncated)
+    if truncated:
+        print(f"{truncated} answer(s) cut short by the latency budget")
+    
+    # Fall back to the context for questions the model could not answer
+    return [answer or context_answer(contexts) for answer, contexts in zip(answers, relevant_chunks)]
+
 if __name__ == "__main__":
     pdf_file_path = "test_document.pdf"
     user_question = "What is this document about?"
@@ -3,6 +3,8 @@ from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
 from reportlab.lib.units import inch
+import random
+import argparse
 
 def create_comprehensive_tax_pdf():
     filename = "comprehensive_tax_guide.pdf"
@@ -298,5 +300,193 @@ def create_comprehensive_tax_pdf():
     print(f"✅ Comprehensive tax guide PDF '{filename}' created successfully!")
     return filename
 
+# Synthetic corpus for ingestion and search scaling tests
+# Every section is generated from a seeded random source, so the same seed
+# always yields the same corpus; slot values (amounts, years, assessees) vary
+# per section so chunks are not near-duplicates of each other.
+
+ASSESSEES = ["an individual", "a Hindu undivided family", "a resident senior citizen", "a firm",
+             "a domestic company", "a co-operative society", "a non-resident individual", "a trust"]
+INCOME_HEADS = ["salaries", "income from house property", "profits and gains of business or profession",
+                "capital gains", "income from other sources", "agricultural income"]
+DEDUCTION_ITEMS = ["life insurance premium", "contribution to the public provident fund",
+                   "tuition fees for children", "medical insurance premium", "interest on a housing loan",
+                   "interest on an education loan", "donation to an approved charitable institution",
+                   "rent paid for residential accommodation", "contribution to the national pension system",
+                   "repayment of principal of a housing loan", "interest on savings bank deposits",
+                   "expenditure on preventive health check-up", "deposit in a five-year tax saver fixed deposit"]
+DEFINED_TERMS = ["previous year", "assessee", "agricultural land", "capital asset", "perquisite",
+                 "transfer", "infrastructure facility", "eligible business", "specified security",
+                 "dependant", "approved gratuity fund", "business trust", "slump sale", "zero coupon bond"]
+DEFINITION_CLAUSES = ["any property held by the assessee, whether or not connected with the business",
+                      "the financial year immediately preceding the assessment year",
+                      "a person by whom any tax or other sum of money is payable under this Act",
+                      "land situated in India which is assessed to land revenue",
+                      "any sum received in lieu of or in addition to any salary or wages",
+                      "the sale, exchange or relinquishment of the asset or the extinguishment of any rights therein",
+                      "an undertaking engaged in the development, operation and maintenance of the facility",
+                      "a security notified by the Central Government in the Official Gazette"]
+OFFENCES = ["fails to furnish the return of income within the time allowed",
+            "under-reports income in consequence of a misreporting",
+            "fails to deduct the whole or any part of the tax at source",
+            "fails to get accounts audited as required",
+            "fails to comply with a notice issued under this Act",
+            "fails to furnish the statement of financial transactions",
+            "accepts a loan or deposit otherwise than by an account payee cheque",
+            "fails to pay the advance tax instalment by the due date"]
+TOPICS = ["Deduction in respect of", "Exemption of", "Computation of", "Set off of loss from",
+          "Carry forward of", "Tax deducted at source on", "Rebate on", "Special provisions for"]
+FIRST_NAMES = ["Mr. Sharma", "Mrs. Iyer", "Mr. Khan", "Ms. Banerjee", "Mr. Reddy", "Mrs. Kaur",
+               "Mr. Patel", "Ms. Fernandes", "Mr. Nair", "Mrs. Joshi"]
+
+
+def format_rupees(amount):
+    """Format an amount with Indian digit grouping, e.g. 250000 -> ₹2,50,000"""
+    digits = str(int(amount))
+    if len(digits) > 3:
+        head, tail = digits[:-3], digits[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        if head:
+            groups.insert(0, head)
+        digits = ",".join(groups + [tail])
+    return f"₹{digits}"
+
+
+def synthetic_section_number(index):
+    """Section number of the index-th synthetic section: 10, 10A, 10B, 10C, 11, ..."""
+    base, suffix = divmod(index, 4)
+    return f"{10 + base}{'ABC'[suffix - 1] if suffix else ''}"
+
+
+def synthetic_section(rng, index):
+    """
+    Generate one section: a definition, deductions with limits, a penalty and a worked example.
+
+    Args:
+        rng (random.Random): Seeded random source
+        index (int): Position of the section in the corpus
+
+    Returns:
+        tuple: (heading, blocks) where each block is a list of lines; lines starting
+               with "•" are bullet points
+    """
+    number = synthetic_section_number(index)
+    item = rng.choice(DEDUCTION_ITEMS)
+    head = rng.choice(INCOME_HEADS)
+    assessee = rng.choice(ASSESSEES)
+    heading = f"Section {number} - {rng.choice(TOPICS)} {item}"
+    year = rng.randint(2015, 2025)
+    limit = rng.randrange(25000, 500001, 5000)
+
+    term = rng.choice(DEFINED_TERMS)
+    definition = [
+        f"Definitions under section {number} (inserted by the Finance Act, {year}):",
+        f'For the purposes of this section, "{term}" means {rng.choice(DEFINITION_CLAUSES)}, '
+        f"and includes {rng.choice(DEFINITION_CLAUSES)}.",
+        f"Where {assessee} derives {head}, the expression shall be construed with reference to "
+        f"the assessment year {year}-{(year + 1) % 100:02d} and every subsequent assessment year.",
+    ]
+
+    deductions = [f"Deductions allowed under section {number}({rng.randint(1, 5)}):"]
+    for deduction_item in rng.sample(DEDUCTION_ITEMS, rng.randint(3, 5)):
+        cap = rng.randrange(10000, limit + 1, 1000)
+        deductions.append(f"• {deduction_item.capitalize()} paid by {rng.choice(ASSESSEES)}, "
+                          f"up to {format_rupees(cap)} in the previous year")
+    deductions.append(f"The aggregate deduction under this section shall not exceed {format_rupees(limit)} "
+                      f"and is available only under the old tax regime.")
+
+    rate = rng.choice([10, 20, 50, 100, 200])
+    fixed = rng.randrange(1000, 100001, 1000)
+    penalty = [
+        f"Penalty under section {270 + index % 10}{'AB'[index % 2]} for non-compliance with section {number}:",
+        f"If {assessee} {rng.choice(OFFENCES)}, the Assessing Officer may direct that such person shall pay, "
+        f"by way of penalty, a sum of {format_rupees(fixed)} or {rate}% of the tax payable, whichever is higher.",
+        f"No penalty shall be imposed if the assessee proves that there was reasonable cause for the failure "
+        f"and the return is furnished before {rng.randint(1, 28)} {rng.choice(['July', 'September', 'December', 'March'])} {year + 1}.",
+    ]
+
+    income = rng.randrange(300000, 5000001, 10000)
+    claimed = rng.randrange(10000, min(limit, income) + 1, 1000)
+    example = [
+        f"Example {index + 1}: {rng.choice(FIRST_NAMES)} has {head} of {format_rupees(income)} "
+        f"and pays {item} of {format_rupees(claimed)} during the financial year {year}-{(year + 1) % 100:02d}.",
+        f"Gross total income: {format_rupees(income)}",
+        f"Deduction under section {number}: {format_rupees(claimed)}",
+        f"Taxable income: {format_rupees(income - claimed)}",
+    ]
+    return heading, [definition, deductions, penalty, example]
+
+
+def iter_synthetic_sections(count, seed=0):
+    """Yield count synthetic (heading, blocks) sections, reproducibly for a seed"""
+    rng = random.Random(seed)
+    for index in range(count):
+        yield synthetic_section(rng, index)
+
+
+def synthetic_chunks(count, seed=0):
+    """
+    Generate chunk texts directly, skipping PDF rendering and extraction.
+
+    Each block of a section becomes one chunk, prefixed with the section heading
+    (roughly the size of an 800-character splitter chunk).
+
+    Args:
+        count (int): Number of chunks
+        seed (int): Random seed
+
+    Returns:
+        list: Chunk texts
+    """
+    chunks = []
+    for heading, blocks in iter_synthetic_sections((count + 3) // 4, seed):
+        for block in blocks:
+            chunks.append("\n".join([heading] + block))
+    return chunks[:count]
+
+
+def create_synthetic_tax_pdf(pages, filename=None, seed=0):
+    """
+    Create an N-page synthetic tax guide, one generated section per page.
+
+    Args:
+        pages (int): Number of pages
+        filename (str): Output path (default: synthetic_tax_guide_<pages>p.pdf)
+        seed (int): Random seed
+
+    Returns:
+        str: Path of the created PDF
+    """
+    filename = filename or f"synthetic_tax_guide_{pages}p.pdf"
+    doc = SimpleDocTemplate(filename, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    styles = getSampleStyleSheet()
+    story = []
+
+    for heading, blocks in iter_synthetic_sections(pages, seed):
+        story.append(Paragraph(heading, styles['Heading1']))
+        story.append(Spacer(1, 12))
+        for block in blocks:
+            for content in block:
+                story.append(Paragraph(content, styles['Normal']))
+            story.append(Spacer(1, 6))
+        story.append(PageBreak())
+
+    doc.build(story)
+    print(f"✅ Synthetic tax guide PDF '{filename}' created with {pages} pages!")
+    return filename
+
+
 if __name__ == "__main__":
-    create_comprehensive_tax_pdf()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create the comprehensive tax guide PDF, or a synthetic N-page corpus")
+    parser.add_argument('--pages', type=int, default=None, help="Create a synthetic guide with this many pages")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed of the synthetic guide")
+    parser.add_argument('--output', default=None, help="Output path of the synthetic guide")
+    args = parser.parse_args()
+
+    if args.pages:
+        create_synthetic_tax_pdf(args.pages, args.output, args.seed)
+    else:
+        create_comprehensive_tax_pdf()
@@ -0,0 +1,231 @@
+"""
+Cache of PDF text chunks and their embeddings for the standalone chatbots
+chatbot.py and simple_chatbot.py used to re-read the PDF, re-split it, reload
+the SentenceTransformer and re-embed every chunk for every question. Documents
+are now keyed by the SHA-256 of the PDF's content plus the chunking parameters
+and the embedding model. The chunks and embeddings are persisted under
+PDF_CACHE_DIR (default: .pdf_cache next to this file) and kept in memory, and
+loaded models are held for the life of the process, so repeated questions
+cost one query encode and a dot product. The in-memory documents and file
+hashes are least-recently-used caches bounded by PDF_CACHE_DOCUMENTS (default
+8) and PDF_CACHE_HASHES (default 256) entries. top_k_chunks ranks the chunks
+for any number of questions with one matrix product.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Bump when extraction or splitting changes so old cache entries are ignored
+CACHE_VERSION = 1
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+DEFAULT_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.pdf_cache'))
+MAX_DOCUMENTS = int(os.environ.get('PDF_CACHE_DOCUMENTS', 8))
+MAX_FILE_HASHES = int(os.environ.get('PDF_CACHE_HASHES', 256))
+
+_models = {}
+_documents = OrderedDict()
+_file_hashes = OrderedDict()
+_lock = threading.Lock()
+
+
+def _lru_get(cache: OrderedDict, key):
+    """Cached value (marked as recently used), or None"""
+    with _lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _lru_put(cache: OrderedDict, key, value, max_entries: int):
+    """Store value, evicting the least recently used entries beyond max_entries"""
+    with _lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max(max_entries, 0):
+            cache.popitem(last=False)
+
+
+def get_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL):
+    """
+    SentenceTransformer loaded once per process
+
+    Args:
+        model_name (str): sentence-transformers model name
+
+    Returns:
+        SentenceTransformer: The shared model
+    """
+    with _lock:
+        if model_name not in _models:
+            from sentence_transformers import SentenceTransformer
+            print(f"Loading embedding model {model_name}...")
+            _models[model_name] = SentenceTransformer(model_name)
+        return _models[model_name]
+
+
+def pdf_content_hash(pdf_path: str) -> str:
+    """SHA-256 of a PDF's bytes, re-read only when its size or mtime changes"""
+    stat = os.stat(pdf_path)
+    key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+    content_hash = _lru_get(_file_hashes, key)
+    if content_hash is None:
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+        _lru_put(_file_hashes, key, content_hash, MAX_FILE_HASHES)
+    return content_hash
+
+
+def extract_pdf_text(pdf_path: str) -> str:
+    """Concatenated text of all pages"""
+    from PyPDF2 import PdfReader
+
+    text = ""
+    with open(pdf_path, "rb") as f:
+        pdf_reader = PdfReader(f)
+        for page in pdf_reader.pages:
+            text += page.extract_text()
+    return text
+
+
+def split_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len
+    )
+    return text_splitter.split_text(text)
+
+
+def cache_key(pdf_path: str, chunk_size: int, chunk_overlap: int,
+              model_name: str = DEFAULT_EMBEDDING_MODEL) -> str:
+    """Name of a document's cache entry: content hash plus chunking and model parameters"""
+    params = f"v{CACHE_VERSION}|{chunk_size}|{chunk_overlap}|{model_name}"
+    suffix = hashlib.sha256(params.encode('utf-8')).hexdigest()[:12]
+    return f"{pdf_content_hash(pdf_path)[:32]}_{suffix}"
+
+
+def _read_entry(cache_dir: str, key: str):
+    chunks_path = os.path.join(cache_dir, f"{key}.json")
+    embeddings_path = os.path.join(cache_dir, f"{key}.npy")
+    if not (os.path.exists(chunks_path) and os.path.exists(embeddings_path)):
+        return None
+    try:
+        with open(chunks_path, 'r', encoding='utf-8') as f:
+            chunks = json.load(f)['chunks']
+        embeddings = np.load(embeddings_path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable cache entry {key}: {e}")
+        return None
+    if len(chunks) != len(embeddings):
+        return None
+    return chunks, embeddings
+
+
+def _write_atomic(path: str, write, mode: str = 'wb'):
+    """Write a file through a uniquely named temporary file in the same directory"""
+    encoding = None if 'b' in mode else 'utf-8'
+    with tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(path), prefix=os.path.basename(path) + '.',
+                                     suffix='.tmp', delete=False, encoding=encoding) as f:
+        temp_path = f.name
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.unlink(temp_path)
+            raise
+    os.replace(temp_path, path)
+
+
+def _write_entry(cache_dir: str, key: str, pdf_path: str, params: Dict, chunks: List[str], embeddings: np.ndarray):
+    """
+    Write the entry through temporary files, so a crash never leaves half a file
+    and concurrent writers of the same entry do not clobber each other's output
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    chunks_path = os.path.join(cache_dir, f"{key}.json")
+    embeddings_path = os.path.join(cache_dir, f"{key}.npy")
+    # Embeddings first: an entry is only read when its .json exists
+    _write_atomic(embeddings_path, lambda f: np.save(f, embeddings))
+    _write_atomic(chunks_path, lambda f: json.dump(
+        {'source': os.path.basename(pdf_path), 'params': params, 'chunks': chunks}, f, ensure_ascii=False), 'w')
+
+
+def load_document(pdf_path: str, chunk_size: int, chunk_overlap: int,
+                  model_name: str = DEFAULT_EMBEDDING_MODEL,
+                  cache_dir: str = DEFAULT_CACHE_DIR) -> Tuple[List[str], np.ndarray]:
+    """
+    Chunks and chunk embeddings of a PDF, from memory, disk or a fresh build
+
+    Args:
+        pdf_path (str): The path to the PDF document
+        chunk_size (int): Characters per chunk
+        chunk_overlap (int): Characters shared by consecutive chunks
+        model_name (str): Embedding model
+        cache_dir (str): Directory of persisted entries (None = memory only)
+
+    Returns:
+        Tuple[List[str], np.ndarray]: Chunks and their float32 embeddings
+    """
+    key = cache_key(pdf_path, chunk_size, chunk_overlap, model_name)
+    cached = _lru_get(_documents, key)
+    if cached is not None:
+        return cached
+
+    entry = _read_entry(cache_dir, key) if cache_dir else None
+    if entry is not None:
+        print(f"Loaded {len(entry[0])} cached chunks and embeddings")
+    else:
+        print("Loading PDF and extracting text...")
+        text = extract_pdf_text(pdf_path)
+        print(f"Extracted {len(text)} characters from PDF")
+
+        chunks = split_text(text, chunk_size, chunk_overlap)
+        print(f"Split text into {len(chunks)} chunks")
+
+        print("Creating embeddings for chunks...")
+        embeddings = np.asarray(get_embedding_model(model_name).encode(chunks), dtype='float32')
+        entry = (chunks, embeddings)
+        if cache_dir:
+            params = {'chunk_size': chunk_size, 'chunk_overlap': chunk_overlap, 'model': model_name}
+            _write_entry(cache_dir, key, pdf_path, params, chunks, embeddings)
+
+    _lru_put(_documents, key, entry, MAX_DOCUMENTS)
+    return entry
+
+
+def top_k_chunks(chunk_embeddings: np.ndarray, question_embeddings: np.ndarray, top_k: int = 3) -> np.ndarray:
+    """
+    Most similar chunks for each question by dot product
+
+    Args:
+        chunk_embeddings (np.ndarray): (chunks, dim) embeddings
+        question_embeddings (np.ndarray): (questions, dim) embeddings
+        top_k (int): Chunks per question
+
+    Returns:
+        np.ndarray: (questions, min(top_k, chunks)) chunk indices, most similar first
+    """
+    k = min(top_k, len(chunk_embeddings))
+    if k == 0:
+        return np.empty((len(question_embeddings), 0), dtype=np.int64)
+    scores = np.asarray(question_embeddings, dtype='float32') @ np.asarray(chunk_embeddings, dtype='float32').T
+    if k < scores.shape[1]:
+        # Unordered top k per row in linear time, then order only those k
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(k), scores.shape).copy()
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
@@ -1,71 +1,65 @@
 import os
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
-from sentence_transformers import SentenceTransformer
-import numpy as np
+from pdf_cache import get_embedding_model, load_document, top_k_chunks
 
-def create_simple_rag_chatbot(pdf_path, question):
+def format_simple_answer(question, relevant_chunks):
+    """Rule-based answer listing the most relevant chunks"""
+    context = "\n\n".join(relevant_chunks)
+    
+    return f"""Based on the document, here are the most relevant sections for your question "{question}":
+
+{context}
+
+This information is extracted from the document and should help answer your question about the topic."""
+
+def create_simple_rag_chatbot_batch(pdf_path, questions, top_k=3):
     """
-    Creates a simple RAG model chatbot using the provided PDF document.
-    Uses local sentence transformers without API calls.
+    Answers many questions about one PDF document in a single pass.
+    The PDF is extracted and embedded once (and cached, see pdf_cache.py), all
+    questions are encoded in one batch and every similarity comes from one
+    matrix product.
 
     Args:
         pdf_path (str): The path to the PDF document.
-        question (str): The user's question.
+        questions (list): The users' questions.
+        top_k (int): Relevant chunks per answer.
 
     Returns:
-        str: The chatbot's answer based on document similarity.
+        list: One answer per question, in order.
     """
-    print("Loading PDF and extracting text...")
-    
-    # Step 1: Extract text from the PDF
-    text = ""
-    with open(pdf_path, "rb") as f:
-        pdf_reader = PdfReader(f)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-
-    print(f"Extracted {len(text)} characters from PDF")
-
-    # Step 2: Split the text into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
-    chunks = text_splitter.split_text(text)
-    print(f"Split text into {len(chunks)} chunks")
-
-    # Step 3: Create vector embeddings using sentence transformers
-    print("Loading embedding model...")
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    if not questions:
+        return []
     
-    print("Creating embeddings for chunks...")
-    chunk_embeddings = model.encode(chunks)
+    # Steps 1-3: Extract, split and embed the PDF (cached by content hash)
+    chunks, chunk_embeddings = load_document(pdf_path, chunk_size=1000, chunk_overlap=200)
     
-    print("Creating embedding for question...")
-    question_embedding = model.encode([question])
+    print(f"Creating embeddings for {len(questions)} question(s)...")
+    question_embeddings = get_embedding_model().encode(list(questions))
 
-    # Step 4: Find most similar chunks
+    # Step 4: Find most similar chunks for every question at once
     print("Finding similar chunks...")
-    similarities = np.dot(chunk_embeddings, question_embedding.T).flatten()
-    top_k = 3  # Get top 3 most relevant chunks
-    top_indices = np.argsort(similarities)[-top_k:][::-1]
+    top_indices = top_k_chunks(chunk_embeddings, question_embeddings, top_k)
     
     # Step 5: Create a simple answer based on most relevant chunks
-    relevant_chunks = [chunks[i] for i in top_indices]
-    context = "\n\n".join(relevant_chunks)
-    
-    # Simple rule-based response
-    answer = f"""Based on the document, here are the most relevant sections for your question "{question}":
+    return [format_simple_answer(question, [chunks[i] for i in indices])
+            for question, indices in zip(questions, top_indices)]
 
-{context}
+def create_simple_rag_chatbot(pdf_path, question):
+    """
+    Creates a simple RAG model chatbot using the provided PDF document.
+    Uses local sentence transformers without API calls. Chunks and embeddings
+    are cached by PDF content (see pdf_cache.py), so only the first call per
+    document extracts and embeds it.
 
-This information is extracted from the document and should help answer your question about the topic."""
+    Args:
+        pdf_path (str): The path to the PDF document.
+        question (str): The user's question.
 
-    return answer
+    Returns:
+        str: The chatbot's answer based on document similarity.
+    """
+    return create_simple_rag_chatbot_batch(pdf_path, [question])[0]
 
 def test_simple_chatbot():
     """Test function to demonstrate the chatbot"""
@@ -78,18 +72,19 @@ def test_simple_chatbot():
         "Tell me about tax deductions"
     ]
     
-    for question in questions:
+    # Extract and embed the PDF once for all questions
+    try:
+        answers = create_simple_rag_chatbot_batch(pdf_file_path, questions)
+    except Exception as e:
+        print(f"Error: {e}")
+        return
+    
+    for question, answer in zip(questions, answers):
         print(f"\n{'='*50}")
         print(f"Question: {question}")
         print(f"{'='*50}")
-        
-        try:
-            answer = create_simple_rag_chatbot(pdf_file_path, question)
-            print("Answer:")
-            print(answer)
-        except Exception as e:
-            print(f"Error: {e}")
-        
+        print("Answer:")
+        print(answer)
         print(f"\n{'='*50}\n")
 
 if __name__ == "__main__":